@@ -1,16 +1,30 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import json
 import os
+from config import settings
+
+DRUG_DATA_PATH = os.path.join(os.path.dirname(__file__), "ent_drug_data.json")
 
 def load_json():
     """Loads JSON data from file at startup."""
     # Get the absolute path of the file
-    file_path = os.path.join(os.path.dirname(__file__), "ent_drug_data.json")
+    file_path = DRUG_DATA_PATH
     
     with open(file_path, "r") as file:
         return json.load(file)
 
+def drug_db_path():
+    """The compiled drug store the app serves from, or None to parse the JSON (DRUG_STORE=json)."""
+    return settings.DRUG_DB_PATH if settings.DRUG_STORE == "sqlite" else None
+
+def load_drug_data():
+    """Opens the drug dataset: the compiled, memory-mapped store (recompiled when stale) or the JSON."""
+    from utils.drug_store import open_drug_data
+
+    return open_drug_data(DRUG_DATA_PATH, drug_db_path())
+
 def create_app():
     app = FastAPI(title="ENT Symptom Predictor API", version="1.0")
 
@@ -21,15 +35,140 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Session-Id", "Server-Timing", "X-Profile-Id"],  # /chat session id, /predict stage timings
     )
 
+    from utils.profiling import ProfileStore, ProfilingMiddleware
+
+    # Opt-in: sampled or header-triggered profiles of whole /chat and /predict requests
+    app.state.profile_store = ProfileStore(settings.PROFILE_DIR, keep=settings.PROFILE_KEEP)
+    if settings.PROFILE_ENABLED:
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=app.state.profile_store,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            header=settings.PROFILE_HEADER,
+            admin_token=settings.ADMIN_TOKEN,
+            interval=settings.PROFILE_INTERVAL_MS / 1000,
+        )
+
     # Global storage for JSON config
     app.state.medical_advice_data = {}
 
+    from utils import pipeline
+    from utils.batching import MicroBatcher
+    from utils.cache import TTLCache, file_fingerprint
+    from utils.executor import create_executor, warm_up, shutdown_executor
+    from utils.registry import registry
+    from utils.service import PredictionService
+    from utils.sessions import create_session_store
+    from utils.symptom_extractor import SymptomExtractor
+
+    # Models are loaded once per process by the registry (at startup, below)
+    registry.model_dir = settings.MODEL_DIR
+    app.state.model_registry = registry
+    app.state.ready = False
+
+    # Drug lookup options, applied in this process and in every process worker
+    drug_options = {
+        "rank_drugs": settings.DRUG_RANKING_ENABLED,
+        "summary_top_n": settings.DRUG_SUMMARY_TOP_N,
+        "summary_max_chars": settings.DRUG_SUMMARY_MAX_CHARS,
+    }
+
+    def make_prediction_executor(model_dir):
+        """CPU-bound symptom -> disease -> drugs work runs here, off the event loop."""
+        return create_executor(
+            settings.PREDICT_EXECUTOR,
+            max_workers=settings.PREDICT_WORKERS,
+            drug_data_path=DRUG_DATA_PATH,
+            start_method=settings.PREDICT_PROCESS_START_METHOD,
+            model_dir=model_dir,
+            drug_options=drug_options,
+            drug_db_path=drug_db_path(),
+        )
+
+    app.state.make_prediction_executor = make_prediction_executor
+
+    def apply_drug_data(data):
+        """Serves a loaded drug dataset in this process (what thread / inline executors use)."""
+        pipeline.set_medical_advice_data(data, **drug_options)
+        app.state.medical_advice_data = data
+
+    app.state.load_drug_data = load_drug_data
+    app.state.apply_drug_data = apply_drug_data
+    app.state.prediction_executor = make_prediction_executor(registry.model_dir)
+
+    # Shared by /chat and /predict so concurrent requests run as one model call
+    prediction_batcher = MicroBatcher(
+        pipeline.diagnose_batch,
+        max_batch_size=settings.PREDICT_BATCH_MAX_SIZE,
+        max_wait_ms=settings.PREDICT_BATCH_MAX_WAIT_MS,
+        executor=app.state.prediction_executor,
+        max_concurrent_batches=settings.PREDICT_WORKERS,
+    )
+
+    # Repeated symptom combinations skip the pipeline entirely; serving a new
+    # model version or replacing the drug JSON on disk clears the cache.
+    prediction_cache = TTLCache(
+        maxsize=settings.PREDICTION_CACHE_SIZE,
+        ttl=settings.PREDICTION_CACHE_TTL_S,
+        name="prediction_cache",
+        fingerprint=lambda: (registry.version, file_fingerprint([DRUG_DATA_PATH, settings.DRUG_DB_PATH])),
+    )
+
+    app.state.prediction_service = PredictionService(prediction_batcher, cache=prediction_cache)
+
+    def make_symptom_extractor(bundle):
+        """Lexicon matcher for /chat, restricted to the served vectorizer's vocabulary."""
+        if not settings.SYMPTOM_EXTRACTOR_ENABLED:
+            return None
+        return SymptomExtractor.from_vectorizer(bundle.vectorizer, min_confidence=settings.SYMPTOM_EXTRACTOR_MIN_CONFIDENCE)
+
+    app.state.make_symptom_extractor = make_symptom_extractor
+    app.state.symptom_extractor = None
+
+    # Server-side /chat history for clients that send only the new message
+    app.state.session_store = create_session_store(
+        settings.SESSION_STORE,
+        ttl=settings.SESSION_TTL_S,
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        max_bytes=settings.SESSION_MAX_BYTES,
+        sqlite_path=settings.SESSION_SQLITE_PATH,
+    )
+
+    app.state.preloaded = False
+
+    def preload():
+        """
+        Loads the models and drug data before the server starts, so forked workers
+        (utils.prefork) share them instead of loading their own copies at startup.
+        """
+        bundle = registry.get()
+        app.state.symptom_extractor = make_symptom_extractor(bundle)
+        apply_drug_data(load_drug_data())
+        app.state.preloaded = True
+
+    app.state.preload = preload
+
     @app.on_event("startup")
     async def startup_event():
-        """Loads JSON data on FastAPI startup."""
-        app.state.medical_advice_data = load_json()
+        """Loads models and JSON data on FastAPI startup (unless preloaded), then reports ready."""
+        loop = asyncio.get_running_loop()
+        if not app.state.preloaded:
+            bundle = await loop.run_in_executor(None, registry.get)  # Load + warmup, once
+            app.state.symptom_extractor = make_symptom_extractor(bundle)
+
+            apply_drug_data(await loop.run_in_executor(None, load_drug_data))
+        await warm_up(app.state.prediction_executor, settings.PREDICT_WORKERS)
+        app.state.ready = True
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        app.state.ready = False
+        await app.state.prediction_service.close()
+        shutdown_executor(app.state.prediction_executor)
+        app.state.session_store.close()
 
     def get_config():
         """Dependency to access config data."""
@@ -37,8 +176,12 @@ def create_app():
 
     from api.predict import predict_router
     from api.chat import chat_router
+    from api.metrics import metrics_router
+    from api.admin import admin_router
 
     app.include_router(predict_router)
     app.include_router(chat_router)
+    app.include_router(metrics_router)
+    app.include_router(admin_router)
 
     return app, get_config  # Returning `get_config` for dependency injection if needed
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+from collections.abc import Mapping
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from config import settings
+from utils.cache import file_fingerprint
+from utils.drug_store import CompiledDrugData
+from utils.executor import warm_up, shutdown_executor
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoints are disabled unless ADMIN_TOKEN is set; then the X-Admin-Token
+    header must match it.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def resolve_model_dir(model_dir):
+    """
+    A reload target inside MODEL_DIR (relative paths are taken from there), or 400:
+    the artifacts are unpickled, so only directories the server owns may be loaded.
+    """
+    root = os.path.realpath(settings.MODEL_DIR)
+    resolved = os.path.realpath(os.path.join(root, model_dir))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=400, detail="model_dir must be inside MODEL_DIR")
+    return resolved
+
+admin_router = APIRouter()
+
+class ModelReloadRequest(BaseModel):
+    model_dir: Optional[str] = None  # A directory inside MODEL_DIR, e.g. "compact"; default: the current one
+
+@admin_router.get("/health/live", summary="Liveness probe")
+def live():
+    return {"status": "ok"}
+
+@admin_router.get("/health/ready", summary="Readiness probe")
+def ready(request: Request):
+    """
+    Ready once the models are loaded and warmed up in every prediction worker.
+    """
+    registry = request.app.state.model_registry
+    if not request.app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "model": registry.get().info()}
+
+@admin_router.post("/admin/models/reload", summary="Hot reload the model artifacts", dependencies=[Depends(require_admin)])
+async def reload_models(request: Request, data: Optional[ModelReloadRequest] = None):
+    """
+    Loads and warms up a new model version, then swaps it in without a restart.
+    Requests already in flight finish on the old version.
+    """
+    app = request.app
+    registry = app.state.model_registry
+    model_dir = resolve_model_dir(data.model_dir) if data and data.model_dir else None
+    loop = asyncio.get_running_loop()
+
+    try:
+        # Validates the artifacts and serves them in this process (thread / inline executors)
+        bundle = await loop.run_in_executor(None, registry.reload, model_dir)
+    except Exception as e:
+        logging.error(f"Model reload failed: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not load models: {e}")
+
+    # The local symptom extractor is tied to the vectorizer vocabulary
+    app.state.symptom_extractor = app.state.make_symptom_extractor(bundle)
+
+    if settings.PREDICT_EXECUTOR == "process":
+        await replace_process_pool(app, bundle.model_dir)
+
+    return {"status": "reloaded", "model": bundle.info()}
+
+async def replace_process_pool(app, model_dir):
+    """
+    Worker processes hold their own copy of the models and drug data: start a warm pool
+    that loads the current ones, point the batcher at it, and let the old pool finish
+    what it already has.
+    """
+    new_executor = app.state.make_prediction_executor(model_dir)
+    await warm_up(new_executor, settings.PREDICT_WORKERS)
+    old_executor = app.state.prediction_executor
+    app.state.prediction_executor = new_executor
+    app.state.prediction_service.batcher.executor = new_executor
+    shutdown_executor(old_executor, cancel_futures=False)
+
+@admin_router.post("/admin/drug-data/reload", summary="Reload the drug dataset from disk", dependencies=[Depends(require_admin)])
+async def reload_drug_data(request: Request):
+    """
+    Re-reads ent_drug_data.json (e.g. after an ingestion refresh; the compiled store is
+    rebuilt when it is older) and serves it without a restart: indexes and summaries are
+    rebuilt off the event loop, cached predictions are dropped, and process workers are
+    replaced by ones that loaded the new data.
+    """
+    app = request.app
+    loop = asyncio.get_running_loop()
+
+    try:
+        data = await loop.run_in_executor(None, app.state.load_drug_data)
+        if not isinstance(data, Mapping) or not all(isinstance(drugs, Mapping) for drugs in data.values()):
+            raise ValueError("expected {problem: {drug: label}}")
+        await loop.run_in_executor(None, app.state.apply_drug_data, data)
+    except Exception as e:
+        logging.error(f"Drug data reload failed: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not load drug data: {e}")
+
+    if settings.PREDICT_EXECUTOR == "process":
+        await replace_process_pool(app, app.state.model_registry.model_dir)
+
+    cache = app.state.prediction_service.cache
+    if cache is not None:
+        cache.clear()
+
+    return {"status": "reloaded", "problems": len(data), "drugs": drug_count(data), "version": drug_data_version()}
+
+def drug_count(data):
+    """Distinct drug names, counted without loading the compiled store's drugs."""
+    if isinstance(data, CompiledDrugData):
+        return data.drug_count()
+    return len({drug for drugs in data.values() for drug in drugs})
+
+def drug_data_version():
+    """Short fingerprint (mtime, size) of the drug JSON and compiled store being served."""
+    from api import DRUG_DATA_PATH, drug_db_path
+
+    paths = [path for path in (DRUG_DATA_PATH, drug_db_path()) if path]
+    return hashlib.sha1(repr(file_fingerprint(paths)).encode()).hexdigest()[:12]
+
+@admin_router.get("/admin/profiles", summary="Recent request profiles", dependencies=[Depends(require_admin)])
+def list_profiles(request: Request):
+    """
+    Profiles taken by the profiling middleware (PROFILE_ENABLED), newest first.
+    """
+    return {"enabled": settings.PROFILE_ENABLED, "profiles": request.app.state.profile_store.list()}
+
+@admin_router.get("/admin/profiles/{profile_id}", summary="One profile as collapsed stacks", dependencies=[Depends(require_admin)])
+def get_profile(request: Request, profile_id: str):
+    """
+    Collapsed stacks ("frame;frame;... count" per line), ready for flamegraph.pl or speedscope.
+    """
+    text = request.app.state.profile_store.get(profile_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    return PlainTextResponse(text)
@@ -1,29 +1,47 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from openai import AsyncOpenAI
 import os
 import asyncio
 from dotenv import load_dotenv
 import logging
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Optional
 import json
-from utils.preprocess import preprocess_text
-from utils.predict import predict_diseases
-from utils.drug import search_drug_info
+import time
 import numpy as np
 import traceback
+from config import settings
+from utils.compaction import compact_messages
+from utils.extraction_cache import ExtractionCache, prompt_version
+from utils.sessions import SESSION_ID_RE, new_session, new_session_id
+from utils.sse import ChunkFrameEncoder
+from utils.timing import current_timer, start_timer
+from utils.symptom_extractor import LOCAL_EXTRACTIONS, LLM_EXTRACTIONS, fallback_counter
+from utils.upstream import UpstreamClient, UpstreamError, create_openai_client
 load_dotenv()
 
-logging.basicConfig(level=logging.DEBUG)  # Debug logging enabled
-
 # Load OpenAI API Key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("Missing OpenAI API key in environment variables.")
 
-# Initialize OpenAI Client (Async)
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Initialize OpenAI Client (Async) over a pooled connection, behind a concurrency limit
+client = create_openai_client(
+    OPENAI_API_KEY,
+    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+    max_keepalive=settings.OPENAI_MAX_KEEPALIVE,
+    connect_timeout=settings.OPENAI_CONNECT_TIMEOUT_S,
+    read_timeout=settings.OPENAI_READ_TIMEOUT_S,
+)
+upstream = UpstreamClient(
+    client,
+    max_concurrency=settings.OPENAI_MAX_CONCURRENT_STREAMS,
+    queue_timeout=settings.OPENAI_QUEUE_TIMEOUT_S,
+    deadline=settings.OPENAI_TURN_DEADLINE_S,
+    max_retries=settings.OPENAI_MAX_RETRIES,
+    backoff=settings.OPENAI_RETRY_BACKOFF_S,
+    backoff_max=settings.OPENAI_RETRY_BACKOFF_MAX_S,
+)
 
 # FastAPI Router
 chat_router = APIRouter()
@@ -33,8 +51,13 @@ class Message(BaseModel):
     content: str
 
 class ChatRequest(BaseModel):
-    messages: List[Message]
+    messages: List[Message] = []
     accumulated_symptoms: Optional[List[str]] = []
+    full_drug_labels: bool = False  # Full FDA label sections instead of the compact summary
+    top_k: Optional[int] = None  # Alternative diseases to include (default PREDICT_TOP_K)
+    # Server-side session: send only the new `message` (and the returned session_id on later turns)
+    session_id: Optional[str] = None
+    message: Optional[str] = None
 
 
 SYSTEM_PROMPT = {
@@ -82,10 +105,126 @@ TOOLS = [
     }
 ]
 
-async def openai_stream_response(chat_request, medical_advice_data):
+EXTRACTION_MODEL = "gpt-4-turbo"
+
+# LLM extraction results for repeated messages; editing SYSTEM_PROMPT or TOOLS (or the
+# model) changes the prompt version, which clears the cache and changes every key.
+extraction_cache = ExtractionCache(
+    lambda: prompt_version(EXTRACTION_MODEL, SYSTEM_PROMPT, TOOLS),
+    maxsize=settings.EXTRACTION_CACHE_SIZE,
+    ttl=settings.EXTRACTION_CACHE_TTL_S,
+    max_message_chars=settings.EXTRACTION_CACHE_MAX_MESSAGE_CHARS,
+) if settings.EXTRACTION_CACHE_ENABLED else None
+
+def build_prompt(messages, known_symptoms):
+    """
+    [SYSTEM_PROMPT, *messages], compacted to the recent turns plus a summary of the
+    symptoms already known unless PROMPT_COMPACTION_ENABLED is off.
+    """
+    messages = [{"role": message.role, "content": message.content} for message in messages]
+    if not settings.PROMPT_COMPACTION_ENABLED:
+        return [SYSTEM_PROMPT, *messages]
+    return compact_messages(
+        SYSTEM_PROMPT, messages, known_symptoms,
+        max_messages=settings.PROMPT_MAX_MESSAGES, token_budget=settings.PROMPT_TOKEN_BUDGET,
+    )
+
+
+async def llm_tool_call_stream(messages, final_tool_calls, known_symptoms=()):
+    """
+    Streams the forced extract_top_symptoms tool call from OpenAI, re-emitting content
+    chunks as SSE frames and accumulating the tool call arguments in final_tool_calls.
+    """
+    response = upstream.stream_chat_completion(
+        model=EXTRACTION_MODEL,
+        messages=build_prompt(messages, known_symptoms),
+        tools=TOOLS,
+        tool_choice={"type": "function", "function": {"name": "extract_top_symptoms"}},
+    )
+
+    encoder = ChunkFrameEncoder(
+        drop_empty=settings.SSE_DROP_EMPTY_FRAMES,
+        coalesce_ms=settings.SSE_COALESCE_MS,
+        coalesce_bytes=settings.SSE_COALESCE_BYTES,
+    )
+
+    # Time to the first chunk (queueing, retries, OpenAI latency) vs. streaming the arguments
+    timer = current_timer()
+    started = first_chunk_at = time.perf_counter()
+    async for chunk in response:
+        if first_chunk_at == started:
+            first_chunk_at = time.perf_counter()
+        # ✅ Safely extract choices and tool_calls
+        choices = chunk.choices
+        if not choices:
+            continue  # ✅ Skip empty chunks
+
+        delta = choices[0].delta
+        tool_calls = getattr(delta, "tool_calls", None)
+
+        if tool_calls:
+            for tool_call in tool_calls:
+                index = tool_call.index
+                if index not in final_tool_calls:
+                    final_tool_calls[index] = {"name": tool_call.function.name, "arguments": ""}
+                
+                # ✅ Accumulate arguments as they come in chunks
+                if tool_call.function and tool_call.function.arguments:
+                    final_tool_calls[index]["arguments"] += tool_call.function.arguments
+
+        # ✅ Maintain the expected response format (envelope serialized once per stream)
+        frames = encoder.encode(chunk)
+        if frames:
+            yield frames
+
+    frames = encoder.flush()
+    if timer is not None:
+        timer.record("openai_ttft", first_chunk_at - started)
+        timer.record("openai_stream", time.perf_counter() - first_chunk_at)
+    if frames:
+        yield frames
+
+
+def last_user_message(messages):
+    for message in reversed(messages):
+        if message.role == "user":
+            return message.content
+    return ""
+
+
+def cache_extraction(message, final_tool_calls, frames):
+    """
+    Remembers a completed extract_top_symptoms call for the message it was made for.
+    """
+    tool_call = final_tool_calls.get(0)
+    if not tool_call or tool_call["name"] != "extract_top_symptoms":
+        return
+    try:
+        symptoms = json.loads(tool_call["arguments"]).get("symptoms", [])
+    except (json.JSONDecodeError, AttributeError):
+        return
+    if isinstance(symptoms, list) and all(isinstance(symptom, str) for symptom in symptoms):
+        extraction_cache.set(message, symptoms, frames)
+
+
+def session_reply(content):
+    """
+    What a turn's answer looks like in the stored history: text as is, structured
+    results without the drug details (they do not help the next extraction).
+    """
+    if isinstance(content, str):
+        return content
+    return json.dumps({"symptoms": content["symptoms"], "disease": content["disease"]})
+
+
+async def openai_stream_response(chat_request, prediction_service, symptom_extractor=None, session=None, session_id=None):
     """
     Async generator that streams responses from OpenAI and processes function tool calls.
+    Turns whose symptoms the local extractor can read confidently skip OpenAI entirely.
+    With a server-side session, the answer and the updated symptoms are recorded in it.
+    A final server_timing frame (before [DONE]) breaks the turn down by stage.
     """
+    timer = start_timer("chat")
     try:
         messages = chat_request.messages
         accumulated_symptoms = chat_request.accumulated_symptoms
@@ -93,60 +232,37 @@ async def openai_stream_response(chat_request, medical_advice_data):
         # logging.debug(f"Received messages: {messages}")
         logging.debug(f"Accumulated symptoms: {accumulated_symptoms}")
 
-        # ✅ Ensure messages are formatted correctly
-        tool_choice = "auto" if len(messages) < 2 else {"type": "function", "function": {"name": "extract_top_symptoms"}}
-        response = await client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[SYSTEM_PROMPT, *messages],
-            stream=True,
-            tools=TOOLS,
-            tool_choice={"type": "function", "function": {"name": "extract_top_symptoms"}},
-        )
-
-        final_tool_calls = {}
-
-        async for chunk in response:
-            logging.debug(f"Received chunk: {chunk}")
-
-            # ✅ Safely extract choices and tool_calls
-            choices = chunk.choices
-            if not choices:
-                continue  # ✅ Skip empty chunks
-
-            delta = choices[0].delta
-            tool_calls = getattr(delta, "tool_calls", None)
-
-            if tool_calls:
-                for tool_call in tool_calls:
-                    index = tool_call.index
-                    if index not in final_tool_calls:
-                        final_tool_calls[index] = {"name": tool_call.function.name, "arguments": ""}
-                    
-                    # ✅ Accumulate arguments as they come in chunks
-                    if tool_call.function and tool_call.function.arguments:
-                        final_tool_calls[index]["arguments"] += tool_call.function.arguments
-
-            content = getattr(delta, "content", None)
-
-            # ✅ Maintain the expected response format
-            response_data = {
-                "id": chunk.id,
-                "object": chunk.object,
-                "created": chunk.created,
-                "model": chunk.model,
-                "system_fingerprint": chunk.system_fingerprint,
-                "choices": [
-                    {
-                        "index": choices[0].index,
-                        "delta": {
-                            "content": content if content else None
-                        },
-                        "finish_reason": choices[0].finish_reason
-                    }
-                ]
-            }
-
-            yield f"data: {json.dumps(response_data)}\n\n"
+        user_message = last_user_message(messages)
+        with timer.stage("extract"):
+            extraction = symptom_extractor.extract(user_message) if symptom_extractor else None
+            local = extraction is not None and extraction.fallback_reason is None
+            cached = extraction_cache.get(user_message) if extraction_cache is not None and not local else None
+        if local:
+            # Same shape as the accumulated LLM tool call, so processing below is shared
+            extraction_path = "local"
+            LOCAL_EXTRACTIONS.inc()
+            final_tool_calls = {0: {"name": "extract_top_symptoms", "arguments": json.dumps({"symptoms": extraction.symptoms})}}
+        elif cached is not None:
+            # An earlier LLM answer to the same message: replay its frames, skip the call
+            extraction_path = "cache"
+            symptoms, frames = cached
+            if frames:
+                yield frames
+            final_tool_calls = {0: {"name": "extract_top_symptoms", "arguments": json.dumps({"symptoms": list(symptoms)})}}
+        else:
+            extraction_path = "llm"
+            LLM_EXTRACTIONS.inc()
+            if extraction is not None:
+                fallback_counter(extraction.fallback_reason).inc()
+            final_tool_calls = {}
+            frames = []
+            async for frame in llm_tool_call_stream(messages, final_tool_calls, accumulated_symptoms):
+                frames.append(frame)
+                yield frame
+            # Only context-free answers are reusable: with earlier turns in the prompt the
+            # model may also return symptoms stated there
+            if extraction_cache is not None and len(messages) == 1:
+                cache_extraction(user_message, final_tool_calls, "".join(frames))
 
         logging.debug(f"Final tool calls: {final_tool_calls}")
 
@@ -173,20 +289,23 @@ async def openai_stream_response(chat_request, medical_advice_data):
                             "Could you please tell me if you're experiencing additional symptoms?"
                         )
                     else:    
-                        cleaned_symptoms = preprocess_text(accumulated_symptoms)
-                        predicted_disease = predict_diseases(cleaned_symptoms)
+                        # Cached, or preprocess -> predict -> drug lookup in the prediction executor
+                        drug_detail = "full" if chat_request.full_drug_labels else "summary"
+                        # One pass gives the top-k diseases with their drugs looked up together
+                        top_k = max(1, min(chat_request.top_k or settings.PREDICT_TOP_K, settings.PREDICT_TOP_K))
+                        predictions = await prediction_service.diagnose_top_k(accumulated_symptoms, top_k, drug_detail)
+                        predicted_disease = predictions[0]["disease"]
+                        drug_info = predictions[0].pop("drugs", None)  # Sent as "drugs" below
 
                         logging.debug(f"Predicted Disease: {predicted_disease} type: {type(predicted_disease)}")                        
 
-                        drug_info = search_drug_info(predicted_disease, medical_advice_data, cleaned_symptoms)
-
                         if not drug_info:
                             drug_info = {
                                 "error": "No specific medications found for this condition."
                             }
 
                         # Ensure the disease name is formatted correctly
-                        if isinstance(predicted_disease, np.ndarray):  # If it's a NumPy array, extract the first element
+                        if isinstance(predicted_disease, (list, np.ndarray)):  # If it's a list/array, extract the first element
                             predicted_disease = predicted_disease[0]
 
                         if not isinstance(predicted_disease, str):  # Final check to ensure it's a string
@@ -194,10 +313,14 @@ async def openai_stream_response(chat_request, medical_advice_data):
 
                         predicted_disease = predicted_disease.strip().title()
 
+                        for prediction in predictions:
+                            prediction["disease"] = str(prediction["disease"]).strip().title()
+
                         content_string = {
                             "symptoms": accumulated_symptoms,
                             "disease": predicted_disease,                            
-                            "drugs": drug_info
+                            "drugs": drug_info,
+                            "predictions": predictions
                         }
                         logging.debug(f"Drug Info: {drug_info}")
 
@@ -205,7 +328,7 @@ async def openai_stream_response(chat_request, medical_advice_data):
                         "id": f"tool-call-{index}",
                         "object": "function_result",
                         "created": int(asyncio.get_event_loop().time()),
-                        "model": "gpt-4-turbo",
+                        "model": EXTRACTION_MODEL,
                         "system_fingerprint": "function_call",
                         "choices": [
                             {
@@ -217,36 +340,94 @@ async def openai_stream_response(chat_request, medical_advice_data):
                             }
                         ],
                         "accumulated_symptoms": accumulated_symptoms,
+                        "extraction": extraction_path,  # "local" (lexicon matcher), "cache" or "llm" (tool call)
                     }
+                    if session is not None:
+                        function_response_data["session_id"] = session_id
+                        session["messages"].append({"role": "assistant", "content": session_reply(content_string)})
+                        session["accumulated_symptoms"] = accumulated_symptoms
 
-                    yield f"data: {json.dumps(function_response_data)}\n\n"
+                    with timer.stage("serialize"):
+                        frame = f"data: {json.dumps(function_response_data)}\n\n"
+                    yield frame
 
                 except json.JSONDecodeError as e:
                     logging.error(f"JSON Decode Error: {e}")
                     yield f"data: {{'error': 'Invalid function response format'}}\n\n"
 
+        if settings.SERVER_TIMING_ENABLED:
+            timer.finish()
+            yield f"data: {json.dumps({'object': 'server_timing', 'server_timing': timer.as_dict()})}\n\n"
+
         yield "data: [DONE]\n\n"
 
+    except UpstreamError as e:
+        # Busy or out of time: tell the client it may simply try the turn again
+        logging.warning(f"OpenAI upstream unavailable: {e}")
+        yield f"data: {json.dumps({'error': str(e), 'retryable': e.retryable})}\n\n"
+
     except Exception as e:
         # Log the error with traceback
         logging.error(traceback.format_exc())
         logging.error(f"OpenAI API Error: {e}")
         yield f"data: {{'error': 'Error fetching response from OpenAI'}}\n\n"
 
+    finally:
+        timer.finish()
+
 
 @chat_router.post("/chat")
 async def chat(request: Request, chat_request: ChatRequest):
     """
     Endpoint for streaming OpenAI chat responses with function tooling.
+
+    Clients either send the full `messages` history and `accumulated_symptoms` every
+    turn, or only the new `message` plus the `session_id` returned by the first turn
+    (X-Session-Id header and the function_result frame), in which case the history
+    and symptoms are kept in the server-side session store.
     """
     
     messages = chat_request.messages
-    medical_advice_data = request.app.state.medical_advice_data
-
-    if not messages:
-        raise HTTPException(status_code=400, detail="Missing 'messages' field in request body.")
-
-    return StreamingResponse(openai_stream_response(chat_request, medical_advice_data), media_type="text/event-stream")
+    prediction_service = request.app.state.prediction_service
+    symptom_extractor = request.app.state.symptom_extractor
+
+    if chat_request.session_id is None and chat_request.message is None:
+        if not messages:
+            raise HTTPException(status_code=400, detail="Missing 'messages' field in request body.")
+        return StreamingResponse(openai_stream_response(chat_request, prediction_service, symptom_extractor), media_type="text/event-stream")
+
+    if not chat_request.message or not chat_request.message.strip():
+        raise HTTPException(status_code=400, detail="Missing 'message' field in request body.")
+    session_id = chat_request.session_id or new_session_id()
+    if not SESSION_ID_RE.match(session_id):
+        raise HTTPException(status_code=400, detail="Invalid 'session_id'.")
+
+    session_store = request.app.state.session_store
+    session = session_store.get(session_id) or new_session()
+    session["messages"].append({"role": "user", "content": chat_request.message})
+    session["messages"] = session["messages"][-settings.SESSION_MAX_MESSAGES:]
+    chat_request.messages = [Message(**message) for message in session["messages"]]
+    chat_request.accumulated_symptoms = list(session["accumulated_symptoms"])
+
+    async def stream_and_save():
+        turn_start = len(session["messages"])
+        async for frame in openai_stream_response(chat_request, prediction_service, symptom_extractor, session, session_id):
+            yield frame
+        # Only completed turns are stored; a failed stream leaves the session unchanged
+        if len(session["messages"]) > turn_start:
+            session["messages"] = session["messages"][-settings.SESSION_MAX_MESSAGES:]
+            session_store.save(session_id, session)
+
+    return StreamingResponse(stream_and_save(), media_type="text/event-stream", headers={"X-Session-Id": session_id})
+
+
+@chat_router.delete("/chat/sessions/{session_id}")
+async def end_session(request: Request, session_id: str):
+    """
+    Forgets a server-side conversation.
+    """
+    request.app.state.session_store.delete(session_id)
+    return {"status": "deleted", "session_id": session_id}
 
 def generate_advice(disease: str) -> str:
     """
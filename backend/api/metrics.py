@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from utils.metrics import REGISTRY, render_prometheus
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/stats", summary="Internal counters and histograms")
+def stats():
+    """
+    Returns a JSON snapshot of every registered metric (batch sizes, wait times, ...).
+    """
+    return REGISTRY.snapshot()
+
+@metrics_router.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    The same metrics in the Prometheus text format, for scraping.
+    """
+    return PlainTextResponse(render_prometheus(REGISTRY), media_type="text/plain; version=0.0.4")
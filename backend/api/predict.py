@@ -1,54 +1,220 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import joblib
-from utils.preprocess import preprocess_text
+from typing import Optional
+import json
+from config import settings
+from utils.timing import start_timer
 
 predict_router = APIRouter()
 
-# Load pre-trained models
-model = joblib.load("models/ent_symptom_model.pkl")
-vectorizer = joblib.load("models/vectorizer.pkl")
-label_encoder = joblib.load("models/label_encoder.pkl")
-
 class SymptomInput(BaseModel):
     symptoms: str
+    top_k: Optional[int] = None  # Candidates to return, 1..PREDICT_TOP_K (the default)
 
-@predict_router.post("/predict", summary="Predict disease from symptoms")
-def predict_disease(data: SymptomInput):
-    try:
-        symptoms_text = data.symptoms.strip()
-        if not symptoms_text:
-            raise HTTPException(status_code=400, detail="No symptoms provided")
 
-        # Preprocess input text
-        cleaned_text = preprocess_text(symptoms_text)
+def _resolve_top_k(top_k):
+    if top_k is None:
+        return settings.PREDICT_TOP_K
+    if not 1 <= top_k <= settings.PREDICT_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {settings.PREDICT_TOP_K}")
+    return top_k
 
-        # Convert to TF-IDF vector
-        text_vectorized = vectorizer.transform([cleaned_text])
+@predict_router.post("/predict", summary="Predict disease from symptoms")
+async def predict_disease(request: Request, data: SymptomInput):
+    symptoms_text = data.symptoms.strip()
+    if not symptoms_text:
+        raise HTTPException(status_code=400, detail="No symptoms provided")
+    top_k = _resolve_top_k(data.top_k)
+    timer = start_timer("predict")
 
-        # Predict disease
-        prediction = model.predict(text_vectorized)
-        predicted_disease = label_encoder.inverse_transform(prediction)[0]
+    try:
+        # Comma separated symptoms; cached, or preprocessed, vectorized and predicted in
+        # the prediction executor together with any other in-flight requests
+        predictions = await request.app.state.prediction_service.diagnose_top_k(symptoms_text.split(","), top_k)
 
-        return {"predicted_disease": predicted_disease}
+        with timer.stage("serialize"):
+            response = JSONResponse({"predicted_disease": predictions[0]["disease"], "predictions": predictions})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    timer.finish()
+    if settings.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+
+
+def _parse_record(index, record):
+    """
+    Normalizes one bulk input record into (id, symptom list).
+    Records are a comma separated string, a list of symptoms, or {"id": ..., "symptoms": ...}.
+    """
+    record_id = index
+    if isinstance(record, dict):
+        record_id = record.get("id", index)
+        record = record.get("symptoms")
+
+    if isinstance(record, str):
+        symptoms = record.split(",")
+    elif isinstance(record, list) and all(isinstance(s, str) for s in record):
+        symptoms = record
+    else:
+        raise ValueError("symptoms must be a string or a list of strings")
+
+    if not any(s.strip() for s in symptoms):
+        raise ValueError("No symptoms provided")
+    return record_id, symptoms
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator reads the request upload as it goes.
+    Starlette's disconnect listener would swallow the upload chunks, so it is not
+    started; a client disconnect surfaces as ClientDisconnect from request.stream().
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _ndjson_records(request, max_line_bytes):
+    """
+    Yields decoded NDJSON lines as the upload arrives, holding at most one partial line.
+    Lines that are not valid JSON, or longer than max_line_bytes, are yielded as the
+    ValueError describing them; the rest of an over-long line is skipped unbuffered.
+    """
+    buffer = b""
+    skipping = False  # Inside a line already reported as too long
+    async for chunk in request.stream():
+        if skipping:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                continue
+            chunk, skipping = chunk[newline + 1:], False
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if len(line) > max_line_bytes:
+                yield _line_too_long(max_line_bytes)
+            elif line.strip():
+                yield _decode_line(line)
+        if len(buffer) > max_line_bytes:
+            yield _line_too_long(max_line_bytes)
+            buffer, skipping = b"", True
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _line_too_long(max_line_bytes):
+    return ValueError(f"Line longer than {max_line_bytes} bytes")
 
-def predict_diseases(symptom_texts):
+
+async def _read_json_body(request, max_bytes):
+    """
+    The request body parsed as JSON, refusing with 413 once it exceeds max_bytes.
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"JSON bodies are limited to {max_bytes} bytes; upload larger batches as NDJSON "
+               "(Content-Type: application/x-ndjson)",
+    )
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+
+def _decode_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON line: {e}")
+
+
+async def _list_records(records):
+    for record in records:
+        yield record
+
+
+async def _score_chunks(service, records, chunk_size, top_k=1):
     """
-    Accepts either a single symptom string or a list of symptom strings.
-    Returns the predicted disease(s).
+    Groups records into chunks, scores each chunk with one model call and yields
+    one NDJSON line per record, in input order, as soon as its chunk is done.
     """
-    # If a single string is passed, convert it into a list
-    if isinstance(symptom_texts, str):
-        symptom_texts = [symptom_texts]
-    
-    # Transform the list of symptom strings using the vectorizer
-    text_vectorized = vectorizer.transform(symptom_texts)
-    # Get predictions for each text entry
-    predictions = model.predict(text_vectorized)
-    # Convert numerical labels back to disease names
-    predicted_diseases = label_encoder.inverse_transform(predictions)
-    return predicted_diseases
\ No newline at end of file
+    chunk = []  # (index, record_id, symptoms or None, error or None)
+
+    async def flush():
+        valid = [entry for entry in chunk if entry[3] is None]
+        results = await service.diagnose_many([symptoms for _, _, symptoms, _ in valid], top_k=top_k) if valid else []
+        scored = {index: result for (index, _, _, _), result in zip(valid, results)}
+
+        lines = []
+        for index, record_id, _, error in chunk:
+            if error is None:
+                disease, _, predictions = scored[index]
+                lines.append(json.dumps({"index": index, "id": record_id, "predicted_disease": disease, "predictions": predictions}))
+            else:
+                lines.append(json.dumps({"index": index, "id": record_id, "error": error}))
+        chunk.clear()
+        return "".join(line + "\n" for line in lines)
+
+    index = 0
+    async for record in records:
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            record_id, symptoms = _parse_record(index, record)
+            chunk.append((index, record_id, symptoms, None))
+        except ValueError as e:
+            chunk.append((index, index, None, str(e)))
+        index += 1
+
+        if len(chunk) >= chunk_size:
+            yield await flush()
+
+    if chunk:
+        yield await flush()
+
+
+@predict_router.post("/predict/batch", summary="Predict diseases for many symptom records (NDJSON out)")
+async def predict_batch(request: Request, top_k: int = 1):
+    """
+    Bulk scoring for offline jobs. Accepts a JSON array (or {"symptoms": [...]}) of up to
+    PREDICT_BULK_MAX_JSON_BYTES (413 above that) or an NDJSON upload of any size
+    (Content-Type: application/x-ndjson), one record of up to PREDICT_BULK_MAX_LINE_BYTES
+    per line. Records are scored in PREDICT_BULK_CHUNK_SIZE chunks and results stream back
+    as NDJSON in input order; NDJSON uploads are read incrementally, so memory stays
+    bounded by the chunk size and the line cap.
+    Each result carries the ?top_k= (default 1) most likely diseases with their probabilities.
+    """
+    service = request.app.state.prediction_service
+    top_k = _resolve_top_k(top_k)
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return UploadStreamingResponse(
+            _score_chunks(service, _ndjson_records(request, settings.PREDICT_BULK_MAX_LINE_BYTES), settings.PREDICT_BULK_CHUNK_SIZE, top_k),
+            media_type="application/x-ndjson",
+        )
+
+    body = await _read_json_body(request, settings.PREDICT_BULK_MAX_JSON_BYTES)
+    records = body.get("symptoms") if isinstance(body, dict) else body
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail='Expected a JSON array or {"symptoms": [...]}')
+
+    return StreamingResponse(
+        _score_chunks(service, _list_records(records), settings.PREDICT_BULK_CHUNK_SIZE, top_k),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,493 @@
+"""
+End-to-end load benchmark for /chat and /predict.
+
+Starts the fake OpenAI server and the real app (uvicorn main:app, i.e. create_app())
+as subprocesses, drives many concurrent multi-turn conversations through /chat and
+single requests through /predict, and writes TTFB / full-stream latency percentiles,
+throughput and per-process RSS to a JSON file.
+
+    cd backend
+    python -m benchmarks.chat_load --conversations 200 --concurrency 50
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+App settings (PREDICT_EXECUTOR, SYMPTOM_EXTRACTOR_ENABLED, ...) are read from the
+environment as usual, so set them on the command line to benchmark a configuration.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import tempfile
+import time
+from datetime import datetime, timezone
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Multi-turn conversations: the third symptom triggers the prediction + drug lookup
+CONVERSATIONS = [
+    ["I have ear pain", "also a fever", "and some hearing loss"],
+    ["My nose is blocked", "I keep sneezing", "my eyes are itchy and watery"],
+    ["There is ringing in my ears", "I get dizziness", "and nausea sometimes"],
+    ["I have a sore throat", "hoarseness since yesterday", "and difficulty swallowing"],
+    ["Hi there", "I have vertigo", "with vomiting and hearing loss"],
+    ["my ear feels plugged", "ear pressure when flying", "popping sensation and ear pain"],
+]
+
+PREDICT_INPUTS = [
+    "ear pain, fever, hearing loss",
+    "nasal congestion, sneezing, itchy eyes",
+    "ringing in ears, dizziness, nausea",
+    "sore throat, hoarseness, difficulty swallowing",
+    "vertigo, vomiting, hearing loss",
+    "ear pressure, popping sensation, ear pain",
+    "facial paralysis, ear pain, rash",
+    "snoring, mouth breathing, enlarged adenoids",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(values):
+    """
+    Nearest-rank p50/p90/p99 plus mean and max, in milliseconds.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(q):
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": rank(0.50),
+        "p90_ms": rank(0.90),
+        "p99_ms": rank(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def process_tree(root_pid):
+    """
+    Returns [root_pid, *descendants] by walking /proc (Linux only).
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def shared_memory_mb(pid):
+    """
+    (PSS, USS) in MB from /proc/<pid>/smaps_rollup: RSS with shared pages split
+    between the processes mapping them, and the pages only this process holds.
+    RSS alone counts pages shared copy-on-write with preforked siblings once per process.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("Pss", "Private_Clean", "Private_Dirty"):
+                    fields[name] = int(rest.split()[0]) / 1024
+    except (OSError, ValueError):
+        return None, None
+    if "Pss" not in fields:
+        return None, None
+    return fields["Pss"], fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+
+
+def cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()[:120]
+    except OSError:
+        return ""
+
+
+class RssSampler:
+    """
+    Samples the RSS of every process in the app's tree (uvicorn workers and
+    prediction pool workers) in a background thread, keeping peak and last values,
+    plus the last PSS / USS (shared_memory_mb) where the kernel reports them.
+    """
+
+    def __init__(self, root_pid, interval=0.25):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.samples = {}  # pid -> {"cmd", "peak_mb", "last_mb"}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        for pid in process_tree(self.root_pid):
+            value = rss_mb(pid)
+            if value is None:
+                continue
+            entry = self.samples.setdefault(pid, {"cmd": cmdline(pid), "peak_mb": 0.0, "last_mb": 0.0})
+            entry["peak_mb"] = max(entry["peak_mb"], value)
+            entry["last_mb"] = value
+            pss, uss = shared_memory_mb(pid)
+            if pss is not None:
+                entry["pss_mb"], entry["uss_mb"] = pss, uss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        return {
+            str(pid): {**entry, "role": "app" if pid == self.root_pid else "worker"}
+            for pid, entry in sorted(self.samples.items())
+        }
+
+
+def start_process(args, env, ready_url, log_path, timeout=120):
+    """
+    Starts a server subprocess (output to log_path) and waits until ready_url answers 200.
+    """
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, "rb") as f:
+                raise RuntimeError(f"{' '.join(args[1:3])} exited early:\n{f.read().decode(errors='replace')[-2000:]}")
+        try:
+            if httpx.get(ready_url, timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{ready_url} not ready after {timeout}s")
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+class RawHTTPClient:
+    """
+    Minimal keep-alive HTTP/1.1 client on asyncio streams (Content-Length and chunked
+    bodies). httpx's AsyncClient costs a few milliseconds per request under high
+    concurrency, which would end up in the latencies measured here.
+    """
+
+    def __init__(self, host, port, max_connections):
+        self.host = host
+        self.port = port
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def _connection(self):
+        if self._idle:
+            return self._idle.pop()
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def post(self, path, payload):
+        """
+        Returns (status, ttfb, total, body) where ttfb is the time to the first body byte.
+        """
+        body = json.dumps(payload).encode()
+        request = (
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode() + body
+
+        async with self._slots:
+            reader, writer = await self._connection()
+            started = time.perf_counter()
+            try:
+                writer.write(request)
+                await writer.drain()
+                head = await reader.readuntil(b"\r\n\r\n")
+                status = int(head.split(b" ", 2)[1])
+                headers = {
+                    name.strip().lower(): value.strip()
+                    for name, _, value in (line.partition(b":") for line in head.split(b"\r\n")[1:] if line)
+                }
+
+                ttfb, chunks = None, []
+                if headers.get(b"transfer-encoding") == b"chunked":
+                    while True:
+                        size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                        if size == 0:
+                            await reader.readuntil(b"\r\n")
+                            break
+                        chunk = await reader.readexactly(size + 2)
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - started
+                        chunks.append(chunk[:-2])
+                else:
+                    chunks.append(await reader.readexactly(int(headers.get(b"content-length", b"0"))))
+                    ttfb = time.perf_counter() - started
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                raise
+            total = time.perf_counter() - started
+
+            if headers.get(b"connection") == b"close":
+                writer.close()
+            else:
+                self._idle.append((reader, writer))
+        return status, (ttfb if ttfb is not None else total), total, b"".join(chunks).decode(errors="replace")
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+async def timed_post(client, url, payload):
+    """
+    POSTs and reads the whole (possibly streamed) body. Returns (ttfb, total, body, ok).
+    """
+    started = time.perf_counter()
+    try:
+        status, ttfb, total, body = await client.post(url, payload)
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        total = time.perf_counter() - started
+        return total, total, "", False
+    return ttfb, total, body, status == 200
+
+
+def parse_function_result(body):
+    """
+    Returns the decoded function_result frame of a /chat SSE stream, if any.
+    """
+    for frame in body.split("\n\n"):
+        if frame.startswith("data: {") and '"function_result"' in frame:
+            try:
+                return json.loads(frame[len("data: "):])
+            except ValueError:
+                return None
+    return None
+
+
+async def run_conversation(client, turns, stats, use_sessions=False):
+    messages, accumulated, session_id = [], [], None
+    for text in turns:
+        messages.append({"role": "user", "content": text})
+        if use_sessions:
+            payload = {"message": text, **({"session_id": session_id} if session_id else {})}
+        else:
+            payload = {"messages": messages, "accumulated_symptoms": accumulated}
+        ttfb, total, body, ok = await timed_post(client, "/chat", payload)
+        result = parse_function_result(body) if ok else None
+        stats["ttfb"].append(ttfb)
+        stats["total"].append(total)
+        stats["request_bytes"] += len(json.dumps(payload))
+        if result is None:
+            stats["errors"] += 1
+            continue
+
+        accumulated = result.get("accumulated_symptoms", accumulated)
+        session_id = result.get("session_id", session_id)
+        path = result.get("extraction", "llm")
+        stats["extraction"][path] = stats["extraction"].get(path, 0) + 1
+        content = result["choices"][0]["delta"]["content"]
+        messages.append({"role": "assistant", "content": content if isinstance(content, str) else json.dumps(content)})
+
+
+async def run_chat(port, n_conversations, concurrency, seed, use_sessions=False):
+    rng = random.Random(seed)
+    stats = {"ttfb": [], "total": [], "errors": 0, "extraction": {}, "request_bytes": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    client = RawHTTPClient("127.0.0.1", port, concurrency)
+
+    async def one():
+        async with semaphore:
+            await run_conversation(client, rng.choice(CONVERSATIONS), stats, use_sessions)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_conversations)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+
+    return {
+        "conversations": n_conversations,
+        "concurrency": concurrency,
+        "requests": len(stats["total"]),
+        "errors": stats["errors"],
+        "elapsed_s": elapsed,
+        "requests_per_s": len(stats["total"]) / elapsed,
+        "mean_request_bytes": stats["request_bytes"] / max(1, len(stats["total"])),
+        "ttfb": percentiles(stats["ttfb"]),
+        "stream": percentiles(stats["total"]),
+        "extraction": stats["extraction"],
+    }
+
+
+async def run_predict(port, n_requests, concurrency, seed):
+    rng = random.Random(seed)
+    ttfbs, totals, errors = [], [], 0
+    client = RawHTTPClient("127.0.0.1", port, concurrency)
+
+    async def one():
+        nonlocal errors
+        # A random subset of each symptom list mixes cache hits and misses
+        symptoms = [s for s in rng.choice(PREDICT_INPUTS).split(", ") if rng.random() > 0.2]
+        ttfb, total, _, ok = await timed_post(client, "/predict", {"symptoms": ", ".join(symptoms) or "fever"})
+        ttfbs.append(ttfb)
+        totals.append(total)
+        errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "requests_per_s": n_requests / elapsed,
+        "ttfb": percentiles(ttfbs),
+        "latency": percentiles(totals),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100, help="multi-turn /chat conversations")
+    parser.add_argument("--concurrency", type=int, default=25, help="concurrent conversations")
+    parser.add_argument("--predict-requests", type=int, default=1000)
+    parser.add_argument("--predict-concurrency", type=int, default=50)
+    parser.add_argument("--sessions", action="store_true", help="send only the new message with a server-side session")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--server", choices=("uvicorn", "prefork"), default="uvicorn",
+                        help="uvicorn --workers (spawned) or python main.py with SERVER_WORKERS (preforked)")
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="fake OpenAI time to first chunk")
+    parser.add_argument("--token-rate", type=float, default=40.0, help="fake OpenAI chunks per second")
+    parser.add_argument("--args-chunk-chars", type=int, default=8, help="tool-call argument characters per chunk")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<utc time>_<commit>.json)")
+    args = parser.parse_args()
+
+    openai_port, app_port = free_port(), free_port()
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_port}/v1"
+    env["PYTHONPATH"] = BACKEND_DIR
+    log_dir = tempfile.mkdtemp(prefix="chat_load_")
+    if args.sessions and args.workers > 1:
+        # Per-worker memory sessions would lose turns that land on another worker
+        env.setdefault("SESSION_STORE", "sqlite")
+        env.setdefault("SESSION_SQLITE_PATH", os.path.join(log_dir, "sessions.sqlite3"))
+
+    fake_openai = start_process(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(openai_port),
+         "--first-token-ms", str(args.first_token_ms), "--token-rate", str(args.token_rate),
+         "--args-chunk-chars", str(args.args_chunk_chars)],
+        env, f"http://127.0.0.1:{openai_port}/stats", os.path.join(log_dir, "fake_openai.log"),
+    )
+    app = None
+    try:
+        app_started = time.perf_counter()
+        if args.server == "prefork":
+            command = [sys.executable, "main.py"]
+            env.update(SERVER_HOST="127.0.0.1", SERVER_PORT=str(app_port), SERVER_WORKERS=str(args.workers))
+        else:
+            command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+                       "--workers", str(args.workers), "--log-level", "warning"]
+        app = start_process(command, env, f"http://127.0.0.1:{app_port}/health/ready", os.path.join(log_dir, "app.log"))
+        startup_s = time.perf_counter() - app_started
+
+        sampler = RssSampler(app.pid)
+        sampler.start()
+        chat = asyncio.run(run_chat(app_port, args.conversations, args.concurrency, args.seed, args.sessions))
+        predict = asyncio.run(run_predict(app_port, args.predict_requests, args.predict_concurrency, args.seed))
+        rss = sampler.stop()
+        upstream_requests = httpx.get(f"http://127.0.0.1:{openai_port}/stats").json()["requests"]
+    finally:
+        if app is not None:
+            stop_process(app)
+        stop_process(fake_openai)
+
+    now = datetime.now(timezone.utc)
+    commit = git_commit()
+    result = {
+        "meta": {
+            "timestamp": now.isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "settings": {k: v for k, v in os.environ.items() if k.startswith(("PREDICT", "PREDICTION", "DRUG", "SYMPTOM"))},
+        },
+        "startup_s": startup_s,
+        "chat": {**chat, "upstream_requests": upstream_requests},
+        "predict": predict,
+        "rss": rss,
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{now.strftime('%Y%m%dT%H%M%SZ')}_{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps({k: result[k] for k in ("startup_s", "chat", "predict")}, indent=2))
+    print(f"Saved {out} (server logs in {log_dir})")
+
+
+if __name__ == "__main__":
+    main()
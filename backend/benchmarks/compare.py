@@ -0,0 +1,86 @@
+"""
+Compares two chat_load result files and flags regressions.
+
+    python -m benchmarks.compare benchmarks/results/<baseline>.json benchmarks/results/<candidate>.json
+
+Exits with status 1 when a tracked metric got worse by more than --threshold.
+"""
+import argparse
+import json
+import sys
+
+# (path in the result file, True when higher is better)
+TRACKED = [
+    (("chat", "requests_per_s"), True),
+    (("chat", "ttfb", "p50_ms"), False),
+    (("chat", "ttfb", "p99_ms"), False),
+    (("chat", "stream", "p50_ms"), False),
+    (("chat", "stream", "p99_ms"), False),
+    (("predict", "requests_per_s"), True),
+    (("predict", "latency", "p50_ms"), False),
+    (("predict", "latency", "p99_ms"), False),
+    (("chat", "errors"), False),
+    (("predict", "errors"), False),
+]
+
+
+def lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def peak_rss(result):
+    return sum(entry["peak_mb"] for entry in result.get("rss", {}).values()) or None
+
+
+def total_pss(result):
+    """
+    Memory of the whole process tree with shared pages counted once (older results have no PSS).
+    """
+    return sum(entry.get("pss_mb", 0.0) for entry in result.get("rss", {}).values()) or None
+
+
+def compare(baseline, candidate, threshold):
+    """
+    Returns [(metric, baseline, candidate, relative change, regressed)].
+    """
+    rows = []
+    metrics = [(".".join(path), lookup(baseline, path), lookup(candidate, path), higher) for path, higher in TRACKED]
+    metrics.append(("rss.total_peak_mb", peak_rss(baseline), peak_rss(candidate), False))
+    metrics.append(("rss.total_pss_mb", total_pss(baseline), total_pss(candidate), False))
+
+    for name, old, new, higher_is_better in metrics:
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher_is_better else change
+        rows.append((name, old, new, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline {baseline['meta'].get('commit')}  candidate {candidate['meta'].get('commit')}")
+    rows = compare(baseline, candidate, args.threshold)
+    for name, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:28} {old:12.2f} -> {new:12.2f}  {change:+8.1%}{flag}")
+
+    sys.exit(1 if any(regressed for *_, regressed in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
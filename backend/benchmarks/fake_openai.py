@@ -0,0 +1,114 @@
+"""
+Local stand-in for OpenAI's streaming chat completions endpoint.
+
+Answers every request with a streamed extract_top_symptoms tool call, so /chat can
+be load tested without network access or API spend. The app's AsyncOpenAI client
+is pointed here through OPENAI_BASE_URL (the SDK reads it from the environment).
+
+    python -m benchmarks.fake_openai --port 9100 --first-token-ms 300 --token-rate 40
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from utils.symptom_lexicon import SYMPTOM_PHRASES
+
+# Longest phrases first so "sudden hearing loss" wins over "hearing loss"
+_PATTERNS = [
+    (phrase, re.compile(rf"\b{re.escape(phrase)}\b"))
+    for phrase in sorted(SYMPTOM_PHRASES, key=len, reverse=True)
+]
+
+
+def extract_symptoms(text):
+    """
+    Deterministic stand-in for the model's extraction: lexicon phrases found in the text.
+    """
+    text = text.lower()
+    found = []
+    for phrase, pattern in _PATTERNS:
+        if pattern.search(text) and not any(phrase in longer for longer in found):
+            found.append(phrase)
+    return found
+
+
+def _chunk(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "system_fingerprint": "fp_fake",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def create_fake_openai(first_token_ms=300.0, token_rate=40.0, args_chunk_chars=8):
+    """
+    first_token_ms: delay before the first chunk (upstream queueing + prompt processing)
+    token_rate: tool-call argument chunks streamed per second
+    args_chunk_chars: characters of JSON arguments per chunk
+    """
+    app = FastAPI(title="Fake OpenAI")
+    app.state.requests = 0
+
+    async def stream(body):
+        messages = body.get("messages", [])
+        user_text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        arguments = json.dumps({"symptoms": extract_symptoms(user_text)})
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "gpt-4-turbo")
+        interval = 1.0 / token_rate if token_rate > 0 else 0.0
+
+        await asyncio.sleep(first_token_ms / 1000)
+        yield f"data: {json.dumps(_chunk(completion_id, model, {'role': 'assistant', 'content': None}))}\n\n"
+
+        yield "data: " + json.dumps(_chunk(completion_id, model, {"tool_calls": [{
+            "index": 0, "id": f"call_{completion_id[-8:]}", "type": "function",
+            "function": {"name": "extract_top_symptoms", "arguments": ""},
+        }]})) + "\n\n"
+
+        for start in range(0, len(arguments), args_chunk_chars):
+            await asyncio.sleep(interval)
+            piece = arguments[start:start + args_chunk_chars]
+            yield "data: " + json.dumps(_chunk(completion_id, model, {"tool_calls": [{
+                "index": 0, "function": {"arguments": piece},
+            }]})) + "\n\n"
+
+        yield f"data: {json.dumps(_chunk(completion_id, model, {}, finish_reason='tool_calls'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        return StreamingResponse(stream(body), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-rate", type=float, default=40.0)
+    parser.add_argument("--args-chunk-chars", type=int, default=8)
+    args = parser.parse_args()
+
+    app = create_fake_openai(args.first_token_ms, args.token_rate, args.args_chunk_chars)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Micro-benchmarks and cold-start measurements for the prediction stack.
+
+Measures, in-process: preprocess_text, the fused featurizer, predict_diseases for
+single rows and batches (latency and rows/s per batch size), diagnose_batch with
+drugs, match_drug_relevance and search_drug_info (JSON and compiled store), and
+peak traced memory of loading and predicting. In fresh subprocesses: cold import of
+api/__init__.py, create_app(), the model load and the drug data load, plus max RSS.
+
+    cd backend
+    python -m benchmarks.micro                          # full run, saved under benchmarks/results/
+    python -m benchmarks.micro --quick --check          # CI: compare with benchmarks/baselines/micro.json
+    python -m benchmarks.micro --quick --update-baseline
+
+--check exits with status 1 when a metric is worse than the baseline by more than
+--threshold. Timings are best-of-repeats, which is the most stable statistic on a
+shared machine, but baselines are still machine specific: record them on the
+machine (or CI runner type) that checks against them.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+BASELINE_PATH = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "micro.json")
+
+BATCH_SIZES = (1, 8, 32, 128)
+
+SYMPTOM_LISTS = [
+    ["ear pain", "fever", "hearing loss"],
+    ["nasal congestion", "sneezing", "itchy eyes", "runny nose"],
+    ["ringing in ears", "dizziness", "nausea"],
+    ["sore throat", "hoarseness", "difficulty swallowing"],
+    ["vertigo", "vomiting", "hearing loss", "ear fullness"],
+    ["ear pressure", "popping sensation", "ear pain"],
+    ["facial paralysis", "ear pain", "rash"],
+    ["snoring", "mouth breathing", "enlarged adenoids"],
+]
+
+# Run in a fresh interpreter: import, app construction and loads as the server does them
+STARTUP_SCRIPT = """
+import json, resource, time
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+app, _ = api.create_app()
+created = time.perf_counter()
+bundle = app.state.model_registry.get()
+app.state.symptom_extractor = app.state.make_symptom_extractor(bundle)
+models = time.perf_counter()
+app.state.apply_drug_data(app.state.load_drug_data())
+drugs = time.perf_counter()
+print(json.dumps({
+    "import_api_s": imported - started,
+    "create_app_s": created - imported,
+    "model_load_s": models - created,
+    "drug_data_s": drugs - models,
+    "total_s": drugs - started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+# metric name prefix -> True when higher is better (everything else: lower is better)
+HIGHER_IS_BETTER = ("throughput.",)
+
+
+def best_us(fn, number, repeat):
+    """
+    Best per-call time over `repeat` runs of `number` calls, in microseconds.
+    """
+    return min(timeit.Timer(fn).repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def traced_peak_mb(fn):
+    """
+    Peak memory traced (Python and NumPy allocations) while fn runs, in MB.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def symptom_batch(size, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(SYMPTOM_LISTS) for _ in range(size)]
+
+
+def bench_prediction(quick):
+    """
+    In-process latency, throughput and memory of the prediction stack.
+    """
+    from utils import pipeline
+    from utils.drug import match_drug_relevance, search_drug_info
+    from utils.drug_index import DrugIndex
+    from utils.drug_store import compile_drug_data, open_drug_data
+    from utils.predict import predict_diseases
+    from utils.preprocess import preprocess_text
+    from utils.registry import ModelBundle, registry
+    from api import DRUG_DATA_PATH
+
+    repeat = 3 if quick else 7
+    number = 50 if quick else 200
+    metrics = {}
+    bundle = registry.get()
+    texts = [preprocess_text(symptoms) for symptoms in SYMPTOM_LISTS]
+
+    metrics["latency.preprocess_text_us"] = best_us(lambda: preprocess_text(SYMPTOM_LISTS[1]), number * 10, repeat)
+    if bundle.featurizer is not None:
+        metrics["latency.featurize_single_us"] = best_us(lambda: bundle.featurizer.transform([SYMPTOM_LISTS[1]]), number * 4, repeat)
+        batch = symptom_batch(32)
+        metrics["latency.featurize_batch32_us"] = best_us(lambda: bundle.featurizer.transform(batch), number, repeat)
+
+    # predict_diseases takes preprocessed strings; one call per batch
+    for size in BATCH_SIZES:
+        batch = [texts[i % len(texts)] for i in range(size)]
+        per_call = best_us(lambda: predict_diseases(batch), max(5, number // size), repeat)
+        metrics[f"latency.predict_batch{size}_us"] = per_call
+        metrics[f"throughput.predict_batch{size}_rows_per_s"] = size / (per_call / 1e6)
+
+    with open(DRUG_DATA_PATH) as f:
+        drug_data = json.load(f)
+    pipeline.set_medical_advice_data(drug_data)
+    requests = [(symptoms, "summary") for symptoms in symptom_batch(8, seed=1)]
+    metrics["latency.diagnose_single_summary_us"] = best_us(lambda: pipeline.diagnose_batch(requests[:1]), number, repeat)
+    metrics["latency.diagnose_batch8_summary_us"] = best_us(lambda: pipeline.diagnose_batch(requests), number // 2, repeat)
+
+    # The disease with the most drugs is the worst case for relevance ranking
+    disease = max(drug_data, key=lambda name: len(drug_data[name]))
+    symptoms = texts[0].split(", ")
+    index = DrugIndex.build(drug_data)
+    metrics["latency.match_drug_relevance_us"] = best_us(lambda: match_drug_relevance(drug_data[disease], symptoms), number, repeat)
+    metrics["latency.search_drug_info_us"] = best_us(lambda: search_drug_info(disease, drug_data, texts[0], index), number, repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "drugs.sqlite3")
+        compile_drug_data(DRUG_DATA_PATH, db_path)
+        store = open_drug_data(DRUG_DATA_PATH, db_path)
+        store_index = store.index()
+        metrics["latency.search_drug_info_compiled_us"] = best_us(
+            lambda: search_drug_info(disease, store, texts[0], store_index), number, repeat
+        )
+        store.close()
+
+    large_batch = [texts[i % len(texts)] for i in range(128)]
+    metrics["memory.model_load_peak_mb"] = traced_peak_mb(lambda: ModelBundle.load(bundle.model_dir))
+    metrics["memory.predict_batch128_peak_mb"] = traced_peak_mb(lambda: predict_diseases(large_batch))
+
+    def load_drug_json():
+        with open(DRUG_DATA_PATH) as f:
+            DrugIndex.build(json.load(f))
+    metrics["memory.drug_json_load_peak_mb"] = traced_peak_mb(load_drug_json)
+    return metrics
+
+
+def bench_startup(runs, env):
+    """
+    Cold-start timings (median of `runs` fresh interpreters) and their largest max RSS.
+    """
+    samples = []
+    for _ in range(runs + 1):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    # The first run may compile the drug store or warm the page cache; not a cold start we track
+    samples = samples[1:]
+
+    metrics = {}
+    for key in samples[0]:
+        values = sorted(sample[key] for sample in samples)
+        if key == "max_rss_mb":
+            metrics["memory.startup_max_rss_mb"] = values[-1]
+        else:
+            metrics[f"startup.{key}"] = values[len(values) // 2]
+    return metrics
+
+
+def higher_is_better(name):
+    return name.startswith(HIGHER_IS_BETTER)
+
+
+def check(baseline, metrics, threshold):
+    """
+    Returns [(metric, baseline, current, relative change, regressed)] for metrics in both.
+    """
+    rows = []
+    for name, old in baseline.items():
+        new = metrics.get(name)
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better(name) else change
+        rows.append((name, old, new, change, worse > threshold))
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions (CI)")
+    parser.add_argument("--startup-runs", type=int, help="fresh interpreters for cold start (default 3, quick 2)")
+    parser.add_argument("--check", action="store_true", help="compare with the baseline and exit 1 on regressions")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/micro_<utc time>_<commit>.json)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")  # api/chat.py requires one; nothing is sent
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    metrics = bench_prediction(args.quick)
+    metrics.update(bench_startup(args.startup_runs or (2 if args.quick else 3), env))
+
+    now = datetime.now(timezone.utc)
+    commit = git_commit()
+    result = {
+        "meta": {
+            "timestamp": now.isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "metrics": dict(sorted(metrics.items())),
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"micro_{now.strftime('%Y%m%dT%H%M%SZ')}_{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    for name, value in result["metrics"].items():
+        print(f"{name:44} {value:14.4g}")
+    print(f"Saved {out}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nbaseline {baseline['meta'].get('commit')}  candidate {commit}  (threshold {args.threshold:.0%})")
+        rows = check(baseline["metrics"], result["metrics"], args.threshold)
+        for name, old, new, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:44} {old:14.4g} -> {new:14.4g}  {change:+8.1%}{flag}")
+        sys.exit(1 if any(regressed for *_, regressed in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
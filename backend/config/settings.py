@@ -0,0 +1,142 @@
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# === Model artifacts ===
+# Directory holding ent_symptom_model.pkl, vectorizer.pkl and label_encoder.pkl
+MODEL_DIR = os.getenv("ENT_MODEL_DIR", os.path.join(BACKEND_DIR, "models"))
+
+# === Server ===
+# `python main.py` listens on SERVER_HOST:SERVER_PORT. With SERVER_WORKERS > 1 it loads
+# the models and drug data once, then forks that many uvicorn workers sharing them
+# copy-on-write (utils/prefork.py).
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "5001"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+
+# === Prediction micro-batching ===
+# Concurrent /chat and /predict requests are grouped into one vectorizer + forest call.
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32"))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5"))
+
+# === Prediction executor ===
+# Where the symptom -> disease -> drugs pipeline runs: "thread", "process" or "inline".
+PREDICT_EXECUTOR = os.getenv("PREDICT_EXECUTOR", "thread")
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", "2"))
+PREDICT_PROCESS_START_METHOD = os.getenv("PREDICT_PROCESS_START_METHOD", "spawn")
+
+# === Prediction result cache ===
+# Canonical symptom string -> (disease, drugs); cleared when the served model version
+# changes or the drug data changes on disk.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "3600"))
+
+# === Admin endpoints ===
+# /admin/* (reloads, profiles) is disabled until this is set, then requires a matching
+# X-Admin-Token header. Model reloads only load directories inside MODEL_DIR.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# === Request profiling ===
+# Opt-in sampling profiler for /chat and /predict: a PROFILE_SAMPLE_RATE fraction of
+# requests, plus any request sent with the PROFILE_HEADER header and a matching
+# X-Admin-Token (ignored while ADMIN_TOKEN is unset). Collapsed stacks go to PROFILE_DIR
+# and GET /admin/profiles. A profile includes concurrent requests on the same worker.
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BACKEND_DIR, "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# === Drug relevance ranking ===
+# Rank a disease's drugs against the accumulated symptoms using the prebuilt index.
+DRUG_RANKING_ENABLED = os.getenv("DRUG_RANKING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# === Drug data store ===
+# "sqlite": serve drug labels from a compiled, read-only SQLite file (FTS5 index for
+# ranking), memory-mapped so all workers share it through the OS page cache; it is
+# rebuilt from ent_drug_data.json when missing or older. "json": parse the JSON into
+# every process. Compile ahead of time with: python -m utils.drug_store <json> <db>
+DRUG_STORE = os.getenv("DRUG_STORE", "sqlite")
+DRUG_DB_PATH = os.getenv("DRUG_DB_PATH", os.path.join(BACKEND_DIR, "api", "ent_drug_data.sqlite3"))
+
+# === Drug summaries ===
+# /chat sends the top-N drugs with a few cleaned label sections unless the client asks for full labels.
+DRUG_SUMMARY_TOP_N = int(os.getenv("DRUG_SUMMARY_TOP_N", "3"))
+DRUG_SUMMARY_MAX_CHARS = int(os.getenv("DRUG_SUMMARY_MAX_CHARS", "300"))
+
+# === Request timing ===
+# Per-stage durations always feed the <route>_stage_*_seconds histograms (GET /metrics);
+# with SERVER_TIMING_ENABLED, /predict also returns them as a Server-Timing header and
+# /chat as a final {"object": "server_timing"} SSE frame before [DONE].
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# === Bulk prediction ===
+# /predict/batch scores records in chunks of this size (one model call per chunk).
+PREDICT_BULK_CHUNK_SIZE = int(os.getenv("PREDICT_BULK_CHUNK_SIZE", "256"))
+# JSON array bodies are parsed whole, so they are capped (413 above this); larger jobs
+# upload NDJSON, read line by line, where a single line is capped instead.
+PREDICT_BULK_MAX_JSON_BYTES = int(os.getenv("PREDICT_BULK_MAX_JSON_BYTES", str(8 * 1024 * 1024)))
+PREDICT_BULK_MAX_LINE_BYTES = int(os.getenv("PREDICT_BULK_MAX_LINE_BYTES", str(64 * 1024)))
+
+# === Top-k predictions ===
+# Alternatives computed in every prediction pass (vote-fraction probabilities); the
+# default number /predict and /chat return. Read by utils/pipeline.py as well.
+PREDICT_TOP_K = int(os.getenv("PREDICT_TOP_K", "3"))
+
+# === Local symptom extraction ===
+# /chat extracts plainly stated symptoms with a lexicon matcher and only calls the
+# LLM tool when the message is unmatched, negated/hedged or poorly covered.
+SYMPTOM_EXTRACTOR_ENABLED = os.getenv("SYMPTOM_EXTRACTOR_ENABLED", "true").lower() in ("1", "true", "yes")
+SYMPTOM_EXTRACTOR_MIN_CONFIDENCE = float(os.getenv("SYMPTOM_EXTRACTOR_MIN_CONFIDENCE", "0.75"))
+
+# === Symptom extraction cache ===
+# LLM extraction results for repeated messages (normalized text + prompt version), so
+# common openers skip the OpenAI call. Cleared when SYSTEM_PROMPT or TOOLS change.
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "2048"))
+EXTRACTION_CACHE_TTL_S = float(os.getenv("EXTRACTION_CACHE_TTL_S", "86400"))
+EXTRACTION_CACHE_MAX_MESSAGE_CHARS = int(os.getenv("EXTRACTION_CACHE_MAX_MESSAGE_CHARS", "300"))
+
+# === /chat SSE framing ===
+# Upstream chunks without content (tool-call argument deltas) are not forwarded unless
+# SSE_DROP_EMPTY_FRAMES is off. SSE_COALESCE_MS > 0 merges content chunks into one frame
+# per SSE_COALESCE_MS / SSE_COALESCE_BYTES, whichever comes first.
+SSE_DROP_EMPTY_FRAMES = os.getenv("SSE_DROP_EMPTY_FRAMES", "true").lower() in ("1", "true", "yes")
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "0"))
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "512"))
+
+# === /chat sessions ===
+# Clients may send {"session_id", "message"} instead of the full history; the history
+# (last SESSION_MAX_MESSAGES messages) and accumulated symptoms then live here.
+# "memory" is per process; "sqlite" shares sessions between workers on one host.
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "20"))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", os.path.join(BACKEND_DIR, "sessions.sqlite3"))
+
+# === Extraction prompt compaction ===
+# The symptom-extraction call gets the system prompt, a summary of the symptoms already
+# known and at most PROMPT_MAX_MESSAGES recent messages, trimmed to PROMPT_TOKEN_BUDGET.
+PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+PROMPT_MAX_MESSAGES = int(os.getenv("PROMPT_MAX_MESSAGES", "6"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+
+# === OpenAI upstream ===
+# One pooled HTTP client per worker. At most OPENAI_MAX_CONCURRENT_STREAMS extraction
+# streams run at once; a turn waiting longer than OPENAI_QUEUE_TIMEOUT_S for a slot is
+# answered with a retryable "busy" error. OPENAI_TURN_DEADLINE_S bounds the whole call.
+# Connection errors, 429s and 5xx are retried up to OPENAI_MAX_RETRIES times before the
+# first chunk only (jittered exponential backoff from OPENAI_RETRY_BACKOFF_S).
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_MAX_CONCURRENT_STREAMS = int(os.getenv("OPENAI_MAX_CONCURRENT_STREAMS", "64"))
+OPENAI_QUEUE_TIMEOUT_S = float(os.getenv("OPENAI_QUEUE_TIMEOUT_S", "5"))
+OPENAI_TURN_DEADLINE_S = float(os.getenv("OPENAI_TURN_DEADLINE_S", "45"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "5"))
+OPENAI_READ_TIMEOUT_S = float(os.getenv("OPENAI_READ_TIMEOUT_S", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_RETRY_BACKOFF_S = float(os.getenv("OPENAI_RETRY_BACKOFF_S", "0.5"))
+OPENAI_RETRY_BACKOFF_MAX_S = float(os.getenv("OPENAI_RETRY_BACKOFF_MAX_S", "4"))
@@ -1,7 +1,24 @@
+import logging
 import uvicorn
 from api import create_app
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 app, _ = create_app()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=5001, log_level="info")
+    if settings.SERVER_WORKERS > 1:
+        from utils.prefork import serve
+
+        if settings.SESSION_STORE == "memory":
+            logger.warning(
+                f"SESSION_STORE=memory with {settings.SERVER_WORKERS} workers: every worker keeps its own /chat "
+                "sessions, so a session-mode turn served by another worker loses its history and symptoms. "
+                "Set SESSION_STORE=sqlite to share them."
+            )
+
+        serve(app, host=settings.SERVER_HOST, port=settings.SERVER_PORT, workers=settings.SERVER_WORKERS,
+              preload=app.state.preload, log_level="info")
+    else:
+        uvicorn.run(app, host=settings.SERVER_HOST, port=settings.SERVER_PORT, log_level="info")
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# API modules import `utils` / `config` / `api` as top-level packages (the app runs
+# from backend/), so make them importable when the suite runs from the repo root.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# api/chat.py refuses to import without a key; tests never reach OpenAI.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
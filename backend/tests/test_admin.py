@@ -0,0 +1,79 @@
+import asyncio
+import shutil
+import httpx
+import pytest
+from backend.utils.drug_store import compile_drug_data, open_drug_data
+
+
+def run_with_client(scenario):
+    from api import create_app
+
+    async def main():
+        app, _ = create_app()
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            await app.router.shutdown()
+
+    return asyncio.run(main())
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    return {"X-Admin-Token": "secret"}
+
+def test_admin_endpoints_are_disabled_without_a_token():
+    async def scenario(client):
+        return [
+            await client.post("/admin/models/reload"),
+            await client.post("/admin/drug-data/reload"),
+            await client.get("/admin/profiles"),
+        ]
+
+    assert [response.status_code for response in run_with_client(scenario)] == [403, 403, 403]
+
+def test_admin_endpoints_require_the_matching_token(admin_token):
+    async def scenario(client):
+        wrong = await client.get("/admin/profiles", headers={"X-Admin-Token": "guess"})
+        right = await client.get("/admin/profiles", headers=admin_token)
+        return wrong, right
+
+    wrong, right = run_with_client(scenario)
+    assert wrong.status_code == 403
+    assert right.status_code == 200
+
+def test_model_reload_only_loads_directories_inside_model_dir(admin_token, tmp_path, monkeypatch):
+    from config import settings
+    from utils.registry import DEFAULT_MODEL_DIR, registry
+
+    shutil.copytree(DEFAULT_MODEL_DIR, tmp_path / "models")
+    monkeypatch.setattr(settings, "MODEL_DIR", str(tmp_path / "models"))
+
+    async def scenario(client):
+        responses = [
+            await client.post("/admin/models/reload", json={"model_dir": str(tmp_path)}, headers=admin_token),
+            await client.post("/admin/models/reload", json={"model_dir": "../"}, headers=admin_token),
+            await client.post("/admin/models/reload", json={"model_dir": "."}, headers=admin_token),
+        ]
+        return responses
+
+    try:
+        outside, escape, inside = run_with_client(scenario)
+    finally:
+        registry.reload(DEFAULT_MODEL_DIR)  # The registry is process-wide
+    assert outside.status_code == escape.status_code == 400
+    assert "inside MODEL_DIR" in outside.json()["detail"]
+    assert inside.status_code == 200
+
+def test_compiled_store_counts_drugs_without_loading_them(tmp_path):
+    json_path = tmp_path / "drugs.json"
+    json_path.write_text('{"Tinnitus": {"drug a": {}, "drug b": {}}, "Vertigo": {"drug a": {}}}')
+    compile_drug_data(str(json_path), str(tmp_path / "drugs.sqlite3"))
+    store = open_drug_data(str(json_path), str(tmp_path / "drugs.sqlite3"))
+    assert store.drug_count() == 2
+    assert store._names == {}
+    store.close()
@@ -0,0 +1,79 @@
+import asyncio
+from backend.utils.batching import MicroBatcher
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+
+    async def run():
+        batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=20, name="test_share")
+        results = await asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c"]))
+        await batcher.close()
+        return results
+
+    assert asyncio.run(run()) == ["A", "B", "C"]
+    assert calls == [["a", "b", "c"]]
+
+def test_batches_are_capped_at_max_size():
+    calls = []
+
+    def process(items):
+        calls.append(len(items))
+        return items
+
+    async def run():
+        batcher = MicroBatcher(process, max_batch_size=2, max_wait_ms=20, name="test_cap")
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.close()
+        return results
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert calls == [2, 2, 1]
+
+def test_batch_failure_reaches_every_caller():
+    def process(items):
+        raise ValueError("model exploded")
+
+    async def run():
+        batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=5, name="test_fail")
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_histograms_record_batches():
+    async def run():
+        batcher = MicroBatcher(lambda items: items, max_batch_size=4, max_wait_ms=5, name="test_hist")
+        await asyncio.gather(*(batcher.submit(i) for i in range(4)))
+        await batcher.close()
+        return batcher
+
+    batcher = asyncio.run(run())
+    assert batcher.batch_size.count == 1
+    assert batcher.batch_size.sum == 4
+    assert batcher.wait_time.count == 4
+
+def test_batches_run_in_executor_off_the_event_loop():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    def process(items):
+        return [threading.current_thread().name for _ in items]
+
+    async def run():
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="predict") as executor:
+            batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=5, name="test_executor",
+                                   executor=executor, max_concurrent_batches=2)
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+            await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert len(results) == 6
+    assert all(name.startswith("predict") for name in results)
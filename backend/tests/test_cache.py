@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+from backend.utils.cache import TTLCache, file_fingerprint
+from backend.utils.service import PredictionService
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2, ttl=None, name="test_lru")
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)           # evicts "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=10, ttl=0.01, name="test_ttl")
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+def test_cache_clears_when_source_file_changes(tmp_path):
+    source = tmp_path / "ent_drug_data.json"
+    source.write_text("{}")
+    cache = TTLCache(maxsize=10, ttl=None, name="test_fingerprint",
+                     fingerprint=lambda: file_fingerprint([str(source)]), check_interval=0)
+    cache.set("fever", ("Flu", {}))
+    assert cache.get("fever") == ("Flu", {})
+
+    source.write_text('{"Flu": {}}')
+    os.utime(source, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+
+    assert cache.get("fever") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_service_shares_entries_across_symptom_orderings():
+    submitted = []
+
+    class FakeBatcher:
+        async def submit(self, item):
+            submitted.append(item)
+            return ("Flu", {"PARACETAMOL": {}}, [{"disease": "Flu", "probability": 0.9, "drugs": {"PARACETAMOL": {}}}])
+
+    service = PredictionService(FakeBatcher(), cache=TTLCache(maxsize=10, ttl=None, name="test_service"))
+
+    async def run():
+        first = await service.diagnose(["Fever", "cough"])
+        second = await service.diagnose(["cough", "fever", "fever"], drug_detail=None)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == ("Flu", {"PARACETAMOL": {}})
+    assert second == ("Flu", None)
+    assert submitted == [(["Fever", "cough"], "summary")]
+
+def test_top_k_is_served_from_the_same_cached_pass():
+    submitted = []
+    predictions = [
+        {"disease": "Flu", "probability": 0.6, "drugs": {"PARACETAMOL": {}}},
+        {"disease": "Common Cold", "probability": 0.3, "drugs": {}},
+    ]
+
+    class FakeBatcher:
+        async def submit(self, item):
+            submitted.append(item)
+            return ("Flu", predictions[0]["drugs"], predictions)
+
+    service = PredictionService(FakeBatcher(), cache=TTLCache(maxsize=10, ttl=None, name="test_top_k"))
+
+    async def run():
+        disease = await service.diagnose(["fever"], drug_detail=None)
+        top = await service.diagnose_top_k(["fever"], 5)
+        top_one = await service.diagnose_top_k(["fever"], 1, drug_detail="summary")
+        return disease, top, top_one
+
+    disease, top, top_one = asyncio.run(run())
+    assert disease == ("Flu", None)
+    assert top == [{"disease": "Flu", "probability": 0.6}, {"disease": "Common Cold", "probability": 0.3}]
+    assert top_one == [predictions[0]]
+    assert len(submitted) == 1
+    assert "drugs" in predictions[0]  # the cached entry is left intact
@@ -0,0 +1,40 @@
+import logging
+from backend.utils.compaction import compact_messages, count_message_tokens
+
+SYSTEM = {"role": "system", "content": "Extract symptoms."}
+
+
+def conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"turn {i}: I also have symptom number {i}"})
+        messages.append({"role": "assistant", "content": f"Noted symptom {i}. " + "details " * 40})
+    messages.append({"role": "user", "content": "and now a sore throat"})
+    return messages
+
+def test_short_conversations_are_sent_unchanged():
+    messages = conversation(1)
+    assert compact_messages(SYSTEM, messages, ["symptom 0"], max_messages=6) == [SYSTEM, *messages]
+
+def test_only_compacted_prompts_are_logged_at_info(caplog):
+    caplog.set_level(logging.INFO, logger="backend.utils.compaction")
+    compact_messages(SYSTEM, conversation(1), ["symptom 0"], max_messages=6)
+    assert not caplog.records
+    compact_messages(SYSTEM, conversation(10), ["fever"], max_messages=4)
+    assert [record.levelno for record in caplog.records] == [logging.INFO]
+
+def test_long_history_is_replaced_by_a_symptom_summary():
+    messages = conversation(10)
+    prompt = compact_messages(SYSTEM, messages, ["fever", "ear pain"], max_messages=4)
+
+    assert prompt[0] == SYSTEM
+    assert prompt[1]["role"] == "system" and "ear pain, fever" in prompt[1]["content"]
+    assert prompt[2:] == messages[-4:]
+
+def test_token_budget_drops_oldest_but_keeps_the_latest_message():
+    messages = conversation(10)
+    prompt = compact_messages(SYSTEM, messages, ["fever"], max_messages=20, token_budget=120)
+
+    assert prompt[-1] == messages[-1]
+    assert count_message_tokens(prompt) <= 120 or len(prompt) == 3
+    assert count_message_tokens(prompt) < count_message_tokens([SYSTEM, *messages])
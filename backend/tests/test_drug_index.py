@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from backend.utils.drug import search_drug_info
+from backend.utils.drug_index import DrugIndex
+
+
+@pytest.fixture
+def medical_data():
+    return {
+        "Otitis Media": {
+            "Anti-Itch": {
+                "indications_and_usage": "Relieves itching of the outer ear.",
+            },
+            "Ibuprofen": {
+                "indications_and_usage": "Pain relief. Also helps with inflammation and ear pain.",
+                "adverse_reactions": "Stomach upset and bleeding possible.",
+            },
+            "Paracetamol": {
+                "indications_and_usage": ["Used for pain and fever.", "Used for pain and fever."],
+                "warnings_and_cautions": "Not recommended for years of use.",
+            },
+        }
+    }
+
+def test_rank_orders_by_symptom_matches(medical_data):
+    index = DrugIndex.build(medical_data)
+    ranked = index.rank("Otitis Media", ["ear pain", "fever", "inflammation"])
+    assert ranked == ["Ibuprofen", "Paracetamol", "Anti-Itch"]
+
+def test_phrases_match_on_token_boundaries(medical_data):
+    index = DrugIndex.build(medical_data)
+    # "ear" is in "years" and "ear pain" needs the words next to each other
+    assert index.score("Otitis Media", ["ear"]) == {"Anti-Itch": 1, "Ibuprofen": 1}
+    assert index.score("Otitis Media", ["pain ear"]) == {}
+
+def test_canonical_symptom_string_is_accepted(medical_data):
+    index = DrugIndex.build(medical_data)
+    assert index.rank("Otitis Media", "fever, itching", top_k=2) == ["Anti-Itch", "Paracetamol"]
+
+def test_search_drug_info_ranks_with_index(medical_data):
+    index = DrugIndex.build(medical_data)
+    result = search_drug_info(np.array(["otitis media"]), medical_data, "fever, pain", index)
+    assert list(result) == ["Paracetamol", "Ibuprofen", "Anti-Itch"]
+    assert result["Paracetamol"] is medical_data["Otitis Media"]["Paracetamol"]
@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import pytest
+from backend.utils.drug import build_drug_summaries, search_drug_info, summarize_drug_info
+from backend.utils.drug_index import DrugIndex
+from backend.utils.drug_store import CompiledDrugData, LazyDrugSummaries, compile_drug_data, open_drug_data
+
+DRUG_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "api", "ent_drug_data.json")
+SYMPTOM_SETS = [
+    ["ear pain", "fever"], ["hearing loss", "tinnitus", "vertigo"], "nasal congestion, sore throat",
+    ["itching"], ["dizziness", "nausea", "headache"], ["year"], [],
+]
+
+
+@pytest.fixture(scope="module")
+def compiled(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("drugs") / "drugs.sqlite3")
+    compile_drug_data(DRUG_DATA_PATH, db_path)
+    with open(DRUG_DATA_PATH, "r") as file:
+        return json.load(file), CompiledDrugData(db_path)
+
+def test_compiled_view_matches_the_json(compiled):
+    data, store = compiled
+    assert list(store) == list(data)
+    for disease, drugs in data.items():
+        assert list(store[disease]) == list(drugs)
+        assert {drug: store[disease][drug] for drug in drugs} == drugs
+    with pytest.raises(KeyError):
+        store["Not A Disease"]
+
+def test_fts_ranking_matches_the_in_memory_index(compiled):
+    data, store = compiled
+    index, compiled_index = DrugIndex.build(data), store.index()
+    for disease in data:
+        for symptoms in SYMPTOM_SETS:
+            assert compiled_index.score(disease, symptoms) == index.score(disease, symptoms)
+            assert compiled_index.rank(disease, symptoms) == index.rank(disease, symptoms)
+
+def test_drug_lookups_are_identical(compiled):
+    data, store = compiled
+    summaries, lazy_summaries = build_drug_summaries(data), LazyDrugSummaries(store)
+    index, compiled_index = DrugIndex.build(data), store.index()
+    for disease in list(data) + ["acute otitis media", "Unknown"]:
+        for symptoms in SYMPTOM_SETS:
+            assert search_drug_info(disease, store, symptoms, compiled_index) == search_drug_info(disease, data, symptoms, index)
+            assert search_drug_info(disease, store, symptoms) == search_drug_info(disease, data, symptoms)
+            assert (summarize_drug_info(disease, lazy_summaries, symptoms, compiled_index)
+                    == summarize_drug_info(disease, summaries, symptoms, index))
+
+def test_store_is_recompiled_when_the_json_is_newer(tmp_path):
+    json_path, db_path = tmp_path / "data.json", str(tmp_path / "data.sqlite3")
+    json_path.write_text(json.dumps({"Tinnitus": {"drug a": {"indications_and_usage": "ear"}}}))
+    assert list(open_drug_data(str(json_path), db_path)) == ["Tinnitus"]
+
+    json_path.write_text(json.dumps({"Vertigo": {}}))
+    os.utime(json_path, (os.path.getmtime(db_path) + 10,) * 2)
+    assert list(open_drug_data(str(json_path), db_path)) == ["Vertigo"]
+    assert open_drug_data(str(json_path)) == {"Vertigo": {}}
+
+def test_store_compiled_with_another_schema_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / "drugs.sqlite3")
+    compile_drug_data(DRUG_DATA_PATH, db_path)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE meta SET value = '0' WHERE key = 'schema_version'")
+    conn.close()
+    os.utime(db_path, (os.path.getmtime(DRUG_DATA_PATH) + 10,) * 2)
+    with pytest.raises(ValueError):
+        CompiledDrugData(db_path)
+    assert list(open_drug_data(DRUG_DATA_PATH, db_path)) == list(CompiledDrugData(db_path))
+
+def test_compiled_store_is_about_the_size_of_the_json(tmp_path):
+    db_path = str(tmp_path / "drugs.sqlite3")
+    compile_drug_data(DRUG_DATA_PATH, db_path)
+    assert os.path.getsize(db_path) < 1.5 * os.path.getsize(DRUG_DATA_PATH)
+
+def test_forked_process_opens_its_own_connection(compiled):
+    data, store = compiled
+    disease_id = store.disease_id("Allergic Rhinitis")
+    expected = store.matching_positions(disease_id, ["nasal"])  # Parent connection in use before the fork
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = store.matching_positions(disease_id, ["nasal"]) == expected and store._local.pid == os.getpid()
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
@@ -0,0 +1,44 @@
+import json
+import os
+from backend.utils.drug import build_drug_summaries, summarize_drug_info
+from backend.utils.drug_index import DrugIndex
+
+DRUG_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "api", "ent_drug_data.json")
+
+
+def mock_medical_data():
+    return {
+        "Otitis Media with Effusion": {
+            "Anti Itch": {"indications_and_usage": "Relieves itching.", "adverse_reactions": "N/A"},
+            "Anti-Itch": {"indications_and_usage": "Duplicate entry."},
+            "Paracetamol": {
+                "indications_and_usage": ["Used for pain and fever.", "Used for pain and fever."],
+                "description": "Not part of the summary.",
+            },
+        }
+    }
+
+def test_summaries_are_cleaned_and_deduplicated():
+    summaries = build_drug_summaries(mock_medical_data())["Otitis Media with Effusion"]
+
+    assert list(summaries) == ["Anti Itch", "Paracetamol"]
+    assert summaries["Anti Itch"] == {"indications_and_usage": "Relieves itching."}
+    assert summaries["Paracetamol"] == {"indications_and_usage": "Used for pain and fever."}
+
+def test_summary_uses_ranking_and_top_n():
+    data = mock_medical_data()
+    summaries = build_drug_summaries(data)
+    index = DrugIndex.build(data)
+
+    # Predicted labels are title-cased differently from the dataset key
+    result = summarize_drug_info("otitis media with effusion", summaries, "fever", index, top_n=1)
+    assert list(result) == ["Paracetamol"]
+
+def test_summary_payload_is_much_smaller_than_full_labels():
+    with open(DRUG_DATA_PATH) as f:
+        data = json.load(f)
+    summaries = build_drug_summaries(data)
+
+    full_size = sum(len(json.dumps(drug_data)) for drug_data in data.values())
+    summary_size = sum(len(json.dumps(summarize_drug_info(disease, summaries, "", top_n=3))) for disease in data)
+    assert summary_size * 5 < full_size
@@ -0,0 +1,168 @@
+import asyncio
+import importlib.util
+import json
+import os
+import re
+import httpx
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "drug_sideeffect_json_generation_script", "ent_ingest.py")
+spec = importlib.util.spec_from_file_location("ent_ingest", SCRIPT)
+ent_ingest = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ent_ingest)
+
+PROBLEMS = {
+    "Tinnitus": ["drug a", "drug b"],
+    "Labyrinthitis": ["drug b", "drug c"],
+    "Hyperacusis": [],
+}
+LABELS = {
+    "drug a": "relieves ringing in the ear",
+    "drug b": "treats vertigo",
+    "drug c": "for joint pain",
+}
+
+
+class MockFDA:
+    """Local stand-in for api.fda.gov/drug/label.json."""
+
+    def __init__(self, fail_first=(), labels=None, effective_times=None):
+        self.calls = []
+        self.fail_first = set(fail_first)
+        self.labels = labels or LABELS
+        self.effective_times = effective_times or {}
+
+    def label(self, drug):
+        return {"indications_and_usage": [self.labels[drug]], "set_id": f"set-{drug}",
+                "effective_time": self.effective_times.get(drug, "20240101"), "openfda": {"generic_name": [drug.upper()]}}
+
+    def __call__(self, request):
+        search = request.url.params["search"]
+        self.calls.append(search)
+        if " AND effective_time:[" in search:
+            names, since = re.match(r'openfda\.generic_name:\((.*)\) AND effective_time:\[(\d+) TO', search).groups()
+            drugs = [drug for drug in re.findall(r'"([^"]+)"', names) if self.effective_times.get(drug, "20240101") >= since]
+            if not drugs:
+                return httpx.Response(404, json={"error": {"code": "NOT_FOUND"}})
+            return httpx.Response(200, json={"results": [self.label(drug) for drug in drugs]})
+        field, value = search.split(":", 1)
+        value = value.strip('"')
+        if value in self.fail_first:
+            self.fail_first.discard(value)
+            return httpx.Response(429, headers={"retry-after": "0"})
+        if field == "indications_and_usage":
+            drugs = PROBLEMS.get(value)
+            if not drugs:
+                return httpx.Response(404, json={"error": {"code": "NOT_FOUND"}})
+            return httpx.Response(200, json={"results": [{"openfda": {"generic_name": [drug]}} for drug in drugs]})
+        return httpx.Response(200, json={"results": [self.label(value)]})
+
+def run(tmp_path, mock, problems=tuple(PROBLEMS), incremental=False):
+    return asyncio.run(ent_ingest.create_ent_drug_dataset(
+        list(problems), output=str(tmp_path / "out.json"), checkpoint_path=str(tmp_path / "log.jsonl"),
+        rate=1000, burst=100, transport=httpx.MockTransport(mock), cache_dir=str(tmp_path / "cache"),
+        incremental=incremental,
+    ))
+
+def label(text):
+    return {**{field: "N/A" for field in ent_ingest.LABEL_FIELDS}, "indications_and_usage": [text]}
+
+def test_labels_shared_between_problems_are_fetched_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(ent_ingest, "RETRY_DELAY", 0)
+    mock = MockFDA(fail_first={"drug b"})
+    data = run(tmp_path, mock)
+
+    assert data == {
+        "Tinnitus": {"drug a": label("relieves ringing in the ear"), "drug b": label("treats vertigo")},
+        "Labyrinthitis": {"drug b": label("treats vertigo")},
+        "Hyperacusis": {},
+    }
+    assert json.loads((tmp_path / "out.json").read_text()) == data
+    label_calls = [call for call in mock.calls if call.startswith("openfda.generic_name")]
+    assert sorted(label_calls) == sorted(['openfda.generic_name:"drug a"', 'openfda.generic_name:"drug b"',
+                                          'openfda.generic_name:"drug b"', 'openfda.generic_name:"drug c"'])  # b retried once
+
+def test_interrupted_run_resumes_from_the_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(ent_ingest, "RETRY_DELAY", 0)
+    monkeypatch.setattr(ent_ingest, "MAX_RETRIES", 1)
+
+    first = run(tmp_path, MockFDA(fail_first={"Labyrinthitis"}))
+    assert set(first) == {"Tinnitus", "Hyperacusis"}  # Failed problem is not recorded
+
+    mock = MockFDA()
+    second = run(tmp_path, mock)
+    assert set(second) == set(PROBLEMS)
+    # Only the missing problem and its one new label are fetched again
+    assert sorted(mock.calls) == ['indications_and_usage:"Labyrinthitis"', 'openfda.generic_name:"drug c"']
+
+def test_failed_label_is_retried_by_later_problems(tmp_path, monkeypatch):
+    monkeypatch.setattr(ent_ingest, "RETRY_DELAY", 0)
+    monkeypatch.setattr(ent_ingest, "MAX_RETRIES", 1)
+
+    data = asyncio.run(ent_ingest.create_ent_drug_dataset(
+        ["Tinnitus", "Labyrinthitis"], output=str(tmp_path / "out.json"), checkpoint_path=str(tmp_path / "log.jsonl"),
+        concurrency=1, rate=1000, burst=100, transport=httpx.MockTransport(MockFDA(fail_first={"drug b"})),
+        cache_dir=None,
+    ))
+    assert set(data) == {"Labyrinthitis"}  # Tinnitus hit the failure; Labyrinthitis fetched drug b again
+    assert data["Labyrinthitis"]["drug b"] == label("treats vertigo")
+
+def test_output_defaults_to_the_backend_drug_data():
+    from api import DRUG_DATA_PATH
+    assert ent_ingest.OUTPUT_FILE == os.path.normpath(DRUG_DATA_PATH)
+
+def test_token_bucket_limits_the_request_rate():
+    async def timed():
+        bucket = ent_ingest.TokenBucket(rate=50, burst=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+        return loop.time() - started
+
+    assert asyncio.run(timed()) >= 0.09
+
+def test_incremental_refresh_refetches_only_updated_labels_and_writes_a_diff(tmp_path, monkeypatch):
+    monkeypatch.setattr(ent_ingest, "RETRY_DELAY", 0)
+    run(tmp_path, MockFDA())
+    assert not (tmp_path / "log.jsonl").exists()  # Finished runs leave no checkpoint behind
+    index = json.loads((tmp_path / "cache" / "index.json").read_text())
+    assert index["drug b"]["set_id"] == "set-drug b" and index["drug b"]["effective_time"] == "20240101"
+
+    mock = MockFDA(labels={**LABELS, "drug b": "treats vertigo and tinnitus"}, effective_times={"drug b": "20250601"})
+    data = run(tmp_path, mock, incremental=True)
+
+    assert data["Labyrinthitis"]["drug b"] == label("treats vertigo and tinnitus")
+    label_calls = [call for call in mock.calls if call.startswith('openfda.generic_name:"')]
+    assert label_calls == ['openfda.generic_name:"drug b"']
+    diff = json.loads((tmp_path / "out.diff.json").read_text())
+    assert diff["problems"] == {
+        "Tinnitus": {"added": [], "removed": [], "changed": ["drug b"]},
+        "Labyrinthitis": {"added": [], "removed": [], "changed": ["drug b"]},
+    }
+
+def test_admin_reload_serves_new_drug_data_without_restart(monkeypatch):
+    from api import create_app
+    from config import settings
+    from utils import pipeline
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+
+    async def main():
+        app, _ = create_app()
+        await app.router.startup()
+        try:
+            app.state.prediction_service.cache.set(("cached",), "result")
+            app.state.load_drug_data = lambda: {"Tinnitus": {"drug a": label("ear")}}
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/admin/drug-data/reload", headers={"X-Admin-Token": "secret"})
+            return app, response
+        finally:
+            await app.router.shutdown()
+
+    app, response = asyncio.run(main())
+    body = response.json()
+    assert {key: body[key] for key in ("status", "problems", "drugs")} == {"status": "reloaded", "problems": 1, "drugs": 1}
+    assert body["version"]
+    assert pipeline._medical_advice_data == {"Tinnitus": {"drug a": label("ear")}}
+    assert len(app.state.prediction_service.cache) == 0
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from backend.utils.extraction_cache import ExtractionCache, normalize_message, prompt_version
+
+
+def test_normalize_message_ignores_case_spacing_and_edge_punctuation():
+    assert normalize_message("  I have a Sore   throat!! ") == normalize_message("i have a sore throat")
+    assert normalize_message("ＥＡＲ pain.") == "ear pain"
+
+def test_prompt_version_changes_with_the_tools():
+    tools = [{"type": "function", "function": {"name": "extract_top_symptoms"}}]
+    assert prompt_version("m", {"content": "p"}, tools) == prompt_version("m", {"content": "p"}, list(tools))
+    assert prompt_version("m", {"content": "p"}, tools) != prompt_version("m", {"content": "p"}, [])
+
+def test_prompt_change_invalidates_entries():
+    version = ["v1"]
+    cache = ExtractionCache(lambda: version[0], check_interval=0, name="test_extraction_cache_version")
+    cache.set("I have a fever", ["fever"], "data: x\n\n")
+    assert cache.get("i have a FEVER.") == (("fever",), "data: x\n\n")
+
+    version[0] = "v2"
+    assert cache.get("I have a fever") is None
+    assert len(cache) == 0
+
+def test_long_messages_are_not_cached():
+    cache = ExtractionCache(lambda: "v", max_message_chars=10, name="test_extraction_cache_long")
+    cache.set("a much longer message than ten characters", ["cough"])
+    assert cache.get("a much longer message than ten characters") is None
+    assert cache.stats()["misses"] == 0
+
+def test_repeated_message_skips_the_llm_and_replays_its_frames(monkeypatch):
+    import api.chat as chat
+
+    calls = []
+
+    class FakeUpstream:
+        async def stream_chat_completion(self, **request):
+            calls.append(request)
+            arguments = json.dumps({"symptoms": ["sore throat"]})
+            delta = SimpleNamespace(content=None, tool_calls=[
+                SimpleNamespace(index=0, function=SimpleNamespace(name="extract_top_symptoms", arguments=arguments))
+            ])
+            for finish_reason in (None, "tool_calls"):
+                yield SimpleNamespace(id="chatcmpl-1", object="chat.completion.chunk", created=1, model="gpt-4-turbo",
+                                      system_fingerprint="fp", choices=[SimpleNamespace(index=0, delta=delta, finish_reason=finish_reason)])
+                delta = SimpleNamespace(content=None, tool_calls=None)
+
+    monkeypatch.setattr(chat, "upstream", FakeUpstream())
+    monkeypatch.setattr(chat, "extraction_cache", ExtractionCache(lambda: "v", name="test_extraction_cache_chat"))
+
+    def turn(text):
+        request = chat.ChatRequest(messages=[chat.Message(role="user", content=text)], accumulated_symptoms=[])
+
+        async def run():
+            return [frame async for frame in chat.openai_stream_response(request, prediction_service=None)]
+        return asyncio.run(run())
+
+    first = turn("My throat feels scratchy")
+    second = turn("my throat feels scratchy!")
+    assert len(calls) == 1
+    replayed = lambda frames: [frame for frame in frames if '"function_result"' not in frame and '"server_timing"' not in frame]
+    assert replayed(first) == replayed(second)
+    result = next(json.loads(frame[len("data: "):]) for frame in second if '"function_result"' in frame)
+    assert result["extraction"] == "cache"
+    assert result["accumulated_symptoms"] == ["sore throat"]
@@ -0,0 +1,65 @@
+import os
+import random
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from backend.utils.featurizer import FusedFeaturizer, clean_symptom
+from backend.utils.preprocess import preprocess_text
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+
+
+@pytest.fixture(scope="module")
+def vectorizer():
+    return joblib.load(os.path.join(MODELS_DIR, "vectorizer.pkl"))
+
+@pytest.fixture(scope="module")
+def symptom_lists(vectorizer):
+    rng = random.Random(7)
+    vocab = sorted(vectorizer.vocabulary_)
+    noise = ["", " ", "x", "Ear-Pain!!", "  FEVER  ", "sore\tthroat", "naïve", "İtching", "KNEE", "pain 2x/day",
+             "ear pain", "a b c", "fever", "Fever", "fever."]
+    lists = [
+        [" ".join(rng.sample(vocab, rng.randint(1, 4))) for _ in range(rng.randint(0, 6))] + rng.sample(noise, rng.randint(0, 3))
+        for _ in range(400)
+    ]
+    return lists + [[], ["ear pain", "fever", "ear pain"], ["Ear Pain", "ear pain"], noise]
+
+def assert_same_rows(actual, expected):
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual.indptr, expected.indptr)
+    assert np.array_equal(actual.indices, expected.indices)
+    assert np.array_equal(actual.data, expected.data)  # Exact, not approximately equal
+
+def test_clean_symptom_matches_preprocess_text():
+    for symptom in ["Ear-Pain!!", "  FEVER  ", "naïve", "İtching", "KNEE", "ear pain", "x\x1cy", "123"]:
+        assert preprocess_text([symptom]) == clean_symptom(symptom)
+
+def test_batch_parity_with_preprocess_and_vectorizer(vectorizer, symptom_lists):
+    featurizer = FusedFeaturizer.from_vectorizer(vectorizer)
+    X, texts = featurizer.transform(symptom_lists, with_text=True)
+
+    expected_texts = [preprocess_text(symptoms) for symptoms in symptom_lists]
+    assert texts == expected_texts
+    assert_same_rows(X, vectorizer.transform(expected_texts))
+
+def test_single_row_parity(vectorizer, symptom_lists):
+    featurizer = FusedFeaturizer.from_vectorizer(vectorizer)
+    for symptoms in symptom_lists[:50]:
+        assert_same_rows(featurizer.transform_one(symptoms), vectorizer.transform([preprocess_text(symptoms)]))
+
+@pytest.mark.parametrize("options", [
+    {"sublinear_tf": True}, {"binary": True, "norm": "l1"}, {"use_idf": False, "norm": None}, {"stop_words": ["of", "the"]},
+])
+def test_parity_with_other_vectorizer_settings(symptom_lists, options):
+    corpus = [preprocess_text(symptoms) for symptoms in symptom_lists]
+    vectorizer = TfidfVectorizer(**options).fit(corpus)
+    featurizer = FusedFeaturizer.from_vectorizer(vectorizer)
+
+    assert_same_rows(featurizer.transform(symptom_lists), vectorizer.transform(corpus))
+
+def test_unsupported_vectorizers_are_left_to_sklearn(symptom_lists):
+    corpus = [preprocess_text(symptoms) for symptoms in symptom_lists]
+    assert FusedFeaturizer.from_vectorizer(TfidfVectorizer(ngram_range=(1, 2)).fit(corpus)) is None
+    assert FusedFeaturizer.from_vectorizer(TfidfVectorizer(token_pattern=r"\b\w+\b").fit(corpus)) is None
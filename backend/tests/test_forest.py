@@ -0,0 +1,54 @@
+import os
+import random
+import joblib
+import numpy as np
+import pytest
+from backend.utils.forest import CompiledForest
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    model = joblib.load(os.path.join(MODELS_DIR, "ent_symptom_model.pkl"))
+    vectorizer = joblib.load(os.path.join(MODELS_DIR, "vectorizer.pkl"))
+    return model, vectorizer, CompiledForest.from_sklearn(model)
+
+@pytest.fixture(scope="module")
+def symptom_texts(artifacts):
+    _, vectorizer, _ = artifacts
+    rng = random.Random(42)
+    vocab = sorted(vectorizer.vocabulary_)
+    texts = [" ".join(rng.sample(vocab, rng.randint(1, 8))) for _ in range(500)]
+    texts += ["ear pain, fever, sore throat", "ringing in my ears and dizziness", ""]
+    return texts
+
+def test_batch_parity_with_sklearn(artifacts, symptom_texts):
+    model, vectorizer, forest = artifacts
+    X = vectorizer.transform(symptom_texts)
+
+    assert np.array_equal(forest.predict(X), model.predict(X))
+    assert np.array_equal(forest.predict_proba(X), model.predict_proba(X))
+
+def test_single_row_parity_with_sklearn(artifacts, symptom_texts):
+    model, vectorizer, forest = artifacts
+
+    for text in symptom_texts[:50]:
+        X = vectorizer.transform([text])
+        assert forest.predict(X)[0] == model.predict(X)[0]
+
+def test_dense_input_matches_sparse(artifacts, symptom_texts):
+    _, vectorizer, forest = artifacts
+    X = vectorizer.transform(symptom_texts[:20])
+
+    assert np.array_equal(forest.predict(X.toarray()), forest.predict(X))
+
+def test_top_k_matches_sorted_sklearn_probabilities(artifacts, symptom_texts):
+    model, vectorizer, forest = artifacts
+    X = vectorizer.transform(symptom_texts)
+    classes, scores = forest.predict_top_k(X, 3)
+    expected = model.predict_proba(X)
+
+    assert classes.shape == scores.shape == (len(symptom_texts), 3)
+    assert np.array_equal(classes[:, 0], model.predict(X))
+    assert np.array_equal(scores, -np.sort(-expected, axis=1)[:, :3])
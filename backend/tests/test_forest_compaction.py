@@ -0,0 +1,66 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from backend.utils.forest import CompiledForest
+from backend.utils.forest_compaction import compact_forest, generated_texts, quantize_distributions, run, select_trees
+from backend.utils.registry import ModelBundle
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    model = joblib.load(os.path.join(MODELS_DIR, "ent_symptom_model.pkl"))
+    vectorizer = joblib.load(os.path.join(MODELS_DIR, "vectorizer.pkl"))
+    return model, vectorizer, vectorizer.transform(generated_texts(vectorizer, 300))
+
+def test_without_options_the_forest_is_unchanged(artifacts):
+    model, _, X = artifacts
+    assert np.array_equal(compact_forest(model).predict_proba(X), model.predict_proba(X))
+
+def test_depth_limit_collapses_subtrees(artifacts):
+    model, _, X = artifacts
+    compacted = compact_forest(model, n_trees=10, max_depth=6)
+
+    assert len(compacted.estimators_) == 10
+    for before, after in zip(model.estimators_, compacted.estimators_):
+        assert after.tree_.max_depth <= 6
+        assert after.tree_.node_count < before.tree_.node_count
+    # The serving engine stays exact on collapsed, non-pure leaves
+    assert np.array_equal(CompiledForest.from_sklearn(compacted).predict_proba(X), compacted.predict_proba(X))
+
+def test_quantized_distributions_still_sum_to_one():
+    values = np.random.default_rng(0).dirichlet(np.ones(23), size=(50, 1))
+    quantized = quantize_distributions(values, 4)
+
+    assert np.allclose(quantized.sum(axis=-1), 1.0)
+    assert np.allclose(quantized * 15, np.round(quantized * 15))
+    assert np.abs(quantized - values).max() <= 1 / 15
+
+def test_greedy_selection_beats_the_first_trees(artifacts):
+    model, vectorizer, X = artifacts
+    selection_X = vectorizer.transform(generated_texts(vectorizer, 300, seed=1))
+    target = model.predict(X)
+
+    greedy = compact_forest(model, n_trees=10, selection_X=selection_X)
+    first = compact_forest(model, n_trees=10)
+    assert len(set(select_trees(model, selection_X, 10))) == 10
+    assert np.mean(greedy.predict(X) == target) >= np.mean(first.predict(X) == target)
+
+def test_export_only_when_the_gate_passes(tmp_path):
+    rejected = run(MODELS_DIR, str(tmp_path / "rejected"), n_trees=5, max_depth=4, n_generated=200)
+    assert not rejected["exported"] and rejected["gate"]["failures"]
+    assert not os.path.exists(tmp_path / "rejected")  # A failed gate writes nothing
+
+    out = str(tmp_path / "accepted")
+    accepted = run(MODELS_DIR, out, n_trees=5, max_depth=4, n_generated=200, min_agreement=0.0, max_accuracy_drop=1.0)
+    assert accepted["exported"]
+    assert accepted["compacted"]["nodes"] < accepted["original"]["nodes"]
+    assert ModelBundle.load(out).forest.n_trees == 5
+    assert not any(name.startswith(".") for name in os.listdir(out))
+
+    # Re-exporting replaces the directory as a whole, leaving nothing staged behind
+    run(MODELS_DIR, out, n_trees=3, max_depth=4, n_generated=200, min_agreement=0.0, max_accuracy_drop=1.0)
+    assert ModelBundle.load(out).forest.n_trees == 3
+    assert sorted(os.listdir(tmp_path)) == ["accepted"]
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import httpx
+
+
+def run_with_client(scenario):
+    from api import create_app
+
+    async def main():
+        app, _ = create_app()
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            await app.router.shutdown()
+
+    return asyncio.run(main())
+
+def parse_ndjson(text):
+    return [json.loads(line) for line in text.splitlines() if line]
+
+def test_json_array_is_scored_in_order_with_per_record_errors():
+    async def scenario(client):
+        return await client.post("/predict/batch", json=[
+            "ear pain, fever",
+            ["sneezing", "runny nose"],
+            {"id": "abc", "symptoms": "dizziness"},
+            42,
+        ])
+
+    response = run_with_client(scenario)
+    assert response.status_code == 200
+    rows = parse_ndjson(response.text)
+    assert [row["index"] for row in rows] == [0, 1, 2, 3]
+    assert all("predicted_disease" in row for row in rows[:3])
+    assert rows[2]["id"] == "abc"
+    assert "error" in rows[3]
+
+def test_ndjson_upload_streams_every_record():
+    async def upload():
+        for i in range(600):
+            yield (json.dumps({"id": i, "symptoms": "ringing in ears, dizziness"}) + "\n").encode()
+
+    async def scenario(client):
+        return await client.post("/predict/batch", content=upload(),
+                                 headers={"content-type": "application/x-ndjson"})
+
+    rows = parse_ndjson(run_with_client(scenario).text)
+    assert len(rows) == 600
+    assert [row["id"] for row in rows] == list(range(600))
+    assert len({row["predicted_disease"] for row in rows}) == 1
+
+def test_non_array_body_is_rejected():
+    async def scenario(client):
+        return await client.post("/predict/batch", json={"records": []})
+
+    assert run_with_client(scenario).status_code == 400
+
+def test_oversized_json_body_is_rejected_with_413(monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "PREDICT_BULK_MAX_JSON_BYTES", 100)
+
+    async def scenario(client):
+        small = await client.post("/predict/batch", json=["ear pain, fever"])
+        large = await client.post("/predict/batch", json=["ear pain, fever"] * 20)
+        return small, large
+
+    small, large = run_with_client(scenario)
+    assert small.status_code == 200
+    assert large.status_code == 413
+    assert "NDJSON" in large.json()["detail"]
+
+def test_ndjson_line_over_the_cap_is_an_error_record(monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "PREDICT_BULK_MAX_LINE_BYTES", 100)
+
+    async def upload():
+        yield b'"ear pain"\n"' + b"x" * 60
+        for _ in range(5):
+            yield b"x" * 60  # Never buffered whole
+        yield b'"\n' + b'"dizziness"\n'
+
+    async def scenario(client):
+        return await client.post("/predict/batch", content=upload(),
+                                 headers={"content-type": "application/x-ndjson"})
+
+    rows = parse_ndjson(run_with_client(scenario).text)
+    assert [row["index"] for row in rows] == [0, 1, 2]
+    assert "predicted_disease" in rows[0] and "predicted_disease" in rows[2]
+    assert "longer than 100 bytes" in rows[1]["error"]
+
+def test_top_k_above_the_configured_cap_is_rejected():
+    from config import settings
+
+    async def scenario(client):
+        return [
+            await client.post("/predict", json={"symptoms": "ear pain", "top_k": settings.PREDICT_TOP_K}),
+            await client.post("/predict", json={"symptoms": "ear pain", "top_k": settings.PREDICT_TOP_K + 1}),
+            await client.post(f"/predict/batch?top_k={settings.PREDICT_TOP_K + 1}", json=["ear pain"]),
+            await client.post("/predict", json={"symptoms": "ear pain", "top_k": 0}),
+        ]
+
+    assert [response.status_code for response in run_with_client(scenario)] == [200, 400, 400, 400]
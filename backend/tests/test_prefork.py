@@ -0,0 +1,60 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A tiny app served by utils.prefork: preload() runs in the parent, requests report
+# which worker answered and whether they see the preloaded state.
+SERVER = """
+import os, sys
+from fastapi import FastAPI
+from utils.prefork import serve
+
+app = FastAPI()
+state = {}
+
+def preload():
+    state["loaded_by"] = os.getpid()
+
+@app.get("/")
+def index():
+    return {"pid": os.getpid(), "loaded_by": state.get("loaded_by")}
+
+serve(app, host="127.0.0.1", port=int(sys.argv[1]), workers=2, preload=preload, log_level="warning")
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_workers_share_the_preloaded_state_and_stop_on_sigterm():
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], cwd=BACKEND_DIR,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        answers = []
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and len({answer["pid"] for answer in answers}) < 2:
+            try:
+                # A new connection each time, so both workers get to accept one
+                answers.append(httpx.get(f"http://127.0.0.1:{port}/", timeout=2).json())
+            except httpx.HTTPError:
+                time.sleep(0.1)
+
+        assert len({answer["pid"] for answer in answers}) == 2
+        assert {answer["loaded_by"] for answer in answers} == {process.pid}
+        assert process.pid not in {answer["pid"] for answer in answers}
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
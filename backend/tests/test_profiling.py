@@ -0,0 +1,81 @@
+import asyncio
+import time
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from backend.utils.profiling import ProfileStore, ProfilingMiddleware, SamplingProfiler
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_sampler_collects_collapsed_stacks_of_busy_threads():
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy_loop(0.05)
+    stacks = profiler.stop()
+
+    assert profiler.samples > 0
+    assert any(stack.startswith("MainThread;") and "busy_loop (test_profiling.py:" in stack for stack in stacks)
+
+def make_app(store, **options):
+    app = FastAPI()
+
+    @app.post("/chat")
+    async def chat():
+        async def body():
+            yield "data: 1\n\n"
+            busy_loop(0.03)  # Runs after the endpoint returned, while streaming
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    app.add_middleware(ProfilingMiddleware, store=store, interval=0.001, **options)
+    return app
+
+def post(app, headers=None):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/chat", headers=headers or {})
+    return asyncio.run(run())
+
+def test_header_triggers_a_profile_covering_the_streamed_body(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=5)
+    app = make_app(store, admin_token="secret")
+
+    assert "x-profile-id" not in post(app).headers
+    assert "x-profile-id" not in post(app, {"X-Profile": "1"}).headers  # Token required
+
+    response = post(app, {"X-Profile": "1", "X-Admin-Token": "secret"})
+    profile_id = response.headers["x-profile-id"]
+    assert store.list()[0]["id"] == profile_id
+    assert "busy_loop" in store.get(profile_id)
+    assert store.list()[0]["concurrent_requests"] == 0
+    assert (tmp_path / f"{profile_id}.collapsed").read_text() == store.get(profile_id)
+
+def test_sample_rate_profiles_requests_without_the_header():
+    store = ProfileStore(keep=1)
+    app = make_app(store, sample_rate=1.0)
+    post(app)
+    post(app)
+    assert len(store.list()) == 1
+
+def test_header_is_ignored_without_an_admin_token():
+    store = ProfileStore(keep=5)
+    app = make_app(store)
+    assert "x-profile-id" not in post(app, {"X-Profile": "1"}).headers
+    assert store.list() == []
+
+def test_profile_records_concurrent_requests():
+    store = ProfileStore(keep=5)
+    app = make_app(store, admin_token="secret")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(
+                client.post("/chat", headers={"X-Profile": "1", "X-Admin-Token": "secret"}),
+                client.post("/chat"),
+            )
+
+    asyncio.run(run())
+    assert store.list()[0]["concurrent_requests"] == 1
@@ -0,0 +1,28 @@
+import pytest
+from backend.utils.registry import ModelRegistry, DEFAULT_MODEL_DIR
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return ModelRegistry(DEFAULT_MODEL_DIR)
+
+def test_models_load_once(registry):
+    assert not registry.ready
+    first = registry.get()
+    assert registry.ready
+    assert registry.get() is first
+    assert first.predict(["ear pain, fever"])[0] in first.label_encoder.classes_
+
+def test_reload_swaps_bundle(registry):
+    old = registry.get()
+    new = registry.reload()
+    assert new is not old
+    assert registry.get() is new
+    assert new.version == old.version  # Same artifacts, same content hash
+
+def test_failed_reload_keeps_serving_old_version(registry, tmp_path):
+    current = registry.get()
+    with pytest.raises(FileNotFoundError):
+        registry.reload(str(tmp_path))
+    assert registry.get() is current
+    assert registry.model_dir == DEFAULT_MODEL_DIR
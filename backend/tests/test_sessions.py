@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+import time
+import httpx
+import pytest
+from backend.utils.sessions import InMemorySessionStore, SessionStore, SqliteSessionStore
+
+
+def test_memory_store_round_trip_returns_copies():
+    store = InMemorySessionStore(name="test_sessions_copy")
+    session = {"messages": [{"role": "user", "content": "ear pain"}], "accumulated_symptoms": ["ear pain"]}
+    store.save("a", session)
+
+    loaded = store.get("a")
+    loaded["messages"].append({"role": "assistant", "content": "?"})
+    assert store.get("a") == session
+    assert store.get("missing") is None
+
+def test_memory_store_evicts_lru_and_enforces_the_byte_cap():
+    store = InMemorySessionStore(max_sessions=2, name="test_sessions_lru")
+    store.save("a", {"n": 1})
+    store.save("b", {"n": 2})
+    store.get("a")
+    store.save("c", {"n": 3})
+    assert store.get("b") is None and store.get("a") == {"n": 1}
+
+    capped = InMemorySessionStore(max_bytes=40, name="test_sessions_bytes")
+    capped.save("a", {"text": "x" * 20})
+    capped.save("b", {"text": "y" * 20})
+    assert capped.get("a") is None
+    assert capped.stats()["bytes"] <= 40
+
+def test_memory_store_expires_idle_sessions():
+    store = InMemorySessionStore(ttl=0.01, name="test_sessions_ttl")
+    store.save("a", {"n": 1})
+    time.sleep(0.02)
+    assert store.get("a") is None
+
+def test_incomplete_store_fails_at_instantiation():
+    class GetOnlyStore(SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyStore(name="test_sessions_incomplete")
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    writer = SqliteSessionStore(path, name="test_sessions_sqlite")
+    reader = SqliteSessionStore(path, name="test_sessions_sqlite")
+    writer.save("a", {"accumulated_symptoms": ["fever"]})
+    assert reader.get("a") == {"accumulated_symptoms": ["fever"]}
+    writer.delete("a")
+    assert reader.get("a") is None
+
+def test_sqlite_store_forked_process_opens_its_own_connection(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite3"), name="test_sessions_sqlite")
+    store.save("a", {"accumulated_symptoms": ["fever"]})  # Parent connection in use before the fork
+    parent_conn = store._connection()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = store.get("a") == {"accumulated_symptoms": ["fever"]}
+            ok = ok and store._connection() is not parent_conn and store._local.pid == os.getpid()
+            store.save("b", {"accumulated_symptoms": ["cough"]})
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store._connection() is parent_conn
+    assert store.get("b") == {"accumulated_symptoms": ["cough"]}
+
+def function_result(body):
+    for frame in body.split("\n\n"):
+        if '"function_result"' in frame:
+            return json.loads(frame[len("data: "):])
+
+def test_chat_session_keeps_history_and_symptoms_on_the_server():
+    from api import create_app
+
+    async def main():
+        app, _ = create_app()
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.post("/chat", json={"message": "I have ear pain and fever"})
+                session_id = first.headers["x-session-id"]
+                second = await client.post("/chat", json={"session_id": session_id, "message": "also hearing loss"})
+                return app, session_id, function_result(first.text), function_result(second.text)
+        finally:
+            await app.router.shutdown()
+
+    app, session_id, first, second = asyncio.run(main())
+    assert first["session_id"] == session_id
+    assert sorted(second["accumulated_symptoms"]) == ["ear pain", "fever", "hearing loss"]
+    assert second["choices"][0]["delta"]["content"]["disease"]
+
+    session = app.state.session_store.get(session_id)
+    assert [m["role"] for m in session["messages"]] == ["user", "assistant", "user", "assistant"]
+    assert sorted(session["accumulated_symptoms"]) == ["ear pain", "fever", "hearing loss"]
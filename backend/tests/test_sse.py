@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+from backend.utils.sse import ChunkFrameEncoder
+
+
+def make_chunk(content=None, finish_reason=None, chunk_id="chatcmpl-1"):
+    return SimpleNamespace(
+        id=chunk_id, object="chat.completion.chunk", created=1700000000, model="gpt-4-turbo",
+        system_fingerprint="fp_1", choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=content), finish_reason=finish_reason)],
+    )
+
+def reference_frame(chunk):
+    choice = chunk.choices[0]
+    return "data: " + json.dumps({
+        "id": chunk.id, "object": chunk.object, "created": chunk.created, "model": chunk.model,
+        "system_fingerprint": chunk.system_fingerprint,
+        "choices": [{"index": choice.index, "delta": {"content": choice.delta.content or None}, "finish_reason": choice.finish_reason}],
+    }) + "\n\n"
+
+def parse_frames(text):
+    return [json.loads(frame[len("data: "):]) for frame in text.split("\n\n") if frame]
+
+def test_frames_match_json_dumps_of_the_full_payload():
+    encoder = ChunkFrameEncoder(drop_empty=False)
+    for chunk in [make_chunk("Hé \"quoted\"\n"), make_chunk(None), make_chunk(None, "stop"), make_chunk("x", chunk_id="chatcmpl-2")]:
+        assert encoder.encode(chunk) == reference_frame(chunk)
+
+def test_empty_frames_are_dropped():
+    encoder = ChunkFrameEncoder()
+    assert encoder.encode(make_chunk(None)) == ""
+    assert encoder.encode(make_chunk("")) == ""
+    assert encoder.encode(make_chunk(None, "tool_calls")) == reference_frame(make_chunk(None, "tool_calls"))
+
+def test_coalescing_merges_content_until_the_byte_threshold():
+    encoder = ChunkFrameEncoder(coalesce_ms=10_000, coalesce_bytes=6)
+    assert encoder.encode(make_chunk("abc")) == ""
+    frames = parse_frames(encoder.encode(make_chunk("def")))
+    assert [f["choices"][0]["delta"]["content"] for f in frames] == ["abcdef"]
+
+    assert encoder.encode(make_chunk("gh")) == ""
+    frames = parse_frames(encoder.encode(make_chunk("i", "stop")))
+    assert frames[0]["choices"][0] == {"index": 0, "delta": {"content": "ghi"}, "finish_reason": "stop"}
+
+def test_flush_sends_leftover_content():
+    encoder = ChunkFrameEncoder(coalesce_ms=10_000)
+    encoder.encode(make_chunk("tail"))
+    assert parse_frames(encoder.flush())[0]["choices"][0]["delta"]["content"] == "tail"
+    assert encoder.flush() == ""
@@ -0,0 +1,46 @@
+import os
+import joblib
+import pytest
+from backend.utils.symptom_extractor import SymptomExtractor
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return SymptomExtractor.from_vectorizer(joblib.load(os.path.join(MODELS_DIR, "vectorizer.pkl")))
+
+def test_plain_symptom_list_is_extracted_locally(extractor):
+    result = extractor.extract("Hi, I have a sore throat and nasal congestion")
+    assert result.symptoms == ["sore throat", "nasal congestion"]
+    assert result.fallback_reason is None
+
+def test_phrases_tolerate_possessives_and_plurals(extractor):
+    result = extractor.extract("Ringing in both my ears, dizziness and itchy eyes")
+    assert result.symptoms == ["ringing in ear", "dizziness", "itchy eyes"]
+    assert result.fallback_reason is None
+
+def test_longest_phrase_wins(extractor):
+    assert extractor.extract("sudden hearing loss").symptoms == ["sudden hearing loss"]
+
+def test_negated_or_hedged_messages_fall_back(extractor):
+    assert extractor.extract("No fever, but my ear hurts").fallback_reason == "ambiguous"
+    assert extractor.extract("maybe vertigo?").fallback_reason == "ambiguous"
+
+def test_unmatched_or_partly_matched_messages_fall_back(extractor):
+    assert extractor.extract("I feel terrible").fallback_reason == "no_match"
+    assert extractor.extract("fever plus swollen jaw area lymph drooping eyes").fallback_reason == "low_confidence"
+
+def test_questions_past_and_third_party_symptoms_fall_back(extractor):
+    assert extractor.extract("What causes a sore throat?").fallback_reason == "question"
+    assert extractor.extract("I had a fever last week but it is gone now").fallback_reason == "not_current"
+    assert extractor.extract("My son used to have ear pain").fallback_reason == "third_party"
+    assert extractor.extract("my mom has hearing loss, I have a cough").fallback_reason == "third_party"
+    assert extractor.extract("Fever free since Monday").fallback_reason == "not_current"
+    assert extractor.extract("I don't get ear pain anymore").fallback_reason is not None
+
+def test_words_outside_the_lexicon_lower_confidence(extractor):
+    assert extractor.extract("sore throat").confidence == 1.0
+    result = extractor.extract("sore throat after swimming in the lake")
+    assert result.confidence < 1.0
+    assert result.fallback_reason == "low_confidence"
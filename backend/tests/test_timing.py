@@ -0,0 +1,60 @@
+import asyncio
+from backend.utils.batching import MicroBatcher
+from backend.utils.metrics import MetricsRegistry, render_prometheus
+from backend.utils.timing import StagedResults, start_timer
+
+
+def test_stages_accumulate_and_render_as_server_timing():
+    timer = start_timer("test_timing")
+    timer.record("model", 0.002)
+    timer.record("model", 0.001)
+    with timer.stage("serialize"):
+        pass
+    timer.finish()
+
+    assert timer.as_dict()["model"] == 3.0
+    assert list(timer.stages) == ["model", "serialize", "total"]
+    assert timer.server_timing().startswith("model;dur=3.000, serialize;dur=")
+
+def test_batcher_reports_queue_wait_and_batch_stages_to_each_caller():
+    def process(items):
+        return StagedResults([item * 2 for item in items], {"model": 0.5})
+
+    async def request(batcher, item):
+        timer = start_timer("test_timing_batch")
+        result = await batcher.submit(item)
+        return result, dict(timer.stages)
+
+    async def run():
+        batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=10, name="test_timing_batcher")
+        results = await asyncio.gather(request(batcher, 1), request(batcher, 2))
+        await batcher.close()
+        return results
+
+    for (result, stages), item in zip(asyncio.run(run()), (1, 2)):
+        assert result == item * 2
+        assert stages["model"] == 0.5
+        assert stages["queue"] >= 0
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(3)
+    registry.gauge("in_flight").set(2)
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    assert render_prometheus(registry).splitlines() == [
+        "# TYPE in_flight gauge",
+        "in_flight 2",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 0.55",
+        "latency_seconds_count 2",
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        "requests_total 3",
+    ]
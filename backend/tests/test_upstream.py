@@ -0,0 +1,106 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from types import SimpleNamespace
+from backend.utils.upstream import UpstreamBusy, UpstreamClient, UpstreamDeadlineExceeded
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+class FakeStream:
+    def __init__(self, chunks, fail_after=None, delay=0.0):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise rate_limit_error()
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+class FakeClient:
+    """Replays one outcome per create() call: an exception to raise or a FakeStream."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **request):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+def collect(upstream, **request):
+    async def run():
+        return [chunk async for chunk in upstream.stream_chat_completion(**request)]
+    return asyncio.run(run())
+
+def test_retries_before_the_first_chunk():
+    stream = FakeStream(["a", "b"])
+    client = FakeClient([rate_limit_error(), FakeStream(["x"], fail_after=0), stream])
+    upstream = UpstreamClient(client, max_retries=2, backoff=0.001, name="test_upstream_retry")
+    assert collect(upstream, model="m") == ["a", "b"]
+    assert client.calls == 3
+    assert stream.closed
+
+def test_gives_up_after_max_retries():
+    client = FakeClient([rate_limit_error(), rate_limit_error()])
+    upstream = UpstreamClient(client, max_retries=1, backoff=0.001, name="test_upstream_give_up")
+    with pytest.raises(openai.RateLimitError):
+        collect(upstream, model="m")
+    assert client.calls == 2
+
+def test_no_retry_once_streaming_started():
+    client = FakeClient([FakeStream(["a", "b"], fail_after=1), FakeStream(["c"])])
+    upstream = UpstreamClient(client, max_retries=2, backoff=0.001, name="test_upstream_midstream")
+    received = []
+
+    async def run():
+        async for chunk in upstream.stream_chat_completion(model="m"):
+            received.append(chunk)
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run())
+    assert received == ["a"]
+    assert client.calls == 1
+
+def test_rejects_when_no_slot_frees_up():
+    upstream = UpstreamClient(FakeClient([FakeStream(["a", "b"], delay=0.2)]), max_concurrency=1,
+                              queue_timeout=0.05, name="test_upstream_busy")
+
+    async def consume():
+        return [chunk async for chunk in upstream.stream_chat_completion(model="m")]
+
+    async def run():
+        first = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        with pytest.raises(UpstreamBusy):
+            await consume()
+        return await first
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert upstream._slots._value == 1
+
+def test_deadline_covers_the_whole_stream():
+    stream = FakeStream(["a", "b", "c"], delay=0.05)
+    upstream = UpstreamClient(FakeClient([stream]), deadline=0.08, name="test_upstream_deadline")
+    with pytest.raises(UpstreamDeadlineExceeded):
+        collect(upstream, model="m")
+    assert stream.closed
+    assert upstream._in_flight.value == 0
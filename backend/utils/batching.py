@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from .metrics import REGISTRY
+from .timing import current_timer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `max_wait_ms` (or until `max_batch_size`
+    items are waiting) and hands them to `process_batch` as one list.
+
+    `process_batch` receives a list of items and must return a list of results in
+    the same order; every caller gets back its own result (or the batch's exception).
+    With an `executor` the batch runs there and is awaited, keeping the event loop free;
+    up to `max_concurrent_batches` batches may be in the executor at once.
+    Each caller's request timer (utils.timing) gets its queue wait and the batch's
+    stage durations when process_batch reports them.
+    """
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=5.0, name="predict", executor=None, max_concurrent_batches=1):
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_concurrent_batches = max(1, int(max_concurrent_batches))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = None
+        self._worker = None
+        self._in_flight = set()
+
+        self.batch_size = REGISTRY.histogram(
+            f"{name}_batch_size", "Number of requests processed together", buckets=BATCH_SIZE_BUCKETS
+        )
+        self.wait_time = REGISTRY.histogram(
+            f"{name}_batch_wait_seconds", "Time a request waited in the queue before its batch started"
+        )
+        self.process_time = REGISTRY.histogram(
+            f"{name}_batch_process_seconds", "Time spent processing one batch"
+        )
+
+    def _ensure_worker(self):
+        """
+        Starts the collector task on the running loop (first submit, or after a loop change).
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        """
+        Queues one item and waits for its result.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter(), current_timer()))
+        return await future
+
+    async def _collect(self):
+        """
+        Waits for the first request, then gathers more until the batch is full or the window closes.
+        """
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued without yielding to the loop
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        # One slot per batch allowed in flight; new batches keep forming while workers are busy
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+        while True:
+            await slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                slots.release()
+                raise
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _dispatch(self, batch):
+        # Callers that went away (client disconnect) do not need a prediction
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, enqueued_at, timer in batch:
+            self.wait_time.observe(started - enqueued_at)
+            if timer is not None:
+                timer.record("queue", started - enqueued_at)
+        self.batch_size.observe(len(batch))
+
+        try:
+            results = await self._process([item for item, _, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.exception(f"{self.name} batch of {len(batch)} failed")
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.process_time.observe(time.perf_counter() - started)
+
+        stages = getattr(results, "stages", None) or {}
+        for (_, future, _, timer), result in zip(batch, results):
+            if timer is not None:
+                for stage, seconds in stages.items():
+                    timer.record(stage, seconds)
+            if not future.done():
+                future.set_result(result)
+
+    async def run_batch(self, items):
+        """
+        Runs an already assembled batch through the same executor, bypassing the
+        collection window (bulk callers batch for themselves).
+        """
+        return await self._process(items)
+
+    async def _process(self, items):
+        if self.executor is None:
+            return self.process_batch(items)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.process_batch, items)
+
+    async def close(self):
+        """
+        Stops the collector task; requests still queued are cancelled.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        for task in list(self._in_flight):
+            task.cancel()
+
+        while self._queue is not None and not self._queue.empty():
+            _, future, _, _ = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
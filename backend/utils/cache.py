@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from .metrics import REGISTRY
+
+
+def file_fingerprint(paths):
+    """
+    Returns a cheap fingerprint (mtime, size) of the given files; missing files count too.
+    """
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    If a `fingerprint` callable is given, it is re-evaluated at most every
+    `check_interval` seconds and the whole cache is cleared when its value
+    changes (e.g. model artifacts or data files replaced on disk).
+    Hits, misses, evictions and invalidations are counted in the metrics registry.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0, name="cache", fingerprint=None, check_interval=5.0):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl) if ttl else None
+        self.name = name
+        self.fingerprint = fingerprint
+        self.check_interval = check_interval
+
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._last_fingerprint = fingerprint() if fingerprint else None
+        self._next_check = time.monotonic() + check_interval
+
+        self.hits = REGISTRY.counter(f"{name}_hits_total", "Cache lookups served from the cache")
+        self.misses = REGISTRY.counter(f"{name}_misses_total", "Cache lookups that had to be computed")
+        self.evictions = REGISTRY.counter(f"{name}_evictions_total", "Entries dropped for size or age")
+        self.invalidations = REGISTRY.counter(f"{name}_invalidations_total", "Full clears after a source change")
+
+    def _check_fingerprint(self, now):
+        if self.fingerprint is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        current = self.fingerprint()
+        if current != self._last_fingerprint:
+            self._last_fingerprint = current
+            self.clear()
+            self.invalidations.inc()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        self._check_fingerprint(now)
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._data[key]
+                self.evictions.inc()
+
+        self.misses.inc()
+        return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits.value + self.misses.value
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "hit_rate": round(self.hits.value / lookups, 4) if lookups else None,
+            "evictions": self.evictions.value,
+            "invalidations": self.invalidations.value,
+        }
@@ -0,0 +1,83 @@
+import logging
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Optional: exact counts when installed, a character heuristic otherwise
+    tiktoken = None
+
+# Per-message framing tokens in the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+PROMPT_TOKENS_BEFORE = REGISTRY.counter("prompt_tokens_before_compaction_total", "Prompt tokens the full history would have used")
+PROMPT_TOKENS_AFTER = REGISTRY.counter("prompt_tokens_after_compaction_total", "Prompt tokens actually sent to OpenAI")
+
+_encodings = {}
+
+
+def count_text_tokens(text, model="gpt-4-turbo"):
+    """
+    Token count of a string: tiktoken's when available, else ~4 characters per token.
+    """
+    if tiktoken is not None:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _encodings[model] = encoding
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages, model="gpt-4-turbo"):
+    return sum(count_text_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def symptom_summary(known_symptoms):
+    """
+    Short system note standing in for the turns that established the known symptoms.
+    """
+    return {
+        "role": "system",
+        "content": (
+            f"Symptoms already recorded earlier in this conversation: {', '.join(sorted(known_symptoms))}. "
+            "Older messages are omitted; extract the symptoms stated in the messages below."
+        ),
+    }
+
+
+def compact_messages(system_prompt, messages, known_symptoms=(), max_messages=6, token_budget=1500, model="gpt-4-turbo"):
+    """
+    Builds the extraction prompt: the system prompt, a summary of the symptoms already
+    known (when older turns are dropped), and the most recent messages - at most
+    max_messages, fewer if needed to fit token_budget. The latest message is always
+    kept. Messages are {"role", "content"} dicts.
+    """
+    full_prompt = [system_prompt, *messages]
+    before = count_message_tokens(full_prompt, model)
+
+    recent = list(messages[-max_messages:]) if max_messages > 0 else list(messages[-1:])
+    summary = [symptom_summary(known_symptoms)] if known_symptoms and len(recent) < len(messages) else []
+
+    used = count_message_tokens([system_prompt, *summary, *recent], model)
+    while used > token_budget and len(recent) > 1:
+        dropped = recent.pop(0)
+        used -= count_text_tokens(dropped["content"], model) + MESSAGE_OVERHEAD_TOKENS
+        if not summary and known_symptoms:
+            summary = [symptom_summary(known_symptoms)]
+            used += count_message_tokens(summary, model)
+
+    prompt = [system_prompt, *summary, *recent]
+    PROMPT_TOKENS_BEFORE.inc(before)
+    PROMPT_TOKENS_AFTER.inc(used)
+    # Only turns that actually lost or summarized messages are worth an INFO line
+    log = logger.info if len(prompt) != len(full_prompt) or summary else logger.debug
+    log(
+        f"Prompt compaction: {before} -> {used} tokens, {len(full_prompt)} -> {len(prompt)} messages"
+        f"{'' if tiktoken is not None else ' (estimated)'}"
+    )
+    return prompt
@@ -10,6 +10,22 @@ def remove_duplicate_sentences(text):
     sentences = list(dict.fromkeys(re.split(r'(?<=[.!?])\s+', text)))  # Remove exact duplicates
     return " ".join(sentences)
 
+def normalize_drug_name(drug_name):
+    """ Normalizes drug names so "Anti Itch" and "Anti-Itch" count as the same drug. """
+    return drug_name.lower().replace("-", "").replace(" ", "")
+
+def clean_drug_text(raw_text, max_chars=500):
+    """
+    Cleans label text for display: collapses whitespace, strips encoding debris and
+    symbols, removes duplicate sentences and truncates.
+    """
+    cleaned = re.sub(r'\s+', ' ', raw_text).strip()
+    cleaned = re.sub(r'\\u[0-9a-fA-F]{4}', '', cleaned)  # Remove Unicode placeholders
+    cleaned = cleaned.replace('\u0010', '').replace('\u00051', '')
+    cleaned = cleaned.replace("•", "").replace("􀁑", "-")  # Replace symbols
+    cleaned = remove_duplicate_sentences(cleaned)  # ✅ Remove duplicate sentences
+    return cleaned[:max_chars]  # Truncate long text
+
 def format_drug_info(drug_data: dict, disease: str) -> str:
     """
     Formats raw drug info into a clean, readable format with deduplication and normalization.
@@ -19,7 +35,7 @@ def format_drug_info(drug_data: dict, disease: str) -> str:
 
     for i, (drug_name, sections) in enumerate(drug_data.items()):
         # Normalize drug name to avoid duplicates like "Anti Itch" and "Anti-Itch"
-        normalized_name = drug_name.lower().replace("-", "").replace(" ", "")
+        normalized_name = normalize_drug_name(drug_name)
         if normalized_name in normalized_seen:
             continue
         normalized_seen.add(normalized_name)
@@ -32,12 +48,7 @@ def format_drug_info(drug_data: dict, disease: str) -> str:
             raw_text += f" {val}"
 
         # Clean up text
-        cleaned = re.sub(r'\s+', ' ', raw_text).strip()
-        cleaned = re.sub(r'\\u[0-9a-fA-F]{4}', '', cleaned)  # Remove Unicode placeholders
-        cleaned = cleaned.replace('\u0010', '').replace('\u00051', '')
-        cleaned = cleaned.replace("•", "").replace("􀁑", "-")  # Replace symbols
-        cleaned = remove_duplicate_sentences(cleaned)  # ✅ Remove duplicate sentences
-        cleaned = cleaned[:500]  # Truncate long text
+        cleaned = clean_drug_text(raw_text)
 
         # Add to response
         response_lines.append(f"{len(response_lines)}. **{drug_name.title()}**\n   - {cleaned}\n")
@@ -77,26 +88,106 @@ def match_drug_relevance(drug_data, symptoms):
     return sorted_drugs  # Returns {drug_name: score}
 
 
-def search_drug_info(predicted_disease, medical_advice_data, cleaned_symptoms):
+def resolve_disease_name(predicted_disease, medical_advice_data):
+    """
+    Maps a predicted label onto the dataset's disease key. Title-casing alone breaks
+    names like "Otitis Media with Effusion", so fall back to a case-insensitive match.
+    """
+    disease_name = predicted_disease.strip()
+    if disease_name in medical_advice_data:
+        return disease_name
+    if disease_name.title() in medical_advice_data:
+        return disease_name.title()
+
+    folded = disease_name.casefold()
+    for key in medical_advice_data:
+        if key.casefold() == folded:
+            return key
+    return disease_name.title()
+
+def search_drug_info(predicted_disease, medical_advice_data, cleaned_symptoms, drug_index=None):
     """
     Search for drugs relevant to the predicted disease and rank them based on symptom relevance.
+
+    With a DrugIndex (utils/drug_index.py) the drugs are returned most relevant first;
+    without one they keep their dataset order.
     """
-    if isinstance(predicted_disease, np.ndarray):
+    if isinstance(predicted_disease, (list, np.ndarray)):
         predicted_disease = predicted_disease[0]
 
     if not isinstance(predicted_disease, str):
         return "Error: Invalid disease format."
 
-    disease_name = predicted_disease.strip().title()
+    disease_name = resolve_disease_name(predicted_disease, medical_advice_data)
 
     if disease_name in medical_advice_data:
         drug_data = medical_advice_data[disease_name]
-        
-        # Get top 3 most relevant drugs based on symptom matching
-        # ranked_drugs = match_drug_relevance(drug_data, cleaned_symptoms)
-        top_3_drugs = {k: drug_data[k] for k in list(drug_data.keys())[:3]}
-        
-        # return format_drug_info(top_3_drugs, disease_name)
-        return drug_data
-
-    return {}
\ No newline at end of file
+
+        if drug_index is not None and disease_name in drug_index:
+            # Index lookup only; no label text is rebuilt here
+            ranked_drugs = drug_index.rank(disease_name, cleaned_symptoms)
+            return {drug_name: drug_data[drug_name] for drug_name in ranked_drugs}
+
+        return dict(drug_data)  # A plain dict even when the data is a compiled store view
+
+    return {}
+
+
+# Label sections kept in the compact per-turn drug summary
+SUMMARY_FIELDS = ("indications_and_usage", "dosage_and_administration", "contraindications", "adverse_reactions")
+
+def summarize_drug(sections, fields=SUMMARY_FIELDS, max_chars=300):
+    """
+    Cleaned, truncated copy of the selected label sections ("N/A" sections dropped).
+    """
+    summary = {}
+    for field in fields:
+        value = sections.get(field)
+        if isinstance(value, list):
+            value = " ".join(value)
+        if not value or value == "N/A":
+            continue
+        summary[field] = clean_drug_text(str(value), max_chars=max_chars)
+    return summary
+
+def build_drug_summaries(medical_advice_data, fields=SUMMARY_FIELDS, max_chars=300):
+    """
+    Precomputes {disease: {drug: summary}} once, deduplicating drug names the way
+    format_drug_info does, so chat turns never clean label text per request.
+    """
+    summaries = {}
+    for disease, drug_data in medical_advice_data.items():
+        seen = set()
+        disease_summaries = {}
+        for drug_name, sections in drug_data.items():
+            normalized_name = normalize_drug_name(drug_name)
+            if normalized_name in seen:
+                continue
+            seen.add(normalized_name)
+            disease_summaries[drug_name] = summarize_drug(sections, fields, max_chars)
+        summaries[disease] = disease_summaries
+    return summaries
+
+def summarize_drug_info(predicted_disease, drug_summaries, cleaned_symptoms, drug_index=None, top_n=3):
+    """
+    Compact counterpart of search_drug_info: the top-N most relevant drugs for the
+    disease with their precomputed summaries.
+    """
+    if isinstance(predicted_disease, (list, np.ndarray)):
+        predicted_disease = predicted_disease[0]
+
+    if not isinstance(predicted_disease, str):
+        return "Error: Invalid disease format."
+
+    disease_name = resolve_disease_name(predicted_disease, drug_summaries)
+    disease_summaries = drug_summaries.get(disease_name)
+    if not disease_summaries:
+        return {}
+
+    if drug_index is not None and disease_name in drug_index:
+        ranked_drugs = drug_index.rank(disease_name, cleaned_symptoms)
+    else:
+        ranked_drugs = list(disease_summaries)
+
+    top_drugs = [drug_name for drug_name in ranked_drugs if drug_name in disease_summaries][:top_n]
+    return {drug_name: disease_summaries[drug_name] for drug_name in top_drugs}
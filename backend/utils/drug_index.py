@@ -0,0 +1,107 @@
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def label_text(sections):
+    """
+    Concatenates every label section of a drug (lists joined) into one string.
+    """
+    parts = []
+    for value in sections.values():
+        if isinstance(value, list):
+            value = " ".join(value)
+        parts.append(str(value))
+    return " ".join(parts)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def split_symptoms(symptoms):
+    """
+    Accepts a symptom list or the canonical "a, b, c" string from preprocess_text.
+    """
+    if isinstance(symptoms, str):
+        symptoms = symptoms.split(",")
+    return [s for s in (symptom.strip() for symptom in symptoms) if s]
+
+
+class DrugIndex:
+    """
+    Normalized per-drug label text plus a per-disease token -> drugs inverted index,
+    built once from ent_drug_data.json.
+
+    A symptom matches a drug when all of its tokens appear in the drug's label and
+    the phrase occurs on token boundaries ("ear pain" matches "... ear pain ..." but
+    "ear" does not match "year"). Ranking only touches drugs returned by the
+    postings of the symptom's rarest token, so no label text is rebuilt per request.
+    """
+
+    def __init__(self):
+        self._texts = {}     # disease -> {drug: " normalized label text "}
+        self._postings = {}  # disease -> {token: set(drugs)}
+        self._order = {}     # disease -> {drug: position in the source data}
+
+    @classmethod
+    def build(cls, medical_advice_data):
+        index = cls()
+        for disease, drug_data in medical_advice_data.items():
+            index.add_disease(disease, drug_data)
+        return index
+
+    def add_disease(self, disease, drug_data):
+        texts, postings, order = {}, {}, {}
+        for position, (drug_name, sections) in enumerate(drug_data.items()):
+            tokens = tokenize(label_text(sections))
+            # Padded with spaces so phrase checks can require token boundaries
+            texts[drug_name] = f" {' '.join(tokens)} "
+            order[drug_name] = position
+            for token in set(tokens):
+                postings.setdefault(token, set()).add(drug_name)
+
+        self._texts[disease] = texts
+        self._postings[disease] = postings
+        self._order[disease] = order
+
+    def __contains__(self, disease):
+        return disease in self._texts
+
+    def _matching_drugs(self, disease, symptom):
+        tokens = tokenize(symptom)
+        if not tokens:
+            return set()
+
+        postings = self._postings.get(disease, {})
+        candidate_lists = [postings.get(token) for token in tokens]
+        if any(not candidates for candidates in candidate_lists):
+            return set()
+
+        candidates = set.intersection(*sorted(candidate_lists, key=len))
+        if len(tokens) == 1:
+            return candidates
+
+        phrase = f" {' '.join(tokens)} "
+        texts = self._texts[disease]
+        return {drug for drug in candidates if phrase in texts[drug]}
+
+    def score(self, disease, symptoms):
+        """
+        Returns {drug: number of symptoms mentioned in its label} for drugs with a match.
+        """
+        scores = {}
+        for symptom in set(split_symptoms(symptoms)):
+            for drug in self._matching_drugs(disease, symptom):
+                scores[drug] = scores.get(drug, 0) + 1
+        return scores
+
+    def rank(self, disease, symptoms, top_k=None):
+        """
+        Returns the disease's drug names ordered by symptom relevance (most matches
+        first, ties and unmatched drugs kept in their original order).
+        """
+        order = self._order.get(disease, {})
+        scores = self.score(disease, symptoms)
+        ranked = sorted(order, key=lambda drug: (-scores.get(drug, 0), order[drug]))
+        return ranked[:top_k] if top_k is not None else ranked
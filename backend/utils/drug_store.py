@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Mapping
+from .drug import SUMMARY_FIELDS, build_drug_summaries
+from .drug_index import label_text, split_symptoms, tokenize
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = "2"
+
+# Upper bound for SQLite's memory map; the file is mapped up to its actual size
+MMAP_SIZE = 1 << 30
+
+# Small pages: most tables hold a handful of rows, and each takes at least one page
+PAGE_SIZE = 1024
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE diseases (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE drugs (
+    disease_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    sections BLOB NOT NULL,  -- zlib-compressed JSON
+    PRIMARY KEY (disease_id, position)
+) WITHOUT ROWID;
+CREATE INDEX drugs_by_name ON drugs (disease_id, name);
+-- Label text as DrugIndex tokenizes it ([a-z0-9]+), so the ascii tokenizer splits it identically.
+-- rowid = disease_id << POSITION_BITS | position, so a disease is one rowid range.
+-- Contentless and without column sizes: only the rowids of phrase matches are ever read.
+CREATE VIRTUAL TABLE drug_text USING fts5(text, tokenize = 'ascii', content = '', columnsize = 0);
+"""
+
+POSITION_BITS = 20
+
+
+def compile_drug_data(json_path, db_path):
+    """
+    Compiles ent_drug_data.json into a read-only SQLite file: the drug label sections
+    as compressed JSON per (disease, drug) plus a contentless FTS5 index of the label
+    text for symptom ranking, on small pages, so the file stays close to the JSON's size. Written to a temporary file and renamed, so readers never see a partial
+    database. Returns (diseases, drugs).
+    """
+    with open(json_path, "r") as file:
+        data = json.load(file)
+
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    drug_count = 0
+    try:
+        conn.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+        conn.executescript(SCHEMA)
+        for disease_id, (disease, drug_data) in enumerate(data.items()):
+            conn.execute("INSERT INTO diseases (id, name) VALUES (?, ?)", (disease_id, disease))
+            for position, (drug_name, sections) in enumerate(drug_data.items()):
+                conn.execute(
+                    "INSERT INTO drugs (disease_id, position, name, sections) VALUES (?, ?, ?, ?)",
+                    (disease_id, position, drug_name, zlib.compress(json.dumps(sections, separators=(",", ":")).encode(), 9)),
+                )
+                conn.execute(
+                    "INSERT INTO drug_text (rowid, text) VALUES (?, ?)",
+                    ((disease_id << POSITION_BITS) | position, " ".join(tokenize(label_text(sections)))),
+                )
+                drug_count += 1
+        conn.execute("INSERT INTO drug_text (drug_text) VALUES ('optimize')")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("schema_version", SCHEMA_VERSION), ("source", os.path.abspath(json_path)),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    logger.info(f"Compiled {json_path} into {db_path} ({len(data)} diseases, {drug_count} drugs)")
+    return len(data), drug_count
+
+
+def open_drug_data(json_path, db_path=None):
+    """
+    The drug dataset for the pipeline: the parsed JSON when db_path is None, otherwise
+    the compiled store, (re)built first when it is missing, older than the JSON or
+    compiled with another schema version.
+    """
+    if db_path is None:
+        with open(json_path, "r") as file:
+            return json.load(file)
+    if not os.path.exists(db_path) or (
+        os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(db_path)
+    ) or _schema_version(db_path) != SCHEMA_VERSION:
+        compile_drug_data(json_path, db_path)
+    return CompiledDrugData(db_path)
+
+
+def _schema_version(db_path):
+    conn = sqlite3.connect(f"{pathlib.Path(db_path).absolute().as_uri()}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    except sqlite3.DatabaseError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+class CompiledDrugData(Mapping):
+    """
+    Read-only {disease: {drug: sections}} view of a compiled drug database.
+
+    Only the disease names are loaded up front. The file is opened immutable and
+    memory-mapped, so every worker process shares the same page-cache pages instead
+    of holding its own parsed copy; a drug's sections are decompressed and decoded
+    from JSON when accessed (the most recent cache_size are kept decoded). Connections are per
+    thread (and process), as sqlite3 requires.
+    """
+
+    def __init__(self, path, cache_size=256):
+        self.path = path
+        self.cache_size = cache_size
+        self._uri = f"{pathlib.Path(path).absolute().as_uri()}?mode=ro&immutable=1"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._decoded = OrderedDict()  # (disease_id, drug) -> sections
+        self._names = {}               # disease_id -> drug names in dataset order
+
+        conn = self._connection()
+        version = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if version is None or version[0] != SCHEMA_VERSION:
+            raise ValueError(f"{path} was compiled with an incompatible schema; recompile it")
+        self._diseases = {name: disease_id for disease_id, name in conn.execute("SELECT id, name FROM diseases ORDER BY id")}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        # A connection must not be used across fork(); a forked worker opens its own
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._uri, uri=True)
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __getitem__(self, disease):
+        return CompiledDiseaseDrugs(self, disease, self._diseases[disease])
+
+    def __contains__(self, disease):
+        return disease in self._diseases
+
+    def __iter__(self):
+        return iter(self._diseases)
+
+    def __len__(self):
+        return len(self._diseases)
+
+    def disease_id(self, disease):
+        return self._diseases.get(disease)
+
+    def drug_count(self):
+        """
+        Distinct drug names across all diseases.
+        """
+        return self._connection().execute("SELECT COUNT(DISTINCT name) FROM drugs").fetchone()[0]
+
+    def drug_names(self, disease_id):
+        names = self._names.get(disease_id)
+        if names is None:
+            names = [name for (name,) in self._connection().execute(
+                "SELECT name FROM drugs WHERE disease_id = ? ORDER BY position", (disease_id,)
+            )]
+            self._names[disease_id] = names
+        return names
+
+    def sections(self, disease_id, drug):
+        key = (disease_id, drug)
+        with self._lock:
+            sections = self._decoded.get(key)
+            if sections is not None:
+                self._decoded.move_to_end(key)
+                return sections
+
+        row = self._connection().execute(
+            "SELECT sections FROM drugs WHERE disease_id = ? AND name = ?", (disease_id, drug)
+        ).fetchone()
+        if row is None:
+            raise KeyError(drug)
+        sections = json.loads(zlib.decompress(row[0]))
+        with self._lock:
+            self._decoded[key] = sections
+            while len(self._decoded) > self.cache_size:
+                self._decoded.popitem(last=False)
+        return sections
+
+    def matching_positions(self, disease_id, tokens):
+        """
+        Dataset positions of the disease's drugs whose label contains the token phrase.
+        """
+        phrase = '"' + " ".join(tokens) + '"'
+        first = disease_id << POSITION_BITS
+        mask = (1 << POSITION_BITS) - 1
+        # The rowid range keeps the full-text lookup inside this disease's documents
+        return {rowid & mask for (rowid,) in self._connection().execute(
+            "SELECT rowid FROM drug_text WHERE drug_text MATCH ? AND rowid BETWEEN ? AND ?", (phrase, first, first | mask)
+        )}
+
+    def index(self):
+        return CompiledDrugIndex(self)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class CompiledDiseaseDrugs(Mapping):
+    """
+    One disease's {drug: sections}, decoded lazily; iterates in dataset order.
+    """
+
+    def __init__(self, store, disease, disease_id):
+        self.store = store
+        self.disease = disease
+        self.disease_id = disease_id
+
+    def __getitem__(self, drug):
+        return self.store.sections(self.disease_id, drug)
+
+    def __iter__(self):
+        return iter(self.store.drug_names(self.disease_id))
+
+    def __len__(self):
+        return len(self.store.drug_names(self.disease_id))
+
+
+class CompiledDrugIndex:
+    """
+    DrugIndex backed by the compiled store's FTS5 table: same matching rules (phrases
+    on token boundaries) and ranking, without building postings in memory.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __contains__(self, disease):
+        return disease in self.store
+
+    def score(self, disease, symptoms):
+        """
+        Returns {drug: number of symptoms mentioned in its label} for drugs with a match.
+        """
+        disease_id = self.store.disease_id(disease)
+        if disease_id is None:
+            return {}
+        names = self.store.drug_names(disease_id)
+        scores = {}
+        for symptom in set(split_symptoms(symptoms)):
+            tokens = tokenize(symptom)
+            if not tokens:
+                continue
+            for position in self.store.matching_positions(disease_id, tokens):
+                scores[names[position]] = scores.get(names[position], 0) + 1
+        return scores
+
+    def rank(self, disease, symptoms, top_k=None):
+        """
+        Returns the disease's drug names ordered by symptom relevance (most matches
+        first, ties and unmatched drugs kept in their original order).
+        """
+        disease_id = self.store.disease_id(disease)
+        if disease_id is None:
+            return []
+        names = self.store.drug_names(disease_id)
+        scores = self.score(disease, symptoms)
+        ranked = [name for _, name in sorted(enumerate(names), key=lambda item: (-scores.get(item[1], 0), item[0]))]
+        return ranked[:top_k] if top_k is not None else ranked
+
+
+class LazyDrugSummaries(Mapping):
+    """
+    {disease: {drug: summary}} like build_drug_summaries, computed per disease on first
+    use instead of for the whole dataset at startup.
+    """
+
+    def __init__(self, data, fields=SUMMARY_FIELDS, max_chars=300):
+        self.data = data
+        self.fields = fields
+        self.max_chars = max_chars
+        self._summaries = {}
+
+    def __getitem__(self, disease):
+        summaries = self._summaries.get(disease)
+        if summaries is None:
+            summaries = build_drug_summaries({disease: self.data[disease]}, self.fields, self.max_chars)[disease]
+            self._summaries[disease] = summaries
+        return summaries
+
+    def __contains__(self, disease):
+        return disease in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m utils.drug_store <ent_drug_data.json> <output.sqlite3>")
+    compile_drug_data(sys.argv[1], sys.argv[2])
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from . import pipeline
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+
+
+def create_executor(kind="thread", max_workers=2, drug_data_path=None, start_method="spawn", model_dir=None, drug_options=None,
+                    drug_db_path=None):
+    """
+    Creates the pool the CPU-bound prediction pipeline runs in.
+
+    - "inline": no pool, batches run on the event loop (debugging / tests)
+    - "thread": thread pool sharing the already loaded models and drug data
+    - "process": process pool; every worker loads the models and drug data once
+      through pipeline.init_worker, so predictions do not contend for the GIL
+    """
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown prediction executor '{kind}', expected one of {EXECUTOR_KINDS}")
+
+    if kind == "inline":
+        return None
+
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="predict")
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=pipeline.init_worker,
+        initargs=(drug_data_path, model_dir, drug_options, drug_db_path),
+    )
+
+
+async def warm_up(executor, max_workers, timeout=120.0):
+    """
+    Starts every worker (running its initializer) before the app reports ready.
+
+    Process workers initialize at different speeds and a finished worker happily
+    takes the next task, so keep sending short tasks until every worker process
+    has answered at least once.
+    """
+    if executor is None:
+        return
+
+    loop = asyncio.get_running_loop()
+    expected = max_workers if isinstance(executor, ProcessPoolExecutor) else 1
+    deadline = loop.time() + timeout
+    pids = set()
+
+    while len(pids) < expected and loop.time() < deadline:
+        pids.update(await asyncio.gather(
+            *(loop.run_in_executor(executor, pipeline.worker_pid, 0.05) for _ in range(max_workers))
+        ))
+
+    logger.info(f"Prediction executor warm ({max_workers} workers in {len(pids)} process(es))")
+
+
+def shutdown_executor(executor, cancel_futures=True):
+    """
+    Stops the pool. With cancel_futures=False, work already submitted still completes
+    (used when swapping in a new pool during a model reload).
+    """
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=cancel_futures)
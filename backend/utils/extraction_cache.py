@@ -0,0 +1,67 @@
+import hashlib
+import json
+import re
+import unicodedata
+from .cache import TTLCache
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,!?;:'\"…"
+
+
+def normalize_message(text):
+    """
+    Cache key form of a user message: Unicode-normalized, case-folded, whitespace
+    collapsed and without surrounding punctuation ("I have a Fever!" == "i have a fever").
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip(_EDGE_PUNCTUATION)
+
+
+def prompt_version(model, system_prompt, tools):
+    """
+    Short hash of everything that shapes the extraction call besides the messages.
+    """
+    payload = json.dumps([model, system_prompt, tools], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class ExtractionCache:
+    """
+    Symptom-extraction results of the LLM tool call, keyed by the normalized user
+    message and the prompt version, so a repeated message skips the OpenAI round trip.
+
+    Values are (symptoms, frames): the parsed symptom list and the SSE text the LLM
+    stream produced, replayed as is on a hit. `version` is a callable returning the
+    current prompt version; when it changes the entries are cleared (and new keys
+    differ anyway). Messages longer than max_message_chars are not cached - they
+    are almost never repeated.
+    """
+
+    def __init__(self, version, maxsize=2048, ttl=86400.0, max_message_chars=300,
+                 check_interval=5.0, name="extraction_cache"):
+        self.version = version
+        self.max_message_chars = max_message_chars
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, name=name, fingerprint=version, check_interval=check_interval)
+
+    def _key(self, message):
+        if not message or len(message) > self.max_message_chars:
+            return None
+        return (self.version(), normalize_message(message))
+
+    def get(self, message):
+        key = self._key(message)
+        return self._cache.get(key) if key is not None else None
+
+    def set(self, message, symptoms, frames=""):
+        key = self._key(message)
+        if key is not None:
+            self._cache.set(key, (tuple(symptoms), frames))
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        return self._cache.stats()
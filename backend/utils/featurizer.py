@@ -0,0 +1,125 @@
+import re
+import string
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l1, inplace_csr_row_normalize_l2
+
+# preprocess_text keeps ASCII letters and (Unicode) whitespace only
+_NON_LETTERS = re.compile(r"[^a-zA-Z\s]")
+# Same filter for pure-ASCII symptoms as a str.translate table (no regex engine)
+_ASCII_NON_LETTERS = str.maketrans("", "", "".join(
+    c for c in map(chr, range(128)) if c not in string.ascii_letters and not c.isspace()
+))
+
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+def clean_symptom(symptom):
+    """
+    One symptom as preprocess_text cleans it (lowercased, letters and whitespace only, stripped).
+    """
+    symptom = symptom.lower()
+    if symptom.isascii():
+        return symptom.translate(_ASCII_NON_LETTERS).strip()
+    return _NON_LETTERS.sub("", symptom).strip()
+
+
+class FusedFeaturizer:
+    """
+    preprocess_text + TfidfVectorizer.transform in one pass over the raw symptom lists.
+
+    Works from the fitted vectorizer's vocabulary and idf weights: each symptom is
+    cleaned once, the deduplicated symptoms are split on whitespace and looked up in
+    the vocabulary directly, and the counts go through the same tf / idf / norm steps
+    as TfidfTransformer, so rows are bit-for-bit identical to the two-step path.
+    This holds because cleaned text only contains ASCII letters and whitespace, where
+    the default token pattern (runs of two or more word characters) is a whitespace split.
+    """
+
+    def __init__(self, vocabulary, idf=None, norm="l2", binary=False, sublinear_tf=False, dtype=np.float64):
+        self.vocabulary = dict(vocabulary)
+        self.n_features = len(self.vocabulary)
+        self.idf = None if idf is None else np.asarray(idf, dtype=np.float64)
+        self.norm = norm
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.dtype = dtype
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        """
+        Featurizer for a fitted TfidfVectorizer, or None when it is configured in a way
+        this does not reproduce (custom analyzer, tokenizer, preprocessor, n-grams or
+        token pattern); callers then keep using vectorizer.transform.
+        """
+        params = vectorizer.get_params()
+        if (params.get("analyzer") != "word" or params.get("tokenizer") is not None
+                or params.get("preprocessor") is not None or tuple(params.get("ngram_range", ())) != (1, 1)
+                or params.get("token_pattern") != DEFAULT_TOKEN_PATTERN):
+            return None
+        return cls(
+            vectorizer.vocabulary_,
+            idf=vectorizer.idf_ if params.get("use_idf", True) else None,
+            norm=params.get("norm", "l2"),
+            binary=params.get("binary", False),
+            sublinear_tf=params.get("sublinear_tf", False),
+            dtype=params.get("dtype", np.float64),
+        )
+
+    def transform(self, symptom_lists, with_text=False):
+        """
+        Returns the TF-IDF matrix for a batch of symptom lists (one row each) and, with
+        with_text=True, also the canonical "a, b, c" strings preprocess_text would produce.
+        """
+        vocabulary = self.vocabulary
+        indptr, indices, counts, texts = [0], [], [], []
+
+        for symptoms in symptom_lists:
+            cleaned = set()
+            for symptom in symptoms:
+                symptom = clean_symptom(symptom)
+                if symptom:
+                    cleaned.add(symptom)
+
+            row = {}
+            for symptom in cleaned:
+                for token in symptom.split():
+                    index = vocabulary.get(token)
+                    if index is not None and len(token) > 1:
+                        row[index] = row.get(index, 0) + 1
+            for index in sorted(row):
+                indices.append(index)
+                counts.append(row[index])
+            indptr.append(len(indices))
+            if with_text:
+                texts.append(", ".join(sorted(cleaned)))
+
+        data = np.ones(len(counts), dtype=self.dtype) if self.binary else np.asarray(counts, dtype=self.dtype)
+        X = sp.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+            shape=(len(indptr) - 1, self.n_features),
+        )
+        X.has_sorted_indices = True
+
+        # The TfidfTransformer.transform steps, in the same order and precision
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if self.idf is not None:
+            X.data *= self.idf[X.indices]
+        # normalize() runs these same kernels, after validation that dominates at this size
+        if self.norm == "l2":
+            inplace_csr_row_normalize_l2(X)
+        elif self.norm == "l1":
+            inplace_csr_row_normalize_l1(X)
+        elif self.norm is not None:
+            X = normalize(X, norm=self.norm, copy=False)
+
+        return (X, texts) if with_text else X
+
+    def transform_one(self, symptoms):
+        """
+        A single symptom list as a 1-row matrix.
+        """
+        return self.transform([symptoms])
@@ -0,0 +1,165 @@
+import numpy as np
+import scipy.sparse as sp
+
+BLOCK_ROWS = 128
+
+
+class CompiledForest:
+    """
+    Array-backed copy of a fitted sklearn RandomForestClassifier.
+
+    Every tree is exported once into flat NumPy arrays (feature, threshold,
+    children, normalized leaf values) and all trees are traversed together with
+    vectorized gathers, so a prediction costs a handful of NumPy calls per tree
+    level instead of sklearn's per-call validation and per-tree dispatch.
+    Leaves point to themselves, which lets traversal run a fixed number of steps
+    without checking which rows have already finished.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        # Traversal works on doubled node ids (2 * node): the (left, right) children of a
+        # node sit side by side, so "id + went_right" picks the next node in one gather.
+        self._feature2 = np.repeat(feature, 2)
+        self._threshold2 = np.repeat(threshold, 2)
+        self._children2 = np.stack([children_left, children_right], axis=1).ravel() * 2
+        self._roots2 = roots * 2
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+        self.n_classes = value.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Exports a fitted RandomForestClassifier into flat arrays.
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back onto themselves so traversal can run a fixed number of steps
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Older sklearn stores class counts and normalizes them in predict_proba; since
+            # 1.4 values are already fractions and used as is. Normalizing only nodes that
+            # do not sum to 1 matches both (and keeps collapsed, non-pure leaves exact).
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64, copy=True)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[(normalizer == 0.0) | (np.abs(normalizer - 1.0) < 1e-9)] = 1.0
+            value /= normalizer
+
+            features.append(feature.astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left.astype(np.intp))
+            rights.append(right.astype(np.intp))
+            values.append(value)
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children_left=np.concatenate(lefts),
+            children_right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+            max_depth=max_depth,
+        )
+
+    def _as_dense(self, X):
+        """
+        Converts sparse or dense input to the float32 matrix sklearn trees compare against.
+        """
+        if sp.issparse(X):
+            X = X.toarray()
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        return X
+
+    def apply(self, X):
+        """
+        Returns the leaf index reached in every tree, shape (n_samples, n_trees).
+        """
+        X = self._as_dense(X)
+        n_samples, n_features = X.shape
+        feature2, threshold2, children2 = self._feature2, self._threshold2, self._children2
+
+        if n_samples == 1:
+            # Single row (the chat path): skip the per-row offsets entirely
+            x = X[0]
+            nodes = self._roots2.copy()
+            for _ in range(self.max_depth):
+                go_right = x.take(feature2.take(nodes)) > threshold2.take(nodes)
+                nodes = children2.take(nodes + go_right)
+            return (nodes // 2)[np.newaxis, :]
+
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.intp) * n_features)[:, np.newaxis]
+        nodes = np.repeat(self._roots2[np.newaxis, :], n_samples, axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat_X.take(row_offsets + feature2.take(nodes)) > threshold2.take(nodes)
+            nodes = children2.take(nodes + go_right)
+
+        return nodes // 2
+
+    def predict_proba(self, X):
+        """
+        Averages per-tree class probabilities, matching RandomForestClassifier.predict_proba.
+        """
+        X = self._as_dense(X)
+        n_samples = X.shape[0]
+        proba = np.empty((n_samples, self.n_classes), dtype=np.float64)
+
+        # Row blocks keep the (rows, trees, classes) leaf-value buffer cache sized
+        for start in range(0, n_samples, BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            leaf_values = self.value[self.apply(block)]
+
+            # sklearn adds trees one after another; a cumulative sum keeps that order
+            # (and therefore the exact floating point result) instead of a pairwise sum.
+            proba[start:start + BLOCK_ROWS] = np.cumsum(leaf_values, axis=1)[:, -1, :]
+
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """
+        Returns class labels with the same tie-breaking as RandomForestClassifier.predict.
+        """
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+    def predict_top_k(self, X, k):
+        """
+        Returns (classes, probabilities), each of shape (n_samples, k), best class first.
+        Ties keep the lower class index first, so column 0 always equals predict(X).
+        """
+        return top_k_classes(self.predict_proba(X), k, self.classes_)
+
+
+def top_k_classes(proba, k, classes):
+    """
+    Selects the k most probable classes for every row of a probability matrix at once.
+    """
+    k = max(1, min(k, proba.shape[1]))
+    # A stable sort on the negated scores keeps argmax's lowest-index tie-breaking
+    order = np.argsort(-proba, axis=1, kind="stable")[:, :k]
+    return classes.take(order, axis=0), np.take_along_axis(proba, order, axis=1)
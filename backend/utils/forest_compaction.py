@@ -0,0 +1,409 @@
+"""
+Forest compaction: builds a smaller copy of the served RandomForest and exports it
+only when it still agrees with the original.
+
+    cd backend
+    python -m utils.forest_compaction --trees 60 --max-depth 24 --out models/compact
+    python -m utils.forest_compaction --trees 60 --quantize-thresholds --leaf-bits 8 --compress 3 --out models/compact
+
+The compacted forest is compared with the original on the notebook's held-out split
+of the training CSV (label agreement and accuracy) and on generated chat-like symptom
+sets (agreement). The export is a regular model directory (model, vectorizer and label
+encoder pickles plus compaction_report.json) that ENT_MODEL_DIR or
+POST /admin/models/reload can point at.
+"""
+import argparse
+import copy
+import csv
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.tree._tree import TREE_LEAF, TREE_UNDEFINED, Tree
+from .forest import CompiledForest
+from .registry import LABEL_ENCODER_FILE, MODEL_FILE, VECTORIZER_FILE, DEFAULT_MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+DATASET_PATH = os.path.normpath(os.path.join(
+    os.path.dirname(DEFAULT_MODEL_DIR), "..", "notebooks", "ENT symptoms dataset - no_dups_ent.csv"
+))
+SYMPTOM_COLUMNS = ("Common Symptoms", "Patient Reported Symptoms", "Additional Symptoms")
+REPORT_FILE = "compaction_report.json"
+
+
+def truncate_tree(tree, max_depth=None, threshold_dtype=None, leaf_bits=None):
+    """
+    A copy of a fitted sklearn Tree with nodes below max_depth collapsed into leaves
+    (an internal node's value is already the class distribution of its samples),
+    unreachable nodes dropped, and optionally thresholds rounded to threshold_dtype
+    (e.g. np.float16) and leaf distributions rounded to multiples of 1 / (2**leaf_bits - 1).
+    """
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Depth-first renumbering of the nodes that remain reachable
+    keep, depths, new_ids = [], [], {}
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        new_ids[node] = len(keep)
+        keep.append(node)
+        depths.append(depth)
+        left, right = nodes["left_child"][node], nodes["right_child"][node]
+        if left != TREE_LEAF and (max_depth is None or depth < max_depth):
+            stack.append((right, depth + 1))
+            stack.append((left, depth + 1))
+
+    new_nodes = nodes[keep].copy()
+    new_values = values[keep].copy()
+    for position, node in enumerate(keep):
+        left, right = nodes["left_child"][node], nodes["right_child"][node]
+        if left == TREE_LEAF or left not in new_ids:
+            new_nodes[position]["left_child"] = new_nodes[position]["right_child"] = TREE_LEAF
+            new_nodes[position]["feature"] = TREE_UNDEFINED
+            new_nodes[position]["threshold"] = TREE_UNDEFINED
+        else:
+            new_nodes[position]["left_child"] = new_ids[left]
+            new_nodes[position]["right_child"] = new_ids[right]
+
+    internal = new_nodes["left_child"] != TREE_LEAF
+    if threshold_dtype is not None:
+        new_nodes["threshold"][internal] = new_nodes["threshold"][internal].astype(threshold_dtype).astype(np.float64)
+    if leaf_bits is not None:
+        new_values[~internal] = quantize_distributions(new_values[~internal], leaf_bits)
+
+    compacted = Tree(tree.n_features, np.asarray(tree.n_classes), tree.n_outputs)
+    compacted.__setstate__({
+        "max_depth": int(max(depths)),
+        "node_count": len(keep),
+        "nodes": new_nodes,
+        "values": new_values,
+    })
+    return compacted
+
+
+def quantize_distributions(values, bits):
+    """
+    Rounds class distributions (last axis) to multiples of 1 / (2**bits - 1) with the
+    largest-remainder method, so every distribution still sums to 1 and predict_proba
+    needs no renormalization.
+    """
+    levels = (1 << bits) - 1
+    shape = values.shape
+    scaled = values.reshape(-1, shape[-1]) * levels
+    counts = np.floor(scaled)
+    missing = (levels - counts.sum(axis=1)).astype(np.intp)
+    order = np.argsort(-(scaled - counts), axis=1, kind="stable")
+    bump = np.arange(shape[-1])[np.newaxis, :] < missing[:, np.newaxis]
+    np.put_along_axis(counts, order, np.take_along_axis(counts, order, axis=1) + bump, axis=1)
+    return (counts / levels).reshape(shape)
+
+
+def select_trees(model, X, n_trees):
+    """
+    Greedy forward selection of n_trees trees whose averaged votes best reproduce the
+    whole forest's top-1 labels on X. Returns tree indices in selection order.
+    """
+    X = np.asarray(X.toarray() if hasattr(X, "toarray") else X, dtype=np.float32)
+    votes = np.stack([estimator.predict_proba(X) for estimator in model.estimators_])  # (trees, samples, classes)
+    target = votes.sum(axis=0).argmax(axis=1)
+
+    chosen, total = [], np.zeros_like(votes[0])
+    remaining = list(range(len(votes)))
+    for _ in range(min(n_trees, len(votes))):
+        agreement = ((total[np.newaxis] + votes[remaining]).argmax(axis=2) == target).mean(axis=1)
+        best = remaining[int(np.argmax(agreement))]  # First best on ties: lowest tree index
+        chosen.append(best)
+        remaining.remove(best)
+        total += votes[best]
+    return chosen
+
+
+def compact_forest(model, n_trees=None, max_depth=None, threshold_dtype=None, leaf_bits=None, selection_X=None):
+    """
+    A copy of a fitted RandomForestClassifier keeping n_trees trees, each passed through
+    truncate_tree. With selection_X the trees are picked by select_trees, otherwise the
+    first n_trees are kept (bootstrap trees are interchangeable on average).
+    """
+    if n_trees and selection_X is not None:
+        estimators = [model.estimators_[index] for index in sorted(select_trees(model, selection_X, n_trees))]
+    else:
+        estimators = model.estimators_[:n_trees] if n_trees else model.estimators_
+    compacted = copy.copy(model)
+    compacted.estimators_ = []
+    for estimator in estimators:
+        estimator = copy.copy(estimator)
+        estimator.tree_ = truncate_tree(estimator.tree_, max_depth, threshold_dtype, leaf_bits)
+        compacted.estimators_.append(estimator)
+    compacted.n_estimators = len(compacted.estimators_)
+    return compacted
+
+
+def read_dataset(path=DATASET_PATH):
+    """
+    Rows of the training CSV as (disease, [symptom column values]).
+    """
+    with open(path, newline="") as f:
+        return [(row["Disease Name"], [row[column] or "" for column in SYMPTOM_COLUMNS]) for row in csv.DictReader(f)]
+
+
+def load_heldout(label_encoder, path=DATASET_PATH, test_size=0.2, random_state=42):
+    """
+    The notebook's evaluation split of the training CSV: symptom columns joined with
+    spaces, diseases with fewer than 10 rows dropped, stratified 80/20 split with
+    random_state 42. Returns (texts, labels) of the held-out 20%.
+    """
+    rows = read_dataset(path)
+    counts = {}
+    for disease, _ in rows:
+        counts[disease] = counts.get(disease, 0) + 1
+    rows = [(disease, columns) for disease, columns in rows if counts[disease] >= 10]
+
+    texts = [" ".join(columns) for _, columns in rows]
+    labels = label_encoder.transform([disease for disease, _ in rows])
+    _, test_texts, _, test_labels = train_test_split(
+        texts, labels, test_size=test_size, random_state=random_state, stratify=labels
+    )
+    return test_texts, np.asarray(test_labels)
+
+
+def generated_texts(vectorizer, n=2000, seed=42, path=DATASET_PATH):
+    """
+    Chat-like inputs: 1-4 symptom phrases of one disease from the training CSV, joined
+    the way preprocess_text joins them. Without the CSV, random combinations of 1-8
+    vocabulary terms.
+    """
+    rng = random.Random(seed)
+    phrases = {}
+    if path and os.path.exists(path):
+        for disease, columns in read_dataset(path):
+            pool = phrases.setdefault(disease, set())
+            pool.update(phrase.strip().lower() for column in columns for phrase in column.split(",") if phrase.strip())
+    if not phrases:
+        vocab = sorted(vectorizer.vocabulary_)
+        return [" ".join(rng.sample(vocab, rng.randint(1, 8))) for _ in range(n)]
+
+    pools = [sorted(pool) for _, pool in sorted(phrases.items())]
+    texts = []
+    for _ in range(n):
+        pool = rng.choice(pools)
+        texts.append(", ".join(sorted(rng.sample(pool, min(len(pool), rng.randint(1, 4))))))
+    return texts
+
+
+def measure(model_path, X_single, X_batch, repeat=5):
+    """
+    Artifact size, load time (joblib.load + CompiledForest export, best of `repeat`),
+    memory allocated by that load (tracemalloc peak) and the compiled forest's array
+    bytes, and prediction latency for one row and for a batch (median, microseconds).
+    """
+    load_times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        forest = CompiledForest.from_sklearn(joblib.load(model_path))
+        load_times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    CompiledForest.from_sklearn(joblib.load(model_path))
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def median_us(fn, number):
+        samples = []
+        for _ in range(number):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return float(np.median(samples) * 1e6)
+
+    return {
+        "file_bytes": os.path.getsize(model_path),
+        "load_s": min(load_times),
+        "load_peak_bytes": load_peak,
+        "forest_bytes": int(sum(value.nbytes for value in vars(forest).values() if isinstance(value, np.ndarray))),
+        "predict_one_us": median_us(lambda: forest.predict_top_k(X_single, 3), 300),
+        "predict_batch_us": median_us(lambda: forest.predict_top_k(X_batch, 3), 50),
+        "batch_size": X_batch.shape[0],
+        "trees": forest.n_trees,
+        "nodes": int(len(forest.feature)),
+        "max_depth": int(forest.max_depth),
+    }
+
+
+def evaluate(original, compacted, vectorizer, label_encoder, dataset_path=DATASET_PATH, n_generated=2000):
+    """
+    Top-1 label agreement between the two forests per evaluation set, and held-out accuracy of each.
+    """
+    original_forest = CompiledForest.from_sklearn(original)
+    compacted_forest = CompiledForest.from_sklearn(compacted)
+    sets = {"generated": (generated_texts(vectorizer, n_generated, path=dataset_path), None)}
+    if dataset_path and os.path.exists(dataset_path):
+        sets["heldout"] = load_heldout(label_encoder, dataset_path)
+    else:
+        logger.warning(f"{dataset_path} not found; evaluating on generated symptom sets only")
+
+    result, matches, total = {}, 0, 0
+    for name, (texts, labels) in sets.items():
+        X = vectorizer.transform(texts)
+        before, after = original_forest.predict(X), compacted_forest.predict(X)
+        agree = int(np.sum(before == after))
+        matches += agree
+        total += len(texts)
+        result[name] = {"samples": len(texts), "agreement": agree / len(texts)}
+        if labels is not None:
+            result[name]["accuracy_original"] = float(np.mean(before == labels))
+            result[name]["accuracy_compacted"] = float(np.mean(after == labels))
+    result["agreement"] = matches / total
+    return result
+
+
+def gate(evaluation, min_agreement=0.99, max_accuracy_drop=0.01):
+    """
+    Reasons the compacted forest fails the accuracy gate (empty when it passes).
+    """
+    failures = []
+    if evaluation["agreement"] < min_agreement:
+        failures.append(f"agreement {evaluation['agreement']:.4f} < {min_agreement}")
+    heldout = evaluation.get("heldout")
+    if heldout is not None:
+        drop = heldout["accuracy_original"] - heldout["accuracy_compacted"]
+        if drop > max_accuracy_drop:
+            failures.append(f"held-out accuracy dropped by {drop:.4f} > {max_accuracy_drop}")
+    return failures
+
+
+def run(model_dir, out_dir, n_trees=None, max_depth=None, threshold_dtype=None, leaf_bits=None, compress=0,
+        select="greedy", min_agreement=0.99, max_accuracy_drop=0.01, dataset_path=DATASET_PATH, n_generated=2000):
+    """
+    Compacts model_dir's forest, evaluates it, and exports it to out_dir if it passes
+    the gate. Returns the report (report["exported"] tells whether it was written).
+    Greedy tree selection uses its own generated set (another seed than the evaluation's).
+    """
+    model = joblib.load(os.path.join(model_dir, MODEL_FILE))
+    vectorizer = joblib.load(os.path.join(model_dir, VECTORIZER_FILE))
+    label_encoder = joblib.load(os.path.join(model_dir, LABEL_ENCODER_FILE))
+
+    selection_X = None
+    if select == "greedy" and n_trees:
+        selection_X = vectorizer.transform(generated_texts(vectorizer, n_generated, seed=1, path=dataset_path))
+    compacted = compact_forest(model, n_trees, max_depth, threshold_dtype, leaf_bits, selection_X)
+    evaluation = evaluate(model, compacted, vectorizer, label_encoder, dataset_path, n_generated)
+    failures = gate(evaluation, min_agreement, max_accuracy_drop)
+
+    X_batch = vectorizer.transform(generated_texts(vectorizer, 32, seed=7, path=dataset_path))
+    # Measured from a scratch directory: a failed gate leaves out_dir untouched
+    with tempfile.TemporaryDirectory() as scratch:
+        candidate_path = os.path.join(scratch, MODEL_FILE)
+        joblib.dump(compacted, candidate_path, compress=compress)
+        report = {
+            "settings": {
+                "trees": n_trees, "select": select, "max_depth": max_depth, "leaf_bits": leaf_bits, "compress": compress,
+                "threshold_dtype": np.dtype(threshold_dtype).name if threshold_dtype is not None else None,
+            },
+            "gate": {"min_agreement": min_agreement, "max_accuracy_drop": max_accuracy_drop, "failures": failures},
+            "evaluation": evaluation,
+            "original": measure(os.path.join(model_dir, MODEL_FILE), X_batch[:1], X_batch),
+            "compacted": measure(candidate_path, X_batch[:1], X_batch),
+            "exported": not failures,
+        }
+        if failures:
+            return report
+
+        # The whole model directory is staged next to out_dir (same filesystem) and
+        # renamed into place, so a reload never sees a mix of old and new artifacts
+        out_dir = os.path.abspath(out_dir)
+        parent = os.path.dirname(out_dir)
+        os.makedirs(parent, exist_ok=True)
+        staged = tempfile.mkdtemp(prefix=f".{os.path.basename(out_dir)}.", dir=parent)
+        try:
+            shutil.copyfile(candidate_path, os.path.join(staged, MODEL_FILE))
+            for name in (VECTORIZER_FILE, LABEL_ENCODER_FILE):
+                shutil.copyfile(os.path.join(model_dir, name), os.path.join(staged, name))
+            with open(os.path.join(staged, REPORT_FILE), "w") as f:
+                json.dump(report, f, indent=2)
+            os.chmod(staged, 0o755)  # mkdtemp creates it owner-only
+            replace_dir(staged, out_dir)
+        finally:
+            shutil.rmtree(staged, ignore_errors=True)
+    return report
+
+
+def replace_dir(source, target):
+    """
+    Renames directory source to target, replacing an existing target. os.replace
+    only replaces empty directories, so an existing target is first renamed aside;
+    target is briefly missing then, but never partially written.
+    """
+    if not os.path.exists(target):
+        os.replace(source, target)
+        return
+    old = f"{source}.old"
+    os.replace(target, old)
+    try:
+        os.replace(source, target)
+    except OSError:
+        os.replace(old, target)
+        raise
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def summary(report):
+    original, compacted = report["original"], report["compacted"]
+    lines = [f"{'':18}{'original':>14}{'compacted':>14}{'change':>10}"]
+    for key in ("trees", "nodes", "max_depth", "file_bytes", "forest_bytes", "load_peak_bytes", "load_s",
+                "predict_one_us", "predict_batch_us"):
+        before, after = original[key], compacted[key]
+        change = f"{(after - before) / before:+.1%}" if before else ""
+        lines.append(f"{key:18}{before:>14.4g}{after:>14.4g}{change:>10}")
+    evaluation = report["evaluation"]
+    lines.append(f"agreement {evaluation['agreement']:.4f} " + " ".join(
+        f"{name}={values['agreement']:.4f}" for name, values in evaluation.items() if isinstance(values, dict)
+    ))
+    if "heldout" in evaluation:
+        heldout = evaluation["heldout"]
+        lines.append(f"held-out accuracy {heldout['accuracy_original']:.4f} -> {heldout['accuracy_compacted']:.4f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=os.getenv("ENT_MODEL_DIR", DEFAULT_MODEL_DIR))
+    parser.add_argument("--out", required=True, help="directory for the compacted model (written only if the gate passes)")
+    parser.add_argument("--trees", type=int, help="keep N trees")
+    parser.add_argument("--select", choices=("greedy", "first"), default="greedy",
+                        help="pick the N trees that best reproduce the full forest, or the first N")
+    parser.add_argument("--max-depth", type=int, help="collapse nodes below this depth into leaves")
+    parser.add_argument("--quantize-thresholds", action="store_true", help="round split thresholds to float16")
+    parser.add_argument("--leaf-bits", type=int, help="round leaf class distributions to this many bits")
+    parser.add_argument("--compress", type=int, default=0, help="joblib compression level of the exported pickle (0-9)")
+    parser.add_argument("--min-agreement", type=float, default=0.99, help="required top-1 agreement with the original")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01, help="allowed held-out accuracy loss")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="training CSV for the held-out split")
+    parser.add_argument("--generated", type=int, default=2000, help="generated symptom sets to compare on")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(
+        args.model_dir, args.out, n_trees=args.trees, max_depth=args.max_depth,
+        threshold_dtype=np.float16 if args.quantize_thresholds else None, leaf_bits=args.leaf_bits,
+        compress=args.compress, select=args.select, min_agreement=args.min_agreement, max_accuracy_drop=args.max_accuracy_drop,
+        dataset_path=args.dataset, n_generated=args.generated,
+    )
+    print(summary(report))
+    if not report["exported"]:
+        print("Gate failed: " + "; ".join(report["gate"]["failures"]) + " (nothing exported)")
+        sys.exit(1)
+    print(f"Exported to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import bisect
+import re
+import threading
+
+# Default latency buckets in seconds (0.5 ms .. 10 s)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """
+    Monotonic counter that can be incremented from the event loop or worker threads.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"value": self._value}
+
+
+class Gauge:
+    """
+    Value that goes up and down (in-flight requests, queue depth).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"value": self._value}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (cumulative counts per upper bound, plus count and sum).
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, description="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def cumulative_counts(self):
+        """
+        Returns [(upper_bound, cumulative_count), ...] ending with +Inf.
+        """
+        with self._lock:
+            counts = list(self._counts)
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def snapshot(self):
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in self.cumulative_counts()},
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of named metrics. Asking twice for the same name
+    returns the same metric, so modules can declare what they need at import time.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, description=""):
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description=""):
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name, description="", buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics()}
+
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(registry):
+    """
+    Renders every metric in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in sorted(registry.metrics(), key=lambda metric: metric.name):
+        name = _INVALID_NAME_CHARS.sub("_", metric.name)
+        if metric.description:
+            description = metric.description.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        if metric.kind == "histogram":
+            for bound, count in metric.cumulative_counts():
+                lines.append(f'{name}_bucket{{le="{_format_value(bound)}"}} {count}')
+            lines.append(f"{name}_sum {_format_value(metric.sum)}")
+            lines.append(f"{name}_count {metric.count}")
+        else:
+            lines.append(f"{name} {_format_value(metric.value)}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,132 @@
+import logging
+import os
+import time
+from .drug import search_drug_info, summarize_drug_info, build_drug_summaries
+from .drug_index import DrugIndex
+from .drug_store import CompiledDrugData, LazyDrugSummaries, open_drug_data
+from .timing import StagedResults
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# How much drug information a request gets back: none (/predict), the compact
+# per-drug summary (chat default) or the full FDA label sections.
+DRUG_DETAILS = (None, "summary", "full")
+
+# Drug data used by the pipeline in this process. Thread workers share the app's
+# dict (set_medical_advice_data); process workers load their own copy (init_worker).
+_medical_advice_data = {}
+_drug_index = None
+_drug_summaries = {}
+_summary_top_n = 3
+
+
+def set_medical_advice_data(data, drug_index=None, rank_drugs=True, summary_top_n=3, summary_max_chars=300):
+    """
+    Points the pipeline at an already loaded drug dataset and precomputes what the
+    per-request lookups need: the relevance index (unless rank_drugs=False) and the
+    compact per-drug summaries. A CompiledDrugData store brings its own FTS index
+    and summaries are computed per disease on first use, so nothing here scales
+    with the dataset.
+    """
+    global _medical_advice_data, _drug_index, _drug_summaries, _summary_top_n
+    if isinstance(data, CompiledDrugData):
+        if rank_drugs and drug_index is None:
+            drug_index = data.index()
+        _drug_summaries = LazyDrugSummaries(data, max_chars=summary_max_chars)
+    else:
+        if rank_drugs and drug_index is None:
+            drug_index = DrugIndex.build(data)
+        _drug_summaries = build_drug_summaries(data, max_chars=summary_max_chars)
+    _summary_top_n = summary_top_n
+    _medical_advice_data = data
+    _drug_index = drug_index if rank_drugs else None
+
+
+def init_worker(drug_data_path=None, model_dir=None, drug_options=None, drug_db_path=None):
+    """
+    Process-pool initializer: loads the models and drug data (the compiled store when
+    drug_db_path is set) once per worker.
+    The registry runs a warmup prediction so the first real request does not pay for it.
+    """
+    from .registry import registry
+
+    if model_dir:
+        registry.model_dir = model_dir
+    bundle = registry.get()
+
+    if drug_data_path:
+        set_medical_advice_data(open_drug_data(drug_data_path, drug_db_path), **(drug_options or {}))
+
+    logger.info(f"Prediction worker {os.getpid()} ready (model {bundle.version})")
+
+
+def worker_pid(hold=0.0):
+    """
+    Trivial task used to make the pool start (and initialize) its workers.
+    """
+    time.sleep(hold)
+    return os.getpid()
+
+
+def diagnose_batch(requests):
+    """
+    Runs symptoms -> diseases -> drugs for a batch of requests with a single model call.
+
+    Each request is a (symptoms, drug_detail) tuple with drug_detail one of
+    DRUG_DETAILS. The result for it is a (predicted_disease, drug_info, predictions)
+    tuple: drug_info is None when no drugs were asked for, and predictions lists the
+    top PREDICT_TOP_K (settings) {"disease", "probability"} candidates (best first, alternatives
+    with no votes dropped), each with its own "drugs" when drugs were asked for.
+    The returned list's .stages holds the preprocess (cleaning + TF-IDF features) /
+    model / drugs durations.
+    """
+    from .registry import registry
+
+    bundle = registry.get()
+    started = time.perf_counter()
+    features, cleaned_texts = bundle.featurize([symptoms for symptoms, _ in requests])
+    preprocessed = time.perf_counter()
+    candidates = bundle.predict_top_k_features(features, settings.PREDICT_TOP_K)
+    predicted = time.perf_counter()
+
+    results = StagedResults()
+    for ranked, cleaned, (_, drug_detail) in zip(candidates, cleaned_texts, requests):
+        predictions = [
+            {"disease": disease, "probability": round(probability, 4)}
+            for position, (disease, probability) in enumerate(ranked)
+            if position == 0 or probability > 0
+        ]
+        if drug_detail is not None:
+            for prediction in predictions:
+                prediction["drugs"] = lookup_drugs(prediction["disease"], cleaned, drug_detail)
+        top = predictions[0]
+        results.append((top["disease"], top.get("drugs"), predictions))
+
+    # Batch-level durations; every request in the batch waited for all of them
+    results.stages = {"preprocess": preprocessed - started, "model": predicted - preprocessed}
+    if any(drug_detail is not None for _, drug_detail in requests):
+        results.stages["drugs"] = time.perf_counter() - predicted
+    return results
+
+
+def lookup_drugs(disease, cleaned_symptoms, drug_detail="summary"):
+    """
+    Drug information for a predicted disease at the requested level of detail.
+    """
+    if drug_detail is None:
+        return None
+    if drug_detail == "full":
+        return search_drug_info(disease, _medical_advice_data, cleaned_symptoms, _drug_index)
+    return summarize_drug_info(disease, _drug_summaries, cleaned_symptoms, _drug_index, top_n=_summary_top_n)
+
+
+def trim_predictions(predictions, top_k, with_drugs=True):
+    """
+    The first top_k candidates of a diagnose_batch result, optionally without their drugs.
+    Returns copies so cached results are never modified.
+    """
+    trimmed = predictions[:max(1, top_k)]
+    if with_drugs:
+        return [dict(prediction) for prediction in trimmed]
+    return [{key: value for key, value in prediction.items() if key != "drugs"} for prediction in trimmed]
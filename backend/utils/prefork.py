@@ -0,0 +1,102 @@
+import gc
+import logging
+import os
+import signal
+import time
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is not restarted right away
+RESTART_BACKOFF_S = 1.0
+
+
+def serve(app, host="0.0.0.0", port=5001, workers=2, preload=None, log_level="info", **config):
+    """
+    Runs `app` in `workers` forked uvicorn processes sharing one listening socket.
+
+    Unlike `uvicorn --workers`, which spawns fresh interpreters that each import the
+    app and load the models and drug data again, the parent calls preload() once and
+    freezes everything it allocated out of the garbage collector (gc.freeze), then
+    forks. The workers share those pages copy-on-write: the cyclic GC never writes to
+    the frozen objects, and NumPy buffers (the forest arrays) and the memory-mapped
+    drug store are not touched by reference counting at all.
+
+    The parent only supervises: a worker that exits unexpectedly is replaced, and
+    SIGINT / SIGTERM are forwarded so workers finish in-flight requests and stop.
+    """
+    # Nothing collected between here and the fork, so preloading leaves no freed
+    # holes in the pages the workers will share
+    gc.disable()
+    if preload is not None:
+        started = time.perf_counter()
+        preload()
+        logger.info(f"Preloaded in {time.perf_counter() - started:.2f}s")
+    gc.freeze()
+
+    sock = uvicorn.Config(app, host=host, port=port, log_level=log_level, **config).bind_socket()
+    sock.set_inheritable(True)
+
+    children = {}  # pid -> (worker number, started at)
+    stopping = False
+
+    def start_worker(number):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, host, port, log_level, config)
+        children[pid] = (number, time.monotonic())
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for number in range(workers):
+        start_worker(number)
+    logger.info(f"Serving on {host}:{port} with {workers} preforked workers (parent {os.getpid()})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        number, started_at = children.pop(pid)
+        if stopping:
+            continue
+        logger.warning(f"Worker {number} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        if time.monotonic() - started_at < RESTART_BACKOFF_S:
+            time.sleep(RESTART_BACKOFF_S)
+        if not stopping:
+            start_worker(number)
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def _run_worker(app, sock, host, port, log_level, config):
+    """
+    Body of a forked worker: a regular uvicorn server on the inherited socket.
+    Never returns.
+    """
+    code = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        gc.enable()
+        server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level=log_level, **config))
+        server.run(sockets=[sock])
+    except BaseException:
+        logger.exception(f"Worker {os.getpid()} crashed")
+        code = 1
+    finally:
+        # Skip the parent's atexit handlers and buffered-file flushes
+        os._exit(code)
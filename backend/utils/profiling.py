@@ -0,0 +1,203 @@
+import asyncio
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads that are only waiting (event loop selector, idle pool workers)
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures pool worker blocked on its queue
+}
+
+PROFILES_TAKEN = REGISTRY.counter("profiles_taken_total", "Requests profiled")
+PROFILES_SKIPPED = REGISTRY.counter("profiles_skipped_total", "Profiles not taken because another one was running")
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a daemon thread snapshots the Python stack of every
+    other thread each `interval` seconds and counts them as collapsed stacks
+    ("thread;outer (file:line);...;leaf (file:line)"), the input format of flamegraph.pl
+    and speedscope. Threads that are only waiting are skipped unless keep_idle is set.
+
+    Overhead is one stack walk per thread per interval, independent of how much Python
+    code runs in between, so it can stay on for a whole request in production.
+    Code running in other processes (PREDICT_EXECUTOR=process) is not seen.
+    """
+
+    def __init__(self, interval=0.005, keep_idle=False):
+        self.interval = interval
+        self.keep_idle = keep_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                leaf = frame.f_code
+                if not self.keep_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+
+def collapsed_text(stacks):
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class ProfileStore:
+    """
+    The most recent profiles (id -> metadata and collapsed stacks), optionally also
+    written to `directory` as <id>.collapsed files.
+    """
+
+    def __init__(self, directory=None, keep=50):
+        self.directory = directory
+        self.keep = keep
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id, info, stacks):
+        text = collapsed_text(stacks)
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(os.path.join(self.directory, f"{profile_id}.collapsed"), "w") as file:
+                    file.write(text)
+            except OSError as e:
+                logger.warning(f"Could not write profile {profile_id}: {e}")
+        with self._lock:
+            self._profiles[profile_id] = (info, text)
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def list(self):
+        with self._lock:
+            return [dict(info, id=profile_id) for profile_id, (info, _) in reversed(self._profiles.items())]
+
+    def get(self, profile_id):
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+        return entry[1] if entry is not None else None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a request from the first byte in to the last byte
+    out - streamed bodies included, so /chat's whole generator is covered.
+
+    A request to one of `paths` is profiled when it carries `header` and a matching
+    X-Admin-Token (never when no admin token is configured) or with probability
+    `sample_rate`. One profile runs at a time; the response gets an X-Profile-Id
+    header naming it in the store.
+
+    The sampler sees whole threads, and every request of this worker shares the
+    event loop thread, so a profile also contains whatever concurrent requests ran
+    meanwhile; its "concurrent_requests" field says how many did (0 = only this one).
+    """
+
+    def __init__(self, app, store, paths=("/chat", "/predict"), sample_rate=0.0, header="x-profile",
+                 admin_token="", interval=0.005):
+        self.app = app
+        self.store = store
+        self.paths = tuple(paths)
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.admin_token = admin_token.encode()
+        self.interval = interval
+        self._busy = threading.Lock()
+        self._in_flight = 0  # HTTP requests in this worker; only touched on the event loop
+        self._peak = 0       # Most requests in flight at once during the running profile
+
+    def _requested(self, scope):
+        headers = dict(scope.get("headers") or ())
+        if self.header not in headers or not self.admin_token:
+            return False
+        return hmac.compare_digest(headers.get(b"x-admin-token", b""), self.admin_token)
+
+    def _wanted(self, scope):
+        if scope["path"] not in self.paths:
+            return False
+        return self._requested(scope) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self._in_flight += 1
+        self._peak = max(self._peak, self._in_flight)
+        try:
+            wanted = self._wanted(scope)
+            if wanted and self._busy.acquire(blocking=False):
+                await self._profile(scope, receive, send)
+            else:
+                if wanted:
+                    PROFILES_SKIPPED.inc()
+                await self.app(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope, receive, send):
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['path'].strip('/').replace('/', '_')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        self._peak = self._in_flight
+        profiler = SamplingProfiler(self.interval).start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            concurrent = self._peak - 1
+            try:
+                # Joining the sampler thread and writing the file block; keep them off the event loop
+                loop = asyncio.get_running_loop()
+                stacks = await loop.run_in_executor(None, profiler.stop)
+                PROFILES_TAKEN.inc()
+                info = {"path": scope["path"], "duration_ms": duration_ms, "samples": profiler.samples,
+                        "interval_ms": self.interval * 1000, "concurrent_requests": concurrent}
+                await loop.run_in_executor(None, self.store.add, profile_id, info, stacks)
+            finally:
+                self._busy.release()
+            logger.info(f"Profiled {scope['path']} as {profile_id} ({profiler.samples} samples)")
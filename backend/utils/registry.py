@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import joblib
+from .featurizer import FusedFeaturizer
+from .forest import CompiledForest
+from .preprocess import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+MODEL_FILE = "ent_symptom_model.pkl"
+VECTORIZER_FILE = "vectorizer.pkl"
+LABEL_ENCODER_FILE = "label_encoder.pkl"
+MODEL_FILES = (MODEL_FILE, VECTORIZER_FILE, LABEL_ENCODER_FILE)
+
+WARMUP_SYMPTOMS = ["ear pain, fever, sore throat", "dizziness, ringing in ears"]
+
+
+def artifact_version(model_dir):
+    """
+    Short content hash of the three pickles, used to tell model versions apart.
+    """
+    digest = hashlib.sha256()
+    for name in MODEL_FILES:
+        with open(os.path.join(model_dir, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _load_artifact(path):
+    """
+    Loads a joblib pickle, memory-mapping its NumPy arrays when the file allows it.
+    """
+    try:
+        return joblib.load(path, mmap_mode="r")
+    except (ValueError, OSError):
+        # Compressed or non-joblib pickles cannot be memory-mapped
+        return joblib.load(path)
+
+
+class ModelBundle:
+    """
+    One loaded model version: vectorizer, forest (sklearn + compiled copy) and label encoder.
+    """
+
+    def __init__(self, model_dir, vectorizer, model, label_encoder, version):
+        self.model_dir = model_dir
+        self.vectorizer = vectorizer
+        self.model = model
+        self.label_encoder = label_encoder
+        self.forest = CompiledForest.from_sklearn(model)
+        self.featurizer = FusedFeaturizer.from_vectorizer(vectorizer)
+        self.version = version
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls, model_dir):
+        started = time.perf_counter()
+        bundle = cls(
+            model_dir=model_dir,
+            vectorizer=_load_artifact(os.path.join(model_dir, VECTORIZER_FILE)),
+            model=_load_artifact(os.path.join(model_dir, MODEL_FILE)),
+            label_encoder=_load_artifact(os.path.join(model_dir, LABEL_ENCODER_FILE)),
+            version=artifact_version(model_dir),
+        )
+        logger.info(f"Loaded model version {bundle.version} from {model_dir} in {time.perf_counter() - started:.2f}s")
+        return bundle
+
+    def predict(self, texts):
+        """
+        Vectorizes symptom strings and returns the predicted disease names as a list.
+        """
+        text_vectorized = self.vectorizer.transform(texts)
+        predictions = self.forest.predict(text_vectorized)
+        return self.label_encoder.inverse_transform(predictions).tolist()
+
+    def predict_top_k(self, texts, k):
+        """
+        Returns, per symptom string, the k most likely (disease, probability) pairs from
+        one forest pass. Probabilities are the fraction of tree votes for the disease.
+        """
+        return self.predict_top_k_features(self.vectorizer.transform(texts), k)
+
+    def featurize(self, symptom_lists):
+        """
+        Raw symptom lists -> (feature matrix, canonical preprocess_text strings), through
+        the fused featurizer when the vectorizer allows it.
+        """
+        if self.featurizer is not None:
+            return self.featurizer.transform(symptom_lists, with_text=True)
+        texts = [preprocess_text(symptoms) for symptoms in symptom_lists]
+        return self.vectorizer.transform(texts), texts
+
+    def predict_top_k_features(self, X, k):
+        """
+        predict_top_k for already vectorized rows.
+        """
+        classes, scores = self.forest.predict_top_k(X, k)
+        labels = self.label_encoder.inverse_transform(classes.ravel()).reshape(classes.shape)
+        return [list(zip(row_labels, row_scores)) for row_labels, row_scores in zip(labels.tolist(), scores.tolist())]
+
+    def warmup(self):
+        """
+        Runs a throwaway prediction so lazy initialization happens before traffic arrives.
+        """
+        self.predict(WARMUP_SYMPTOMS)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "model_dir": self.model_dir,
+            "loaded_at": self.loaded_at,
+            "n_trees": self.forest.n_trees,
+            "n_classes": self.forest.n_classes,
+        }
+
+
+class ModelRegistry:
+    """
+    Holds the single loaded ModelBundle for this process.
+
+    The bundle is loaded (and warmed up) once, on first use or at startup.
+    reload() builds and warms the new version on the side and then swaps one
+    reference, so in-flight predictions finish on the version they started with
+    and new ones see the new version; nothing is dropped.
+    """
+
+    def __init__(self, model_dir=None):
+        self.model_dir = model_dir or os.getenv("ENT_MODEL_DIR", DEFAULT_MODEL_DIR)
+        self._bundle = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._bundle is not None
+
+    @property
+    def version(self):
+        return self._bundle.version if self._bundle is not None else None
+
+    def get(self):
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    bundle = ModelBundle.load(self.model_dir)
+                    bundle.warmup()
+                    self._bundle = bundle
+                bundle = self._bundle
+        return bundle
+
+    def reload(self, model_dir=None):
+        """
+        Loads a (possibly different) model directory and atomically swaps it in.
+        """
+        with self._lock:
+            model_dir = model_dir or self.model_dir
+            bundle = ModelBundle.load(model_dir)
+            bundle.warmup()
+            self.model_dir = model_dir
+            self._bundle = bundle
+        logger.info(f"Model registry now serving version {bundle.version}")
+        return bundle
+
+
+registry = ModelRegistry()
@@ -0,0 +1,76 @@
+import asyncio
+from .preprocess import preprocess_text
+from .pipeline import trim_predictions
+
+
+class PredictionService:
+    """
+    Async entry point used by /chat and /predict.
+
+    Results are cached by the canonical symptom string produced by
+    preprocess_text (so "fever, Cough" and "cough, fever" share an entry);
+    misses go through the micro-batcher into the prediction executor.
+    """
+
+    def __init__(self, batcher, cache=None):
+        self.batcher = batcher
+        self.cache = cache
+        self._pending = {}  # key -> task for misses already on their way through the batcher
+
+    async def diagnose(self, symptoms, drug_detail="summary"):
+        """
+        Returns (predicted_disease, drug_info) for a list of symptoms.
+        drug_detail is None (no drugs), "summary" (compact top-N view) or "full" (FDA label sections).
+        """
+        disease, drug_info, _ = await self._diagnosis(symptoms, drug_detail)
+        return disease, drug_info
+
+    async def diagnose_top_k(self, symptoms, top_k, drug_detail=None):
+        """
+        Returns the top_k most likely {"disease", "probability"} candidates, best first,
+        each with its "drugs" at drug_detail. Served from the same cached pass as diagnose().
+        """
+        _, _, predictions = await self._diagnosis(symptoms, drug_detail)
+        return trim_predictions(predictions, top_k, with_drugs=drug_detail is not None)
+
+    async def diagnose_many(self, symptom_lists, drug_detail=None, top_k=1):
+        """
+        Diagnoses a whole chunk with one model call (bulk scoring). Skips the result
+        cache so large jobs do not evict the entries interactive traffic relies on.
+        Returns (predicted_disease, drug_info, top_k predictions) per symptom list.
+        """
+        results = await self.batcher.run_batch([(symptoms, drug_detail) for symptoms in symptom_lists])
+        return [
+            (disease, drug_info, trim_predictions(predictions, top_k, with_drugs=drug_detail is not None))
+            for disease, drug_info, predictions in results
+        ]
+
+    async def _diagnosis(self, symptoms, drug_detail):
+        """
+        Full pipeline result (disease, drug_info, predictions), from the cache when possible.
+        """
+        if self.cache is None:
+            return await self.batcher.submit((symptoms, drug_detail))
+
+        # Disease-only requests reuse (and fill) the summary entries chat turns use
+        cached_detail = drug_detail or "summary"
+        key = (preprocess_text(symptoms), cached_detail)
+        result = self.cache.get(key)
+        if result is None:
+            # Concurrent misses for the same symptoms wait on a single computation
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._compute(key, symptoms, cached_detail))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            result = await asyncio.shield(pending)
+
+        return result if drug_detail else (result[0], None, result[2])
+
+    async def _compute(self, key, symptoms, drug_detail):
+        result = await self.batcher.submit((symptoms, drug_detail))
+        self.cache.set(key, result)
+        return result
+
+    async def close(self):
+        await self.batcher.close()
@@ -0,0 +1,198 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from .metrics import REGISTRY
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def new_session():
+    return {"messages": [], "accumulated_symptoms": []}
+
+
+class SessionStore(ABC):
+    """
+    Conversation state kept on the server between /chat turns: the message history
+    and the accumulated symptoms, as a JSON-serializable dict per session id.
+
+    Backends implement get / save / delete / stats; get returns None for unknown
+    or expired sessions. A turn is saved once it has completed, so a failed or
+    abandoned stream leaves the session as it was.
+    """
+
+    def __init__(self, name="session_store"):
+        self.name = name
+        self._hits = REGISTRY.counter(f"{name}_hits_total", "Sessions found")
+        self._misses = REGISTRY.counter(f"{name}_misses_total", "Unknown or expired session ids")
+        self._evictions = REGISTRY.counter(f"{name}_evictions_total", "Sessions evicted (LRU or memory cap)")
+
+    @abstractmethod
+    def get(self, session_id):
+        ...
+
+    @abstractmethod
+    def save(self, session_id, session):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id):
+        ...
+
+    @abstractmethod
+    def stats(self):
+        ...
+
+    def close(self):
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-process store: LRU order, idle TTL, and caps on both the number of sessions
+    and their total serialized size. Fine for a single worker; use the SQLite store
+    when several workers must see the same sessions.
+    """
+
+    def __init__(self, max_sessions=10000, ttl=3600.0, max_bytes=64 * 1024 * 1024, name="session_store"):
+        super().__init__(name)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # session_id -> (expires_at, size, serialized session)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, session_id):
+        _, size, _ = self._data.pop(session_id)
+        self._bytes -= size
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is not None and self.ttl and entry[0] < time.monotonic():
+                self._pop(session_id)
+                entry = None
+            if entry is None:
+                self._misses.inc()
+                return None
+            self._data.move_to_end(session_id)
+            self._hits.inc()
+            # Stored serialized: callers get their own copy and the size is exact
+            return json.loads(entry[2])
+
+    def save(self, session_id, session):
+        serialized = json.dumps(session)
+        size = len(serialized)
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            if session_id in self._data:
+                self._pop(session_id)
+            self._data[session_id] = (expires_at, size, serialized)
+            self._bytes += size
+            while len(self._data) > 1 and (len(self._data) > self.max_sessions or self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+                self._evictions.inc()
+
+    def delete(self, session_id):
+        with self._lock:
+            if session_id in self._data:
+                self._pop(session_id)
+
+    def stats(self):
+        return {"backend": "memory", "sessions": len(self._data), "bytes": self._bytes,
+                "hits": self._hits.value, "misses": self._misses.value, "evictions": self._evictions.value}
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Store shared by every worker on one host through a local SQLite file (WAL mode,
+    so readers do not block the writer). Expired rows are ignored on read and
+    deleted every purge_every-th save.
+    """
+
+    def __init__(self, path, ttl=3600.0, purge_every=500, name="session_store"):
+        super().__init__(name)
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._saves = 0
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections must stay on the thread that created them and must not be
+        # used across fork(): the store is built before prefork.serve forks the workers,
+        # so each worker opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at >= ?", (session_id, time.time())
+        ).fetchone()
+        if row is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return json.loads(row[0])
+
+    def save(self, session_id, session):
+        expires_at = time.time() + self.ttl if self.ttl else float("inf")
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, expires_at, data) VALUES (?, ?, ?)",
+                (session_id, expires_at, json.dumps(session)),
+            )
+            self._saves += 1
+            if self._saves % self.purge_every == 0:
+                purged = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+                self._evictions.inc(purged)
+
+    def delete(self, session_id):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self):
+        count = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": count,
+                "hits": self._hits.value, "misses": self._misses.value, "evictions": self._evictions.value}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited through fork() belongs to the parent; leave it alone
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+            self._local.conn = None
+
+
+def create_session_store(kind="memory", ttl=3600.0, max_sessions=10000, max_bytes=64 * 1024 * 1024, sqlite_path=None):
+    """
+    Builds the /chat session store: "memory" (per process) or "sqlite" (shared local file).
+    """
+    if kind == "memory":
+        return InMemorySessionStore(max_sessions=max_sessions, ttl=ttl, max_bytes=max_bytes)
+    if kind == "sqlite":
+        if not sqlite_path:
+            raise ValueError("SESSION_SQLITE_PATH is required for the sqlite session store")
+        return SqliteSessionStore(sqlite_path, ttl=ttl)
+    raise ValueError(f"Unknown session store {kind!r} (expected 'memory' or 'sqlite')")
@@ -0,0 +1,103 @@
+import json
+import time
+from json.encoder import encode_basestring_ascii  # What json.dumps uses for str with default settings
+from .metrics import REGISTRY
+
+UPSTREAM_CHUNKS = REGISTRY.counter("sse_upstream_chunks_total", "Streamed chat completion chunks received from OpenAI")
+FRAMES_SENT = REGISTRY.counter("sse_frames_total", "SSE frames written to /chat clients for upstream chunks")
+
+
+class ChunkFrameEncoder:
+    """
+    Re-encodes streamed chat completion chunks as /chat SSE frames.
+
+    The output is byte for byte what json.dumps gives for
+    {"id", "object", "created", "model", "system_fingerprint",
+     "choices": [{"index", "delta": {"content"}, "finish_reason"}]},
+    but the envelope (everything up to the choice index) is serialized once per
+    stream and reused, so each chunk only pays for its content and finish_reason.
+
+    Chunks with neither content nor a finish_reason (tool-call argument deltas)
+    produce no frame when drop_empty is set. With coalesce_ms > 0, content is
+    buffered and sent as one merged frame once coalesce_ms have passed since the
+    first buffered piece or coalesce_bytes have accumulated (checked as chunks
+    arrive), and always together with the finishing chunk or on flush().
+    """
+
+    def __init__(self, drop_empty=True, coalesce_ms=0.0, coalesce_bytes=512):
+        self.drop_empty = drop_empty
+        self.coalesce_s = coalesce_ms / 1000
+        self.coalesce_bytes = coalesce_bytes
+        self._envelope_key = None
+        self._prefix = ""
+        self._buffer = []       # content pieces waiting to be sent
+        self._buffer_index = 0
+        self._buffer_bytes = 0
+        self._buffer_started = 0.0
+
+    def _set_envelope(self, key):
+        chunk_id, obj, created, model, fingerprint = key
+        envelope = json.dumps({
+            "id": chunk_id, "object": obj, "created": created, "model": model, "system_fingerprint": fingerprint,
+        })
+        # '{"id": ..., "system_fingerprint": ...}' -> '... "system_fingerprint": ..., "choices": [{"index": '
+        self._prefix = f'data: {envelope[:-1]}, "choices": [{{"index": '
+        self._envelope_key = key
+
+    def _frame(self, index, content, finish_reason):
+        FRAMES_SENT.inc()
+        content = "null" if content is None else encode_basestring_ascii(content)
+        finish_reason = "null" if finish_reason is None else encode_basestring_ascii(finish_reason)
+        return f'{self._prefix}{index:d}, "delta": {{"content": {content}}}, "finish_reason": {finish_reason}}}]}}\n\n'
+
+    def _take_buffer(self):
+        content = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffer_bytes = 0
+        return content
+
+    def encode(self, chunk):
+        """
+        Returns the SSE text to send for one upstream chunk (possibly empty).
+        """
+        UPSTREAM_CHUNKS.inc()
+        choice = chunk.choices[0]
+        content = getattr(choice.delta, "content", None) or None
+        finish_reason = choice.finish_reason
+
+        out = ""
+        key = (chunk.id, chunk.object, chunk.created, chunk.model, chunk.system_fingerprint)
+        if key != self._envelope_key:
+            out = self.flush()  # Buffered content belongs to the previous envelope
+            self._set_envelope(key)
+
+        if content is None and finish_reason is None:
+            if self.drop_empty:
+                return out
+            return out + self._frame(choice.index, None, None)
+
+        if not self.coalesce_s:
+            return out + self._frame(choice.index, content, finish_reason)
+
+        if content is not None:
+            if not self._buffer:
+                self._buffer_index = choice.index
+                self._buffer_started = time.monotonic()
+            self._buffer.append(content)
+            self._buffer_bytes += len(content.encode())
+
+        if finish_reason is not None:
+            merged = self._take_buffer() if self._buffer else None
+            return out + self._frame(choice.index, merged, finish_reason)
+
+        if self._buffer_bytes >= self.coalesce_bytes or time.monotonic() - self._buffer_started >= self.coalesce_s:
+            return out + self._frame(self._buffer_index, self._take_buffer(), None)
+        return out
+
+    def flush(self):
+        """
+        Sends whatever content is still buffered (call once the upstream stream ends).
+        """
+        if not self._buffer:
+            return ""
+        return self._frame(self._buffer_index, self._take_buffer(), None)
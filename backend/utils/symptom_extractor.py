@@ -0,0 +1,193 @@
+import re
+from collections import namedtuple
+from .metrics import REGISTRY
+from .symptom_lexicon import SYMPTOM_PHRASES
+
+TOKEN_RE = re.compile(r"[a-z]+")
+
+# Plural / variant forms folded onto one token on both the lexicon and the message side
+FOLDED_TOKENS = {
+    "ears": "ear", "eyes": "eye", "earaches": "earache", "headaches": "headache",
+    "noises": "noise", "sounds": "sound", "sinuses": "sinus", "nostrils": "nose",
+    "tonsil": "tonsils", "adenoid": "adenoids", "node": "nodes",
+}
+
+# Words that may sit inside a phrase without breaking it ("pain in my left ear")
+SKIPPABLE_TOKENS = {"my", "the", "a", "an", "both", "left", "right", "his", "her", "their", "our", "your", "its"}
+
+# Vocabulary entries that carry no symptom on their own; they do not count against confidence
+FUNCTION_WORDS = {
+    "the", "in", "of", "with", "to", "for", "or", "on", "by", "from", "into", "through", "while",
+    "due", "both", "one", "side", "day", "need", "mostly", "places", "late", "weeks", "exam",
+    "normal", "area", "around", "behind", "during", "throughout", "feeling", "sensation",
+    "constant", "constantly", "severe", "mild", "bad", "issues", "problems", "episodes",
+}
+
+# Conversational filler around a symptom list; every other word outside a matched phrase
+# counts against confidence, whether or not the vectorizer knows it
+FILLER_TOKENS = {
+    "i", "im", "ive", "me", "a", "an", "and", "or", "but", "also", "plus", "some", "this", "that",
+    "it", "is", "am", "are", "be", "been", "have", "has", "having", "got", "getting", "get",
+    "hi", "hello", "hey", "doctor", "doc", "thanks", "thank", "you", "please", "so", "very",
+    "really", "quite", "pretty", "bit", "little", "lot", "lots", "kind", "of", "at", "all",
+    "now", "today", "tonight", "lately", "recently", "since", "still", "again", "just", "for",
+    "few", "couple", "days", "hours", "week", "weeks", "month", "months", "yesterday",
+    "morning", "night", "time", "times", "experiencing", "suffering", "feel", "keep", "keeps",
+    "two", "three", "four", "five", "several",
+}
+
+# Questions about symptoms are not reports of them ("what causes a sore throat?")
+QUESTION_TOKENS = {
+    "what", "why", "how", "when", "where", "which", "who", "does", "do", "can", "could",
+    "should", "would", "will", "is", "are",
+}
+
+# Past or resolved symptoms are not current ones ("I had a fever last week", "fever free")
+NOT_CURRENT_TOKENS = {
+    "had", "was", "were", "used", "gone", "free", "ago", "last", "anymore", "previously",
+    "past", "before", "resolved", "cleared", "recovered", "better", "went", "stopped",
+}
+
+# Symptoms of someone else ("my son has ear pain") belong to another patient
+THIRD_PARTY_TOKENS = {
+    "he", "she", "they", "him", "her", "his", "their", "them", "son", "daughter", "child",
+    "children", "kid", "kids", "baby", "mom", "mum", "mother", "dad", "father", "parent",
+    "parents", "wife", "husband", "partner", "boyfriend", "girlfriend", "brother", "sister",
+    "grandma", "grandpa", "grandmother", "grandfather", "aunt", "uncle", "cousin", "friend",
+    "family", "someone", "somebody",
+}
+
+# Negated or hedged statements are left to the LLM ("no fever", "maybe vertigo")
+AMBIGUITY_TOKENS = {
+    "no", "not", "without", "never", "nor", "none", "dont", "doesnt", "didnt", "isnt", "arent",
+    "havent", "hasnt", "wasnt", "denies", "deny", "maybe", "might", "possibly", "perhaps",
+    "probably", "unsure", "whether", "if",
+}
+
+ExtractionResult = namedtuple("ExtractionResult", ["symptoms", "confidence", "fallback_reason"])
+
+LOCAL_EXTRACTIONS = REGISTRY.counter(
+    "symptom_extraction_local_total", "Chat turns whose symptoms were extracted locally (LLM call avoided)"
+)
+LLM_EXTRACTIONS = REGISTRY.counter(
+    "symptom_extraction_llm_total", "Chat turns that used the LLM extract_top_symptoms tool call"
+)
+
+
+def fallback_counter(reason):
+    return REGISTRY.counter(
+        f"symptom_extraction_fallback_{reason}_total", f"Local extraction handed to the LLM: {reason}"
+    )
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens with apostrophes dropped ("don't" -> "dont") and plurals folded.
+    """
+    text = text.lower().replace("'", "").replace("’", "")
+    return [FOLDED_TOKENS.get(token, token) for token in TOKEN_RE.findall(text)]
+
+
+class SymptomExtractor:
+    """
+    Dictionary-based symptom extraction for /chat turns that plainly list symptoms.
+
+    Lexicon phrases are compiled into a token trie and the message is scanned once,
+    taking the longest phrase at each position (multi-pattern matching in a single
+    pass). Only phrases sharing a token with the vectorizer vocabulary are kept, since
+    anything else cannot move the prediction. The result is trusted when the message
+    is a plain first-person report of current symptoms (not negated or hedged, not a
+    question, not about the past or someone else) and the matched phrases cover at
+    least min_confidence of its content words (everything but filler); otherwise
+    fallback_reason says why the LLM should handle the turn instead.
+    """
+
+    def __init__(self, phrases, vocabulary, min_confidence=0.75):
+        self.vocabulary = set(vocabulary)
+        self.min_confidence = min_confidence
+        self._trie = {}
+        self.n_phrases = 0
+        for phrase in phrases:
+            tokens = tokenize(phrase)
+            if tokens and any(token in self.vocabulary for token in tokens):
+                self._add(tokens, phrase)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer, phrases=SYMPTOM_PHRASES, min_confidence=0.75):
+        return cls(phrases, vectorizer.vocabulary_, min_confidence=min_confidence)
+
+    def _add(self, tokens, phrase):
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # The first spelling of a phrase wins when folding makes two entries collide
+        if None not in node:
+            node[None] = phrase
+            self.n_phrases += 1
+
+    def _longest_match(self, tokens, start):
+        """
+        Returns (phrase, end) for the longest lexicon phrase starting at tokens[start].
+        """
+        node = self._trie.get(tokens[start])
+        if node is None:
+            return None, start
+        best, best_end = node.get(None), start + 1
+        position = start + 1
+        while position < len(tokens):
+            child = node.get(tokens[position])
+            if child is None:
+                if tokens[position] in SKIPPABLE_TOKENS:
+                    position += 1
+                    continue
+                break
+            node = child
+            position += 1
+            if None in node:
+                best, best_end = node[None], position
+        return best, best_end
+
+    def extract(self, text):
+        """
+        Returns ExtractionResult(symptoms, confidence, fallback_reason), with
+        fallback_reason None when the local result can be used as is.
+        """
+        tokens = tokenize(text or "")
+        symptoms, covered = [], set()
+
+        start = 0
+        while start < len(tokens):
+            phrase, end = self._longest_match(tokens, start)
+            if phrase is None:
+                start += 1
+                continue
+            if phrase not in symptoms:
+                symptoms.append(phrase)
+            covered.update(range(start, end))
+            start = end
+
+        content = [
+            i for i, token in enumerate(tokens)
+            if i in covered or token not in FUNCTION_WORDS and token not in FILLER_TOKENS and token not in SKIPPABLE_TOKENS
+        ]
+        if content:
+            confidence = sum(1 for i in content if i in covered) / len(content)
+        else:
+            confidence = 1.0 if symptoms else 0.0
+
+        words = set(tokens)
+        if not symptoms:
+            reason = "no_match"
+        elif words & AMBIGUITY_TOKENS:
+            reason = "ambiguous"
+        elif "?" in text or tokens[0] in QUESTION_TOKENS:
+            reason = "question"
+        elif words & THIRD_PARTY_TOKENS:
+            reason = "third_party"
+        elif words & NOT_CURRENT_TOKENS:
+            reason = "not_current"
+        elif confidence < self.min_confidence:
+            reason = "low_confidence"
+        else:
+            reason = None
+        return ExtractionResult(symptoms, confidence, reason)
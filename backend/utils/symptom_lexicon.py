@@ -0,0 +1,49 @@
+# ENT symptom phrases the local extractor recognizes, written the way users and the
+# training data phrase them. Matching is token based and ignores possessives and
+# articles inside a phrase ("ringing in my ears" matches "ringing in ears"), and
+# plural forms are folded (see symptom_extractor.FOLDED_TOKENS), so variants only
+# need listing when the wording really differs.
+SYMPTOM_PHRASES = [
+    # Ear
+    "ear pain", "earache", "pain in ear", "pain behind ear", "ear discomfort",
+    "ear discharge", "ear drainage", "fluid drainage from ear", "foul smelling discharge",
+    "ear fullness", "fullness in ear", "ear pressure", "pressure in ear", "plugged ear",
+    "blocked ear", "ear blockage", "itchy ear", "ear itching", "itching in ear canal",
+    "ear canal swelling", "swelling behind ear", "redness behind ear", "protruding ear",
+    "ear infections", "recurring ear infections", "popping sensation", "crackling sound",
+    "popping in ear", "crackling in ear",
+    # Hearing
+    "hearing loss", "sudden hearing loss", "gradual hearing loss", "progressive hearing loss",
+    "fluctuating hearing loss", "unilateral hearing loss", "muffled hearing", "reduced hearing",
+    "decreased hearing", "difficulty hearing", "trouble hearing", "hearing impairment",
+    "difficulty understanding speech", "sensitivity to sound", "sensitivity to loud noise",
+    "sensitivity to noise", "sounds too loud",
+    # Tinnitus
+    "tinnitus", "ringing in ear", "ringing", "buzzing in ear", "buzzing", "hissing sound",
+    "hissing in ear", "pulsating tinnitus", "pulsating sound", "rhythmic sound",
+    "heartbeat in ear", "high pitched ringing", "low pitched ringing",
+    # Balance
+    "dizziness", "vertigo", "spinning sensation", "episodic vertigo", "brief episodes of vertigo",
+    "imbalance", "loss of balance", "balance problems", "unsteadiness", "unsteady gait",
+    "difficulty walking", "lightheadedness", "falling", "nausea", "vomiting",
+    # Nose and sinuses
+    "nasal congestion", "stuffy nose", "blocked nose", "nasal obstruction", "stuffiness",
+    "runny nose", "nasal discharge", "postnasal drip", "sneezing", "itchy nose",
+    "sinus pressure", "sinus pain", "facial pressure", "loss of smell", "reduced sense of smell",
+    "mouth breathing", "breathing through mouth", "nasal voice",
+    # Throat and voice
+    "sore throat", "throat pain", "difficulty swallowing", "trouble swallowing", "painful swallowing",
+    "hoarseness", "hoarse voice", "voice changes", "throat clearing", "cough", "coughing",
+    "dry cough", "swollen tonsils", "enlarged tonsils", "enlarged adenoids", "bad breath",
+    "swollen lymph nodes",
+    # Sleep
+    "snoring", "sleep apnea", "disrupted sleep", "difficulty sleeping", "trouble sleeping",
+    "daytime sleepiness", "daytime drowsiness",
+    # Face, eyes and skin
+    "facial paralysis", "facial weakness", "facial numbness", "facial pain", "drooping face",
+    "facial drooping", "numbness", "tingling", "itchy eyes", "watery eyes", "red eyes",
+    "bloodshot eyes", "dry eyes", "rash", "blistering rash", "skin rash",
+    # General
+    "fever", "high fever", "low grade fever", "headache", "headaches", "fatigue", "tiredness",
+    "irritability", "loss of appetite", "jaw pain", "difficulty concentrating",
+]
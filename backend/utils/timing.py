@@ -0,0 +1,78 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from .metrics import REGISTRY
+
+_current_timer = contextvars.ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """
+    Where one request's time went, stage by stage (seconds, summed when a stage
+    runs more than once).
+
+    finish() feeds every stage into the <name>_stage_<stage>_seconds histograms
+    (plus <name>_stage_total_seconds); server_timing() renders the breakdown as a
+    Server-Timing header value and as_dict() in milliseconds for an SSE trailer.
+    Stages measured elsewhere (the prediction batcher, the executor) reach the
+    request's timer through current_timer().
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self._started = time.perf_counter()
+        self._finished = False
+
+    def record(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def finish(self):
+        """
+        Records the total and observes the histograms (once; later calls are no-ops).
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self.stages["total"] = time.perf_counter() - self._started
+        for stage, seconds in self.stages.items():
+            REGISTRY.histogram(f"{self.name}_stage_{stage}_seconds", f"Time per {self.name} request in {stage}").observe(seconds)
+
+    def as_dict(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+    def server_timing(self):
+        return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items())
+
+
+def start_timer(name):
+    """
+    Creates the timer for the current request and makes it current_timer() for the
+    rest of this task (and tasks it starts).
+    """
+    timer = StageTimer(name)
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+class StagedResults(list):
+    """
+    Batch results that also carry the batch's stage durations (survives pickling,
+    so process workers can report them too).
+    """
+
+    def __init__(self, results=(), stages=None):
+        super().__init__(results)
+        self.stages = stages or {}
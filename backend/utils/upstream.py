@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import random
+import httpx
+import openai
+from openai import AsyncOpenAI
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Failures worth another attempt as long as nothing has been streamed yet
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,   # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,  # 5xx
+)
+
+
+class UpstreamError(Exception):
+    """
+    The upstream call could not be served; the message is safe to show to clients.
+    """
+
+    retryable = True
+
+
+class UpstreamBusy(UpstreamError):
+    pass
+
+
+class UpstreamDeadlineExceeded(UpstreamError):
+    pass
+
+
+def create_openai_client(api_key, max_connections=100, max_keepalive=20, keepalive_expiry=30.0,
+                         connect_timeout=5.0, read_timeout=30.0, base_url=None):
+    """
+    AsyncOpenAI over a tuned connection pool. SDK retries are off: UpstreamClient
+    retries itself, and only before the first streamed byte.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+    )
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+
+
+class UpstreamClient:
+    """
+    Streams chat completions with backpressure, a deadline and retries.
+
+    - At most max_concurrency streams are open at once; further calls wait for a
+      slot for up to queue_timeout seconds and then fail fast with UpstreamBusy
+      instead of piling up.
+    - Each call has a total deadline (queueing, retries and streaming together);
+      running past it raises UpstreamDeadlineExceeded.
+    - Connection errors, 429s and 5xx are retried with full-jitter exponential
+      backoff (or the server's Retry-After, if longer) until the first chunk has
+      arrived; after that a failure is raised as is, since the client already has
+      part of the answer.
+    """
+
+    def __init__(self, client, max_concurrency=64, queue_timeout=5.0, deadline=45.0,
+                 max_retries=2, backoff=0.5, backoff_max=4.0, name="upstream"):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+        self._queue_wait = REGISTRY.histogram(f"{name}_queue_wait_seconds", "Time waiting for an upstream stream slot")
+        self._first_chunk = REGISTRY.histogram(f"{name}_first_chunk_seconds", "Slot acquired to first streamed chunk (incl. retries)")
+        self._duration = REGISTRY.histogram(f"{name}_stream_seconds", "Slot acquired to end of stream")
+        self._in_flight = REGISTRY.gauge(f"{name}_in_flight", "Open upstream streams")
+        self._requests = REGISTRY.counter(f"{name}_requests_total", "Upstream calls started")
+        self._retries = REGISTRY.counter(f"{name}_retries_total", "Upstream attempts retried before the first chunk")
+        self._rejected = REGISTRY.counter(f"{name}_rejected_total", "Calls rejected after waiting queue_timeout for a slot")
+        self._deadlines = REGISTRY.counter(f"{name}_deadline_exceeded_total", "Calls that ran past their deadline")
+        self._errors = REGISTRY.counter(f"{name}_errors_total", "Calls that failed after retries")
+
+    def _retry_delay(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, min(float(retry_after), self.backoff_max)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    async def _acquire(self, loop, deadline):
+        queued = loop.time()
+        try:
+            async with asyncio.timeout_at(min(deadline, queued + self.queue_timeout)):
+                await self._slots.acquire()
+        except TimeoutError:
+            self._rejected.inc()
+            raise UpstreamBusy("The assistant is busy right now, please try again in a moment.") from None
+        self._queue_wait.observe(loop.time() - queued)
+
+    async def _open(self, loop, deadline, request):
+        """
+        Opens the stream and reads its first chunk, retrying retryable failures.
+        Returns (stream, iterator, first chunk) - first is None for an empty stream.
+        """
+        attempt = 0
+        while True:
+            stream = None
+            try:
+                async with asyncio.timeout_at(deadline):
+                    stream = await self.client.chat.completions.create(stream=True, **request)
+                    iterator = stream.__aiter__()
+                    try:
+                        return stream, iterator, await iterator.__anext__()
+                    except StopAsyncIteration:
+                        return stream, iterator, None
+            except RETRYABLE_ERRORS as e:
+                await _close(stream)
+                delay = self._retry_delay(attempt, e)
+                if attempt >= self.max_retries or loop.time() + delay >= deadline:
+                    self._errors.inc()
+                    raise
+                attempt += 1
+                self._retries.inc()
+                logger.warning(f"Upstream attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except TimeoutError:
+                await _close(stream)
+                raise
+
+    async def stream_chat_completion(self, **request):
+        """
+        Async iterator over the chunks of a streamed chat completion.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        await self._acquire(loop, deadline)
+
+        self._requests.inc()
+        self._in_flight.inc()
+        started = loop.time()
+        stream = None
+        try:
+            stream, iterator, chunk = await self._open(loop, deadline, request)
+            self._first_chunk.observe(loop.time() - started)
+            while chunk is not None:
+                yield chunk
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    chunk = None
+        except TimeoutError:
+            self._deadlines.inc()
+            raise UpstreamDeadlineExceeded("The assistant took too long to answer, please try again.") from None
+        finally:
+            await _close(stream)
+            self._duration.observe(loop.time() - started)
+            self._in_flight.dec()
+            self._slots.release()
+
+
+async def _close(stream):
+    # Returns the connection to the pool when a stream is abandoned part way
+    if stream is not None and hasattr(stream, "close"):
+        try:
+            await stream.close()
+        except Exception:
+            pass
@@ -1,13 +1,12 @@
-import requests
+import argparse
+import asyncio
+import hashlib
 import json
-import time
 import logging
-
-# Logging Configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+import os
+import random
+import time
+import httpx
 
 # API Endpoint
 LABEL_API_URL = "https://api.fda.gov/drug/label.json"
@@ -20,8 +19,21 @@ HEADERS = {
 
 # Retry settings
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
-TIME_LAG = 1.5  # Time delay between API requests
+RETRY_DELAY = 2  # seconds, doubled (with jitter) on every attempt
+
+# openFDA allows 240 requests per minute per IP (or API key); stay a little below it.
+# Set OPENFDA_API_KEY to raise the daily quota.
+RATE_PER_SECOND = 3.5
+RATE_BURST = 4
+CONCURRENCY = 8
+OPENFDA_API_KEY = os.getenv("OPENFDA_API_KEY", "")
+
+CHECKPOINT_FILE = "ent_drug_data.checkpoint.jsonl"
+# The file the backend serves (backend/api/ent_drug_data.json), so --reload-url reloads what was written
+OUTPUT_FILE = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "backend", "api", "ent_drug_data.json"
+))
+LABEL_CACHE_DIR = "label_cache"
 
 # Load ENT Problems from JSON file
 def load_ent_problems(filename="ent_problems.json"):
@@ -32,8 +44,6 @@ def load_ent_problems(filename="ent_problems.json"):
         logging.error(f"Error loading ENT problems file: {e}")
         return []
 
-ENT_PROBLEMS = load_ent_problems()
-
 # Drug Label Fields to Extract
 LABEL_FIELDS = [
     "indications_and_usage", "dosage_and_administration",
@@ -43,60 +53,229 @@ LABEL_FIELDS = [
     "clinical_pharmacology"
 ]
 
-def fetch_drugs_for_ent_problem(ent_problem, limit=10):
-    """Fetches drugs mentioning the ENT condition in their indications_and_usage."""
-    params = {
-        "search": f"indications_and_usage:\"{ent_problem}\"",
-        "limit": limit
-    }
 
-    for attempt in range(MAX_RETRIES):
+class TokenBucket:
+    """
+    Async rate limiter: `rate` requests per second on average, bursts of up to `burst`.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """
+        Spends the tokens of the next `seconds` (the server asked us to back off).
+        """
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished work: {"label": drug, "info": {...}} per fetched
+    label and {"problem": name, "drugs": [...]} per finished problem. Each record is
+    flushed as it is written, so an interrupted run resumes from the last full line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.labels = {}
+        self.problems = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line of an interrupted run
+                    if "label" in record:
+                        self.labels[record["label"]] = record["info"]
+                    elif "problem" in record:
+                        self.problems[record["problem"]] = record["drugs"]
+        self._file = open(path, "a")
+
+    def _append(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def add_label(self, drug, info):
+        self.labels[drug] = info
+        self._append({"label": drug, "info": info})
+
+    def add_problem(self, problem, drugs):
+        self.problems[problem] = drugs
+        self._append({"problem": problem, "drugs": drugs})
+
+    def close(self):
+        self._file.close()
+
+
+def _write_json_atomic(path, data, **kwargs):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
+
+
+class LabelCache:
+    """
+    On-disk cache of raw openFDA label results, content addressed: each distinct
+    label is stored once as objects/<sha256>.json, and index.json maps a drug to
+    {"sha256", "set_id", "effective_time", "fetched_at"} of the label last fetched
+    for it. Incremental refreshes compare effective_time against openFDA.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.objects = os.path.join(directory, "objects")
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(self.objects, exist_ok=True)
         try:
-            logging.info(f"🔍 Fetching drugs for ENT problem: {ent_problem} (Attempt {attempt+1})")
-            response = requests.get(LABEL_API_URL, headers=HEADERS, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            drugs = []
-
-            for result in data.get("results", []):
-                generic_names = result.get("openfda", {}).get("generic_name", [])
-                if not generic_names:
-                    logging.info(f"⚠️ Skipping result with missing generic_name for {ent_problem}")
-                    continue
-                drugs.extend(generic_names)
-                if len(drugs) >= limit:
-                    break
-
-            return list(set(drugs))[:limit]
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching drugs for {ent_problem} (Attempt {attempt+1}): {e}")
-            time.sleep(RETRY_DELAY)
-
-    return []
-
-def fetch_drug_label(drug_name):
-    """Fetches structured drug label details for a given generic drug name."""
-    params = {"search": f"openfda.generic_name:\"{drug_name}\"", "limit": 1}
-
-    for attempt in range(MAX_RETRIES):
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def get(self, drug):
+        entry = self.index.get(drug)
+        if entry is None:
+            return None
         try:
-            logging.info(f"📖 Fetching label for drug: {drug_name} (Attempt {attempt+1})")
-            response = requests.get(LABEL_API_URL, headers=HEADERS, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            with open(os.path.join(self.objects, f"{entry['sha256']}.json"), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
 
-            if "results" in data:
-                label_data = data["results"][0]
-                return {field: label_data.get(field, "N/A") for field in LABEL_FIELDS}
+    def put(self, drug, raw):
+        payload = json.dumps(raw, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        path = os.path.join(self.objects, f"{digest}.json")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        self.index[drug] = {
+            "sha256": digest,
+            "set_id": raw.get("set_id"),
+            "effective_time": raw.get("effective_time"),
+            "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
 
-            return {}
+    def save(self):
+        _write_json_atomic(self.index_path, self.index, indent=1, sort_keys=True)
+
+
+def label_fields(raw):
+    return {field: raw.get(field, "N/A") for field in LABEL_FIELDS}
+
+
+class FDAClient:
+    """
+    openFDA label queries over one pooled HTTP client: rate limited, retried on
+    429 / 5xx / network errors (honouring Retry-After), with concurrent fetches of
+    the same drug label sharing one request. Fetched labels are stored in `cache`;
+    labels of the drugs in `reuse` are served from it without a request.
+    """
+
+    def __init__(self, client, limiter, url=LABEL_API_URL, api_key=OPENFDA_API_KEY, cache=None, reuse=()):
+        self.client = client
+        self.limiter = limiter
+        self.url = url
+        self.api_key = api_key
+        self.cache = cache
+        self.reuse = set(reuse)
+        self.requests = 0
+        self.cache_hits = 0
+        self._labels = {}  # drug -> task, so shared drugs are fetched once
+
+    async def search(self, search, limit):
+        """
+        Results of one label query; [] when nothing matches (openFDA answers 404).
+        """
+        params = {"search": search, "limit": limit}
+        if self.api_key:
+            params["api_key"] = self.api_key
+
+        for attempt in range(MAX_RETRIES):
+            await self.limiter.acquire()
+            self.requests += 1
+            try:
+                response = await self.client.get(self.url, params=params)
+            except httpx.TransportError as e:
+                error = e
+            else:
+                if response.status_code == 404:
+                    return []
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json().get("results", [])
+                retry_after = response.headers.get("retry-after", "")
+                if retry_after.isdigit():
+                    self.limiter.pause(float(retry_after))
+                error = f"HTTP {response.status_code}"
+            logging.error(f"Query {search!r} failed (Attempt {attempt+1}): {error}")
+            await asyncio.sleep(RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+        raise RuntimeError(f"Giving up on query {search!r} after {MAX_RETRIES} attempts")
+
+    async def fetch_drugs_for_ent_problem(self, ent_problem, limit=10):
+        """Fetches drugs mentioning the ENT condition in their indications_and_usage."""
+        logging.info(f"🔍 Fetching drugs for ENT problem: {ent_problem}")
+        drugs = []
+        for result in await self.search(f"indications_and_usage:\"{ent_problem}\"", limit):
+            generic_names = result.get("openfda", {}).get("generic_name", [])
+            if not generic_names:
+                logging.info(f"⚠️ Skipping result with missing generic_name for {ent_problem}")
+                continue
+            drugs.extend(generic_names)
+            if len(drugs) >= limit:
+                break
+        return list(dict.fromkeys(drugs))[:limit]
 
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching label for {drug_name} (Attempt {attempt+1}): {e}")
-            time.sleep(RETRY_DELAY)
+    def fetch_drug_label(self, drug_name):
+        """Structured drug label details for a generic drug name (one request per drug)."""
+        task = self._labels.get(drug_name)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_drug_label(drug_name))
+            task.add_done_callback(lambda done: self._forget_failed(drug_name, done))
+            self._labels[drug_name] = task
+        return task
+
+    def _forget_failed(self, drug_name, task):
+        # A failed fetch is not shared with later diseases; they retry it
+        if (task.cancelled() or task.exception() is not None) and self._labels.get(drug_name) is task:
+            del self._labels[drug_name]
+
+    async def _fetch_drug_label(self, drug_name):
+        if self.cache is not None and drug_name in self.reuse:
+            raw = self.cache.get(drug_name)
+            if raw is not None:
+                self.cache_hits += 1
+                return label_fields(raw)
+        logging.info(f"📖 Fetching label for drug: {drug_name}")
+        results = await self.search(f"openfda.generic_name:\"{drug_name}\"", 1)
+        if not results:
+            return {}
+        if self.cache is not None:
+            self.cache.put(drug_name, results[0])
+        return label_fields(results[0])
 
-    return {}
 
 def is_ent_relevant(label_info):
     """Quick check to confirm ENT relevance based on label content."""
@@ -104,40 +283,203 @@ def is_ent_relevant(label_info):
     combined_info = " ".join([str(label_info.get(field, "")) for field in LABEL_FIELDS])
     return any(keyword in combined_info.lower() for keyword in ENT_KEYWORDS)
 
-def create_ent_drug_dataset():
-    ent_drug_data = {}
 
-    for ent_problem in ENT_PROBLEMS:
-        try:
-            logging.info(f"🔬 Processing ENT problem: {ent_problem}")
-            drugs = fetch_drugs_for_ent_problem(ent_problem, limit=10)
-            logging.info(f"✅ Found {len(drugs)} drugs for {ent_problem}")
+async def find_changed_labels(fda, cache, drugs, batch_size=20, limit=100):
+    """
+    The cached drugs whose label openFDA has updated since it was cached: one query per
+    batch of drugs for labels with a newer effective_time, instead of one per drug.
+    Drugs without a recorded effective_time, and whole batches whose answer may be
+    truncated, count as changed.
+    """
+    changed = set()
+    dated = []
+    for drug in drugs:
+        if cache.index.get(drug, {}).get("effective_time"):
+            dated.append(drug)
+        else:
+            changed.add(drug)
+
+    async def check(batch):
+        since = min(cache.index[drug]["effective_time"] for drug in batch)
+        names = " ".join(f'"{drug}"' for drug in batch)
+        results = await fda.search(f"openfda.generic_name:({names}) AND effective_time:[{since} TO 99991231]", limit)
+        if len(results) >= limit:
+            return set(batch)
+        by_name = {drug.lower(): drug for drug in batch}
+        updated = set()
+        for result in results:
+            for name in result.get("openfda", {}).get("generic_name", []):
+                drug = by_name.get(name.lower())
+                if drug is not None and result.get("effective_time", "") > cache.index[drug]["effective_time"]:
+                    updated.add(drug)
+        return updated
+
+    batches = [dated[i:i + batch_size] for i in range(0, len(dated), batch_size)]
+    for updated in await asyncio.gather(*(check(batch) for batch in batches)):
+        changed |= updated
+    return changed
+
+
+def dataset_diff(old, new):
+    """
+    What changed between two datasets: problems added / removed and, per problem,
+    the drugs added, removed or with a different label.
+    """
+    diff = {
+        "added_problems": sorted(set(new) - set(old)),
+        "removed_problems": sorted(set(old) - set(new)),
+        "problems": {},
+    }
+    for problem in sorted(set(old) & set(new)):
+        before, after = old[problem], new[problem]
+        entry = {
+            "added": sorted(set(after) - set(before)),
+            "removed": sorted(set(before) - set(after)),
+            "changed": sorted(drug for drug in set(before) & set(after) if before[drug] != after[drug]),
+        }
+        if any(entry.values()):
+            diff["problems"][problem] = entry
+    return diff
+
+
+def load_dataset(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-            drug_info = {}
-            for drug in drugs:
-                label_info = fetch_drug_label(drug)
 
-                if is_ent_relevant(label_info):
-                    drug_info[drug] = label_info
-                    logging.info(f"✔️ Relevant drug added: {drug}")
-                else:
-                    logging.info(f"🚫 Skipped irrelevant drug: {drug}")
+async def process_problem(fda, checkpoint, ent_problem):
+    drugs = await fda.fetch_drugs_for_ent_problem(ent_problem, limit=10)
+    logging.info(f"✅ Found {len(drugs)} drugs for {ent_problem}")
 
-                time.sleep(TIME_LAG)
+    missing = [drug for drug in drugs if drug not in checkpoint.labels]
+    for drug, label_info in zip(missing, await asyncio.gather(*(fda.fetch_drug_label(drug) for drug in missing))):
+        if drug not in checkpoint.labels:  # Another problem may have recorded it meanwhile
+            checkpoint.add_label(drug, label_info)
 
-            ent_drug_data[ent_problem] = drug_info
-            logging.info(f"🏁 Completed {ent_problem}")
+    checkpoint.add_problem(ent_problem, drugs)
+    logging.info(f"🏁 Completed {ent_problem}")
 
-            # Save intermediate progress
-            with open("ent_drug_data.json", "w") as f:
-                json.dump(ent_drug_data, f, indent=2)
 
-            time.sleep(TIME_LAG * 2)
-        except Exception as e:
-            logging.error(f"🔥 Failed to process {ent_problem}: {e}")
+def build_dataset(problems, checkpoint):
+    """{problem: {drug: label}} for the finished problems, keeping ENT-relevant drugs only."""
+    ent_drug_data = {}
+    for ent_problem in problems:
+        if ent_problem not in checkpoint.problems:
             continue
+        drug_info = {}
+        for drug in checkpoint.problems[ent_problem]:
+            label_info = checkpoint.labels.get(drug, {})
+            if is_ent_relevant(label_info):
+                drug_info[drug] = label_info
+            else:
+                logging.info(f"🚫 Skipped irrelevant drug: {drug}")
+        ent_drug_data[ent_problem] = drug_info
+    return ent_drug_data
+
+
+async def create_ent_drug_dataset(problems, output=OUTPUT_FILE, checkpoint_path=CHECKPOINT_FILE,
+                                  concurrency=CONCURRENCY, rate=RATE_PER_SECOND, burst=RATE_BURST,
+                                  url=LABEL_API_URL, transport=None, cache_dir=LABEL_CACHE_DIR, incremental=False):
+    """
+    Fetches every problem's drugs and their labels concurrently and writes `output`.
+    Problems and labels already in the checkpoint log are not fetched again; the
+    output is replaced atomically once the run finishes, next to a <output>.diff.json
+    against the previous version. Returns the dataset.
+
+    Raw labels are kept in the label cache at cache_dir (None disables it). With
+    incremental=True only labels that openFDA updated since they were cached (and
+    drugs never seen before) are downloaded; the problem searches always run, so new
+    drugs are picked up.
+    """
+    previous = load_dataset(output)
+    checkpoint = Checkpoint(checkpoint_path)
+    cache = LabelCache(cache_dir) if cache_dir else None
+    todo = [problem for problem in problems if problem not in checkpoint.problems]
+    logging.info(f"🔬 {len(problems) - len(todo)} of {len(problems)} ENT problems already done, fetching {len(todo)}")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=10, transport=transport) as client:
+            fda = FDAClient(client, TokenBucket(rate, burst), url=url, cache=cache)
+            if incremental and cache is not None:
+                changed = await find_changed_labels(fda, cache, list(cache.index))
+                fda.reuse = set(cache.index) - changed
+                logging.info(f"🗂️ {len(fda.reuse)} cached labels unchanged, {len(changed)} to re-fetch")
+            slots = asyncio.Semaphore(concurrency)
+
+            async def run(ent_problem):
+                async with slots:
+                    try:
+                        await process_problem(fda, checkpoint, ent_problem)
+                    except Exception as e:
+                        # Not checkpointed, so the next run tries it again
+                        logging.error(f"🔥 Failed to process {ent_problem}: {e}")
+
+            await asyncio.gather(*(run(problem) for problem in todo))
+            logging.info(f"📡 {fda.requests} openFDA requests, {fda.cache_hits} labels from the cache")
+    finally:
+        checkpoint.close()
+        if cache is not None:
+            cache.save()
+
+    ent_drug_data = build_dataset(problems, checkpoint)
+    _write_json_atomic(output, ent_drug_data, indent=2)
+
+    diff = dataset_diff(previous, ent_drug_data)
+    _write_json_atomic(f"{os.path.splitext(output)[0]}.diff.json", diff, indent=2)
+    logging.info(
+        f"🧾 {len(diff['added_problems'])} problems added, {len(diff['removed_problems'])} removed, "
+        f"{len(diff['problems'])} with changed drugs"
+    )
+
+    if len(ent_drug_data) == len(problems):
+        os.remove(checkpoint_path)  # Complete: the next run is a new refresh, not a resume
+
+    logging.info(f"🎉 ENT drug data ingestion complete ({len(ent_drug_data)}/{len(problems)} problems). Saved to {output}")
+    return ent_drug_data
+
+
+def notify_backend(reload_url, admin_token=""):
+    """Asks a running backend to load the new data (POST /admin/drug-data/reload)."""
+    headers = {"X-Admin-Token": admin_token} if admin_token else {}
+    response = httpx.post(reload_url, headers=headers, timeout=60)
+    response.raise_for_status()
+    logging.info(f"🔄 Backend reloaded the drug data: {response.json()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build ent_drug_data.json from openFDA drug labels.")
+    parser.add_argument("--problems", default="ent_problems.json", help="JSON list of ENT problems")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Dataset to write (default: the backend's ent_drug_data.json)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="Resume log (delete it, or use --fresh, to start over)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore and replace an existing checkpoint")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_PER_SECOND, help="Requests per second")
+    parser.add_argument("--url", default=LABEL_API_URL, help="Label endpoint (e.g. a local mock)")
+    parser.add_argument("--cache-dir", default=LABEL_CACHE_DIR, help="On-disk label cache ('' to disable)")
+    parser.add_argument("--incremental", action="store_true", help="Only re-fetch labels updated since they were cached")
+    parser.add_argument("--reload-url", help="Backend /admin/drug-data/reload URL to call afterwards (uses ADMIN_TOKEN)")
+    args = parser.parse_args()
+
+    # Logging Configuration
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    if args.fresh and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
 
-    logging.info("🎉 ENT drug data ingestion complete. Saved to ent_drug_data.json")
+    asyncio.run(create_ent_drug_dataset(
+        load_ent_problems(args.problems), output=args.output, checkpoint_path=args.checkpoint,
+        concurrency=args.concurrency, rate=args.rate, url=args.url,
+        cache_dir=args.cache_dir or None, incremental=args.incremental,
+    ))
+    if args.reload_url:
+        notify_backend(args.reload_url, os.getenv("ADMIN_TOKEN", ""))
 
 if __name__ == "__main__":
-    create_ent_drug_dataset()
+    main()